@@ -0,0 +1,57 @@
+'''
+    EnigmaSimulator - A software implementation of the Engima Machine.
+    Copyright (C) 2015-2021 Engima Simulator Development Team
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    Compare Machine.press_key() throughput under each logging policy.
+    Run from the enigma_simulator directory with:
+        python -m benchmarks.benchmark_logging
+'''
+import logging
+import timeit
+from simulation.enigma_machine import Machine
+from simulation.log_policy import StandardLogPolicy, TraceSinkPolicy
+from simulation.rotor_contact import RotorContact
+
+KEY_PRESSES = 20000
+
+def _create_machine(log_policy) -> Machine:
+    machine = Machine(log_policy=log_policy)
+    machine.configure('Enigma1', ['I', 'II', 'III'], 'UKW-B')
+    return machine
+
+def _discard(_):
+    pass
+
+def main():
+    ''' Run the benchmark and print key presses per second per policy. '''
+    quiet_logger = logging.getLogger('benchmark.quiet')
+    quiet_logger.setLevel(logging.INFO)
+
+    debug_logger = logging.getLogger('benchmark.debug')
+    debug_logger.setLevel(logging.DEBUG)
+    debug_logger.addHandler(logging.NullHandler())
+    debug_logger.propagate = False
+
+    policies = [('off', None),
+                ('logging, debug disabled', StandardLogPolicy(quiet_logger)),
+                ('logging, debug enabled', StandardLogPolicy(debug_logger)),
+                ('trace sink', TraceSinkPolicy(_discard))]
+
+    for name, policy in policies:
+        machine = _create_machine(policy)
+        seconds = timeit.timeit(lambda m=machine: m.press_key(RotorContact.A),
+                                number=KEY_PRESSES)
+        print(f'{name:<26} {KEY_PRESSES / seconds:>12,.0f} keys/sec')
+
+if __name__ == '__main__':
+    main()
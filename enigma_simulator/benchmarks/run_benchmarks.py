@@ -0,0 +1,301 @@
+'''
+    EnigmaSimulator - A software implementation of the Engima Machine.
+    Copyright (C) 2015-2021 Engima Simulator Development Team
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    Performance suite for the simulator.  Run from the enigma_simulator
+    directory with:
+        python -m benchmarks.run_benchmarks [--sizes 10,1000,10000000]
+                                            [--output results.json]
+                                            [--compare baseline.json]
+    Results are written as JSON (default benchmarks/results/<commit>.json),
+    when a baseline is given any case that is slower (or uses more memory)
+    than the baseline by more than the threshold is reported and the exit
+    code is 1, so the suite can gate a change locally.
+'''
+import argparse
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import timeit
+import tracemalloc
+from simulation.enigma_machine import Machine
+from simulation.log_policy import StandardLogPolicy
+from simulation.rotor_contact import RotorContact
+
+DEFAULT_SIZES = '10,1000,100000,10000000'
+DEFAULT_THRESHOLD = 0.10
+RESULTS_DIRECTORY = os.path.join(os.path.dirname(__file__), 'results')
+
+# Key presses one at a time take ~100x longer than a bulk encrypt (and
+# ~100x longer again with logging enabled), so the press_key cases are
+# skipped above these message sizes.
+PRESS_KEY_SIZE_LIMIT = 100000
+LOGGING_SIZE_LIMIT = 10000
+
+# Number of calls timed for the per-call (non message) cases.
+CALLS = 10000
+
+# Interpreter arguments for each start up case, run in a new process.
+STARTUP_COMMANDS = {
+    'import': ['-c', 'import simulation.enigma_machine'],
+    'cli_help': ['-m', 'simulation', '--help']}
+
+MESSAGE = 'THEQUICKBROWNFOXJUMPSOVERTHELAZYDOG'
+
+
+def _log_policy(logging_on : bool):
+    if not logging_on:
+        return None
+
+    logger = logging.getLogger('benchmark')
+    logger.setLevel(logging.DEBUG)
+    logger.propagate = False
+    if not logger.handlers:
+        logger.addHandler(logging.NullHandler())
+
+    return StandardLogPolicy(logger)
+
+
+# Rotors and reflector each benchmarked model is configured with.
+MODELS = {'Enigma1': (['I', 'II', 'III'], 'UKW-B'),
+          'M4': (['Beta', 'I', 'II', 'III'], 'UKW-B-Thin')}
+
+
+def _create_machine(logging_on : bool = False,
+                    model : str = 'Enigma1') -> Machine:
+    machine = Machine(log_policy=_log_policy(logging_on))
+    machine.configure(model, *MODELS[model])
+    return machine
+
+
+def _message(size : int) -> str:
+    return (MESSAGE * (size // len(MESSAGE) + 1))[:size]
+
+
+def _time(function, repeat : int = 5) -> float:
+    # Run enough calls per sample to take ~0.2 seconds so short cases aren't
+    # dominated by timer noise, and take the fastest sample.
+    timer = timeit.Timer(function)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=repeat, number=number)) / number
+
+
+def benchmark_press_key(size : int, logging_on : bool) -> float:
+    ''' Seconds to press_key() a message of the given size. '''
+    machine = _create_machine(logging_on)
+    keys = [RotorContact[letter] for letter in _message(size)]
+    press_key = machine.press_key
+
+    def run():
+        for key in keys:
+            press_key(key)
+
+    return _time(run)
+
+
+def benchmark_encrypt(size : int, model : str = 'Enigma1',
+                      position_cache : bool = False) -> float:
+    ''' Seconds to encrypt() a message of the given size in one call. '''
+    machine = _create_machine(model=model)
+    message = _message(size)
+
+    if position_cache:
+        # pylint: disable=import-outside-toplevel
+        from simulation.position_cache import PositionCache
+        machine.set_position_cache(PositionCache())
+
+    return _time(lambda: machine.encrypt(message))
+
+
+def benchmark_configure(logging_on : bool) -> float:
+    ''' Seconds to create and configure a machine. '''
+    return _time(lambda: [_create_machine(logging_on)
+                          for _ in range(CALLS // 10)]) / (CALLS // 10)
+
+
+def benchmark_rotor_encrypt(logging_on : bool, forward : bool) -> float:
+    ''' Seconds per Rotor.encrypt() call. '''
+    rotor = _create_machine(logging_on)._rotors[0]
+    contacts = list(RotorContact)
+
+    def run():
+        for _ in range(CALLS // len(contacts)):
+            for contact in contacts:
+                rotor.encrypt(contact, forward)
+
+    return _time(run) / (CALLS // len(contacts) * len(contacts))
+
+
+def benchmark_step_rotors(logging_on : bool) -> float:
+    ''' Seconds per Machine._step_rotors() call. '''
+    machine = _create_machine(logging_on)
+
+    def run():
+        for _ in range(CALLS):
+            machine._step_rotors()
+
+    return _time(run) / CALLS
+
+
+def benchmark_startup(command : str) -> float:
+    ''' Seconds to start a new interpreter and run a start up command. '''
+    arguments = [sys.executable, *STARTUP_COMMANDS[command]]
+    directory = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+    return _time(lambda: subprocess.run(arguments, cwd=directory, check=True,
+                                        stdout=subprocess.DEVNULL))
+
+
+def benchmark_machine_memory() -> float:
+    ''' Bytes allocated per configured machine. '''
+    count = 1000
+
+    # Warm the shared caches so only per-machine memory is counted.
+    _create_machine()
+
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    machines = [_create_machine() for _ in range(count)]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    del machines
+    return (after - before) / count
+
+
+def run_suite(sizes : list) -> dict:
+    '''
+    Run every benchmark case.
+    @param sizes Message sizes (in characters) for the message cases.
+    @return Dictionary of case name => {'value': ..., 'unit': ...}.
+    '''
+    results = {}
+
+    def record(name, value, unit):
+        results[name] = {'value': value, 'unit': unit}
+        print(f'{name:<48} {value:>14.6g} {unit}')
+
+    for logging_on in (False, True):
+        suffix = 'logging=on' if logging_on else 'logging=off'
+
+        for size in sizes:
+            limit = LOGGING_SIZE_LIMIT if logging_on else PRESS_KEY_SIZE_LIMIT
+            if size > limit:
+                print(f'press_key[{suffix},size={size}] skipped, over the '
+                      f'{limit} character limit')
+                continue
+            record(f'press_key[{suffix},size={size}]',
+                   benchmark_press_key(size, logging_on), 's')
+
+        record(f'configure[{suffix}]', benchmark_configure(logging_on), 's')
+        record(f'rotor_encrypt_forward[{suffix}]',
+               benchmark_rotor_encrypt(logging_on, True), 's')
+        record(f'rotor_encrypt_backward[{suffix}]',
+               benchmark_rotor_encrypt(logging_on, False), 's')
+        record(f'step_rotors[{suffix}]', benchmark_step_rotors(logging_on),
+               's')
+
+    for size in sizes:
+        record(f'encrypt[size={size}]', benchmark_encrypt(size), 's')
+        record(f'encrypt[model=M4,size={size}]',
+               benchmark_encrypt(size, 'M4'), 's')
+        record(f'encrypt[position_cache,size={size}]',
+               benchmark_encrypt(size, position_cache=True), 's')
+
+    record('machine_memory', benchmark_machine_memory(), 'bytes')
+
+    for command in STARTUP_COMMANDS:
+        record(f'startup[{command}]', benchmark_startup(command), 's')
+
+    return results
+
+
+def compare(results : dict, baseline : dict, threshold : float) -> list:
+    '''
+    Compare results with a baseline, lower values are better for every case.
+    @return List of (case name, baseline value, new value) regressions.
+    '''
+    regressions = []
+
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+
+        old_value = baseline[name]['value']
+        if old_value > 0 and result['value'] > old_value * (1 + threshold):
+            regressions.append((name, old_value, result['value']))
+
+    return regressions
+
+
+def _commit() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'],
+                              capture_output=True, text=True, check=True,
+                              cwd=os.path.dirname(__file__)).stdout.strip()
+
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def main(arguments : list = None) -> int:
+    ''' Run the suite, save the results and compare with a baseline. '''
+    parser = argparse.ArgumentParser(description='Enigma simulator benchmarks')
+    parser.add_argument('--sizes', default=DEFAULT_SIZES,
+                        help='Comma separated message sizes in characters '
+                             '(default: %(default)s).  press_key cases are '
+                             f'skipped above {PRESS_KEY_SIZE_LIMIT} '
+                             f'characters ({LOGGING_SIZE_LIMIT} with '
+                             'logging on), the bulk encrypt cases run at '
+                             'every size')
+    parser.add_argument('--output', help='File to write the results to')
+    parser.add_argument('--compare', help='Baseline results file')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help='Allowed slow down before a case regresses')
+    options = parser.parse_args(arguments)
+
+    sizes = [int(size) for size in options.sizes.split(',')]
+    commit = _commit()
+
+    report = {'commit': commit,
+              'python': platform.python_version(),
+              'platform': platform.platform(),
+              'results': run_suite(sizes)}
+
+    output = options.output or os.path.join(RESULTS_DIRECTORY,
+                                            f'{commit}.json')
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as output_file:
+        json.dump(report, output_file, indent=2)
+    print(f'Results written to {output}')
+
+    if not options.compare:
+        return 0
+
+    with open(options.compare, 'r', encoding='utf-8') as baseline_file:
+        baseline = json.load(baseline_file)
+
+    regressions = compare(report['results'], baseline['results'],
+                          options.threshold)
+
+    for name, old_value, new_value in regressions:
+        print(f'REGRESSION {name}: {old_value:.6g} => {new_value:.6g}')
+
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,229 @@
+'''
+    EnigmaSimulator - A software implementation of the Engima Machine.
+    Copyright (C) 2015-2021 Engima Simulator Development Team
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+'''
+import numpy as np
+from simulation.circuit_tables import LETTER_CODES, NOT_A_LETTER, \
+                                    NUMBER_OF_CONTACTS
+from simulation.component_registry import REGISTRY
+from simulation.stepping import LEVER_STEPPING
+
+class BatchEngine:
+    '''
+    Encrypt one message under many machine settings at once.  Each setting
+    is a row of rotor order, reflector, start positions and (optionally)
+    plugboard, the whole batch is stepped and passed through the circuit
+    with NumPy gather operations rather than one key at a time.  Every row
+    gives exactly the output of Machine.press_key() for that setting.
+    '''
+    __slots__ = ['_forward', '_inverse', '_notches', '_reflector_names',
+                 '_reflectors', '_rotor_names']
+
+    @property
+    def rotor_names(self) -> list:
+        ''' Property getter : Rotor names, in rotor index order. '''
+        return list(self._rotor_names)
+
+    @property
+    def reflector_names(self) -> list:
+        ''' Property getter : Reflector names, in reflector index order. '''
+        return list(self._reflector_names)
+
+    def __init__(self, model : str):
+        '''
+        Build the wiring tables for every rotor and reflector of a model.
+        @param model Enigma model name, e.g. 'Enigma1'.
+        '''
+        if REGISTRY.no_of_rotors(model) != 3 or \
+           REGISTRY.stepping(model) != LEVER_STEPPING:
+            raise ValueError("Batch engine only supports 3 rotor models "
+                             "with lever stepping")
+
+        self._rotor_names = REGISTRY.rotor_names(model)
+        self._reflector_names = REGISTRY.reflector_names(model)
+
+        rotors = [REGISTRY.rotor(model, name) for name in self._rotor_names]
+        reflectors = [REGISTRY.reflector(model, name)
+                      for name in self._reflector_names]
+
+        # Forward and inverse tables indexed [rotor, position, contact].
+        tables = [REGISTRY.rotor_tables(rotor.wiring) for rotor in rotors]
+        self._forward = np.array([[list(table) for table in forward]
+                                  for forward, _ in tables], dtype=np.uint8)
+        self._inverse = np.array([[list(table) for table in inverse]
+                                  for _, inverse in tables], dtype=np.uint8)
+
+        # Notch flags indexed [rotor, position].
+        self._notches = np.zeros((len(tables), NUMBER_OF_CONTACTS),
+                                 dtype=bool)
+        for rotor_no, rotor in enumerate(rotors):
+            mask = REGISTRY.notch_mask(rotor.notches)
+            for notch in range(NUMBER_OF_CONTACTS):
+                self._notches[rotor_no, notch] = bool(mask >> notch & 1)
+
+        self._reflectors = np.array(
+            [list(REGISTRY.reflector_table(reflector.wiring))
+             for reflector in reflectors], dtype=np.uint8)
+
+    def rotor_index(self, rotors) -> np.ndarray:
+        '''
+        Convert rotor orders given as names into rotor indexes.
+        @param rotors Sequence of rotor orders, e.g. [['I', 'II', 'III']].
+        @return Array of rotor indexes.
+        '''
+        try:
+            return np.array([[self._rotor_names.index(name) for name in order]
+                             for order in rotors], dtype=np.intp)
+
+        except ValueError as ex:
+            raise ValueError('Invalid rotor in rotor order') from ex
+
+    def reflector_index(self, reflectors) -> np.ndarray:
+        '''
+        Convert reflector names into reflector indexes.
+        @param reflectors Sequence of reflector names.
+        @return Array of reflector indexes.
+        '''
+        try:
+            return np.array([self._reflector_names.index(name)
+                             for name in reflectors], dtype=np.intp)
+
+        except ValueError as ex:
+            raise ValueError('Invalid reflector') from ex
+
+    def encrypt(self, message, rotor_orders, reflectors, positions,
+                plugboards = None, ring_settings = None) -> np.ndarray:
+        '''
+        Encrypt/decrypt a message under every setting of a batch.
+        @param message Message as a str/bytes of letters, anything that isn't
+                       A-Z is dropped.
+        @param rotor_orders (settings, 3) array of rotor indexes, left to
+                            right.
+        @param reflectors (settings,) array of reflector indexes.
+        @param positions (settings, 3) array of start positions, left to right.
+        @param plugboards Optional (settings, 26) array of plugboard
+                          permutations, None if no plugboard is used.
+        @param ring_settings Optional (settings, 3) array of ring settings,
+                             left to right, None for all 'A' (0).
+        @return (settings, message length) array of output contact numbers.
+        '''
+        # pylint: disable=too-many-arguments, too-many-locals
+
+        letters = message_to_codes(message)
+
+        rotor_orders = np.asarray(rotor_orders, dtype=np.intp)
+        reflectors = np.asarray(reflectors, dtype=np.intp)
+        positions = np.asarray(positions, dtype=np.intp)
+
+        if rotor_orders.ndim != 2 or rotor_orders.shape[1] != 3 or \
+           positions.shape != rotor_orders.shape:
+            raise ValueError('Rotor orders and positions must be ' + \
+                             '(settings, 3)')
+
+        rotor_positions = self._step_positions(rotor_orders, positions,
+                                               len(letters))
+
+        # The ring setting offsets the wiring against the rotor position,
+        # the stepping itself is unaffected.
+        if ring_settings is not None:
+            ring_settings = np.asarray(ring_settings, dtype=np.intp)
+            if ring_settings.shape != rotor_orders.shape:
+                raise ValueError('Ring settings must be (settings, 3)')
+
+            rotor_positions = [
+                (rotor_positions[rotor_no] - ring_settings[:, rotor_no, None])
+                % NUMBER_OF_CONTACTS for rotor_no in range(3)]
+
+        no_of_settings = rotor_orders.shape[0]
+        current = np.broadcast_to(letters, (no_of_settings, len(letters)))
+        rows = np.arange(no_of_settings)[:, None]
+
+        if plugboards is not None:
+            plugboards = np.asarray(plugboards, dtype=np.uint8)
+            current = plugboards[rows, current]
+
+        # Pass the letters through the rotors from right to left.
+        for rotor_no in (2, 1, 0):
+            current = self._forward[rotor_orders[:, rotor_no][:, None],
+                                    rotor_positions[rotor_no], current]
+
+        # Pass the letters through the reflector.
+        current = self._reflectors[reflectors[:, None], current]
+
+        # Pass the letters through the rotors from left to right.
+        for rotor_no in (0, 1, 2):
+            current = self._inverse[rotor_orders[:, rotor_no][:, None],
+                                    rotor_positions[rotor_no], current]
+
+        if plugboards is not None:
+            current = plugboards[rows, current]
+
+        return current
+
+    def _step_positions(self, rotor_orders, positions, length) -> list:
+        '''
+        Work out the rotor positions used for every key press of every
+        setting, stepping exactly as Machine._step_rotors() does.
+        @return List of three (settings, length) arrays, left to right.
+        '''
+        no_of_settings = rotor_orders.shape[0]
+        notches_1 = self._notches[rotor_orders[:, 1]]
+        notches_2 = self._notches[rotor_orders[:, 2]]
+        rows = np.arange(no_of_settings)
+
+        position_0 = positions[:, 0].copy()
+        position_1 = positions[:, 1].copy()
+        position_2 = positions[:, 2].copy()
+        double_step = np.zeros(no_of_settings, dtype=bool)
+
+        stepped = [np.empty((no_of_settings, length), dtype=np.intp)
+                   for _ in range(3)]
+
+        for key_no in range(length):
+            will_step_next_rotor = notches_2[rows, position_2]
+            position_2 = (position_2 + 1) % NUMBER_OF_CONTACTS
+
+            position_0 = (position_0 + double_step) % NUMBER_OF_CONTACTS
+            position_1 = (position_1 + double_step + will_step_next_rotor) % \
+                NUMBER_OF_CONTACTS
+            double_step = will_step_next_rotor & notches_1[rows, position_1]
+
+            stepped[0][:, key_no] = position_0
+            stepped[1][:, key_no] = position_1
+            stepped[2][:, key_no] = position_2
+
+        return stepped
+
+
+def message_to_codes(message) -> np.ndarray:
+    '''
+    Convert a message into an array of contact numbers, anything that isn't
+    a letter is dropped.
+    @param message str, bytes or memoryview message.
+    @return Array of contact numbers.
+    '''
+    if isinstance(message, str):
+        message = message.upper().encode('utf-8')
+
+    codes = np.frombuffer(bytes(message), dtype=np.uint8)
+    codes = np.frombuffer(LETTER_CODES, dtype=np.uint8)[codes]
+    return codes[codes != NOT_A_LETTER]
+
+
+def codes_to_text(codes) -> str:
+    '''
+    Convert an array of contact numbers back into letters.
+    @param codes Array of contact numbers.
+    @return Message as a str.
+    '''
+    return (np.asarray(codes, dtype=np.uint8) + ord('A')).tobytes().decode()
@@ -0,0 +1,199 @@
+'''
+    EnigmaSimulator - A software implementation of the Engima Machine.
+    Copyright (C) 2015-2021 Engima Simulator Development Team
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+'''
+from simulation.rotor_contact import RotorContact
+
+# Number of contacts on a rotor, reflector or plugboard.
+NUMBER_OF_CONTACTS = 26
+
+# Contacts indexed by their contact number, avoids enum value lookups.
+CONTACTS = tuple(RotorContact)
+
+# Marker used in LETTER_CODES for bytes that are not the letters A-Z.
+NOT_A_LETTER = 0xFF
+
+# Contact number for each ASCII byte value, NOT_A_LETTER if it isn't A-Z.
+LETTER_CODES = bytes(byte - ord('A') if ord('A') <= byte <= ord('Z')
+                     else NOT_A_LETTER for byte in range(256))
+
+# Plugboard table used when a machine doesn't have a plugboard.
+IDENTITY_TABLE = bytes(range(NUMBER_OF_CONTACTS))
+
+
+def wiring_to_map(wiring : str) -> list:
+    '''
+    Convert a wiring string (e.g. 'EKMFLGDQVZNTOWYHXUSPAIBRCJ') into a list of
+    contact numbers.
+    @param wiring Wiring string.
+    @return List of output contact numbers indexed by input contact number.
+    '''
+    return [ord(letter) - ord('A') for letter in wiring]
+
+
+def invert_map(contact_map : list) -> list:
+    '''
+    Invert a contact map, so the output contacts can be looked up in reverse.
+    @param contact_map List of contact numbers.
+    @return Inverted list of contact numbers.
+    '''
+    inverse = [0] * NUMBER_OF_CONTACTS
+
+    for contact, output in enumerate(contact_map):
+        inverse[output] = contact
+
+    return inverse
+
+
+def build_rotor_tables(wiring : str, ring_setting : int = 0) -> tuple:
+    '''
+    Build the position keyed lookup tables for a rotor.  Entry
+    [position][contact] gives the contact that leaves the rotor, with the
+    entry and exit offsets for the rotor position and ring setting already
+    applied, so it is identical to Rotor.encrypt() for that position.
+    @param wiring Wiring setting from right to left.
+    @param ring_setting Ring setting (Ringstellung), 0 for 'A' (01).
+    @return Tuple of (forward tables, inverse tables).
+    '''
+    forward_map = wiring_to_map(wiring)
+    inverse_map = invert_map(forward_map)
+
+    # The ring turns the wiring the opposite way to the rotor position.
+    offsets = [(position - ring_setting) % NUMBER_OF_CONTACTS
+               for position in range(NUMBER_OF_CONTACTS)]
+
+    forward = tuple(_shift_map(forward_map, offset) for offset in offsets)
+    inverse = tuple(_shift_map(inverse_map, offset) for offset in offsets)
+
+    return forward, inverse
+
+
+def build_reflector_table(wiring : str) -> bytes:
+    '''
+    Build the lookup table for a reflector.
+    @param wiring Reflector wiring string.
+    @return Table of output contacts indexed by input contact.
+    '''
+    return bytes(wiring_to_map(wiring))
+
+
+def build_plugboard_table(plugboard) -> bytes:
+    '''
+    Build the lookup table for a plugboard from its current plugs.
+    @param plugboard Plugboard instance, None if the machine doesn't have one.
+    @return Table of output contacts indexed by input contact.
+    '''
+    if plugboard is None:
+        return IDENTITY_TABLE
+
+    # A PlugboardPermutation already holds its table.
+    if hasattr(plugboard, 'wiring'):
+        return plugboard.wiring
+
+    return bytes(plugboard.get_plug(contact).value for contact in CONTACTS)
+
+
+def lever_step(notches : tuple, positions : tuple,
+               double_step : bool) -> tuple:
+    '''
+    Step the three stepping rotors of a lever stepped machine for one key
+    press, as Machine._step_rotors() would.
+    @param notches Notch bitmask of each rotor, left to right.
+    @param positions (left, middle, right) stepping rotor positions.
+    @param double_step Whether this key press is a double step.
+    @return Tuple of (positions, double step) after the key press.
+    '''
+    _, notches_1, notches_2 = notches
+    position_0, position_1, position_2 = positions
+
+    will_step_next_rotor = notches_2 >> position_2 & 1
+    position_2 = (position_2 + 1) % NUMBER_OF_CONTACTS
+
+    if double_step:
+        position_0 = (position_0 + 1) % NUMBER_OF_CONTACTS
+        position_1 = (position_1 + 1) % NUMBER_OF_CONTACTS
+        double_step = False
+
+    if will_step_next_rotor:
+        position_1 = (position_1 + 1) % NUMBER_OF_CONTACTS
+        double_step = notches_1 >> position_1 & 1 == 1
+
+    return (position_0, position_1, position_2), double_step
+
+
+def encrypt_lever_buffer(circuit : tuple, positions : tuple,
+                         double_step : bool, buffer,
+                         keep_non_letters : bool) -> tuple:
+    '''
+    Run a buffer of bytes through the lookup tables of a lever stepped
+    circuit, the rotors are stepped as Machine._step_rotors() would.  The
+    state is passed in and returned, so the tables can be shared.
+    @param circuit (forward tables, inverse tables, notches, reflector
+                   table, plugboard table) of the three stepping rotors, see
+                   Machine.lever_circuit().
+    @param positions (left, middle, right) stepping rotor positions.
+    @param double_step Whether the next key press is a double step.
+    @param buffer bytes, bytearray or memoryview of ASCII letters.
+    @param keep_non_letters If True any byte that isn't A-Z is passed
+                            through unchanged, otherwise it is dropped.
+    @return Tuple of (output bytearray, positions, double step).
+    '''
+    # pylint: disable=too-many-locals
+
+    forward, inverse, notches, reflector, plugboard = circuit
+    forward_0, forward_1, forward_2 = forward
+    inverse_0, inverse_1, inverse_2 = inverse
+    _, notches_1, notches_2 = notches
+    position_0, position_1, position_2 = positions
+
+    output = bytearray()
+
+    for byte in memoryview(buffer).cast('B'):
+        letter = LETTER_CODES[byte]
+
+        if letter == NOT_A_LETTER:
+            if keep_non_letters:
+                output.append(byte)
+            continue
+
+        # Step the rotors as lever_step() does.  It is inlined here because
+        # a call per letter roughly doubles the cost of stepping.
+        will_step_next_rotor = notches_2 >> position_2 & 1
+        position_2 = (position_2 + 1) % 26
+
+        if double_step:
+            position_0 = (position_0 + 1) % 26
+            position_1 = (position_1 + 1) % 26
+            double_step = False
+
+        if will_step_next_rotor:
+            position_1 = (position_1 + 1) % 26
+            double_step = notches_1 >> position_1 & 1 == 1
+
+        letter = plugboard[letter]
+        letter = forward_2[position_2][letter]
+        letter = forward_1[position_1][letter]
+        letter = forward_0[position_0][letter]
+        letter = reflector[letter]
+        letter = inverse_0[position_0][letter]
+        letter = inverse_1[position_1][letter]
+        letter = inverse_2[position_2][letter]
+        output.append(plugboard[letter] + 65)
+
+    return output, (position_0, position_1, position_2), double_step
+
+
+def _shift_map(contact_map : list, position : int) -> bytes:
+    return bytes((contact_map[(contact + position) % NUMBER_OF_CONTACTS] -
+                  position) % NUMBER_OF_CONTACTS
+                 for contact in range(NUMBER_OF_CONTACTS))
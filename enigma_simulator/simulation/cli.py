@@ -0,0 +1,219 @@
+'''
+    EnigmaSimulator - A software implementation of the Engima Machine.
+    Copyright (C) 2015-2021 Engima Simulator Development Team
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    enigma-sim command line, run with 'python -m simulation' from the
+    enigma_simulator directory or the enigma-sim script:
+        enigma-sim encrypt --rotors 'I II III' --positions ABC < in > out
+        enigma-sim batch --key-sheet sheet.csv --messages traffic.jsonl \\
+                         --output results.jsonl
+        enigma-sim benchmark --size 1000000
+    Each command only imports the modules it needs, as the command line is
+    typically run once per job and start up time dominates short jobs.
+'''
+# pylint: disable=import-outside-toplevel
+import argparse
+import sys
+
+PROGRAM = 'enigma-sim'
+
+# Bytes read from the input at a time when encrypting.
+READ_SIZE = 64 * 1024
+
+
+def main(arguments : list = None) -> int:
+    '''
+    Run the command line.
+    @param arguments Command line arguments, default sys.argv[1:].
+    @return Exit code.
+    '''
+    options = _parser().parse_args(arguments)
+
+    try:
+        return options.command(options)
+
+    except (OSError, ValueError) as error:
+        print(f'{PROGRAM}: error: {error}', file=sys.stderr)
+        return 1
+
+
+def encrypt_command(options) -> int:
+    ''' Encrypt/decrypt a file or stdin to a file or stdout. '''
+    machine = _create_machine(options)
+    keep_non_letters = not options.drop_non_letters
+
+    with _open(options.input, 'rb', sys.stdin) as source, \
+         _open(options.output, 'wb', sys.stdout) as destination:
+
+        if options.workers:
+            from simulation.parallel import parallel_encrypt_bytes
+
+            destination.write(parallel_encrypt_bytes(
+                machine, source.read().upper(), keep_non_letters,
+                max_workers=options.workers))
+            return 0
+
+        from simulation.streaming import encrypt_chunks
+
+        chunks = (chunk.upper() for chunk in
+                  iter(lambda: source.read(READ_SIZE), b''))
+        for encrypted in encrypt_chunks(machine, chunks, keep_non_letters):
+            destination.write(encrypted)
+
+    return 0
+
+
+def batch_command(options) -> int:
+    ''' Process a month (or more) of traffic by key sheet. '''
+    from simulation.key_sheet import load_key_sheet, read_messages, \
+                                     run_pipeline
+
+    summary = run_pipeline(load_key_sheet(options.key_sheet),
+                           read_messages(options.messages), options.output,
+                           not options.drop_non_letters)
+
+    print(f'{summary.messages} messages, {summary.errors} errors, '
+          f'{summary.days} days', file=sys.stderr)
+    return 1 if summary.errors else 0
+
+
+def benchmark_command(options) -> int:
+    ''' Measure the encryption throughput of a machine. '''
+    import random
+    import time
+
+    machine = _create_machine(options)
+    generator = random.Random(0)
+    message = bytes(generator.randrange(65, 91) for _ in range(options.size))
+
+    best = None
+    for _ in range(options.repeat):
+        start = time.perf_counter()
+        machine.encrypt_bytes(message)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    # A very short run can be below the timer's resolution.
+    rate = options.size / best if best > 0 else float('inf')
+    print(f'{options.size} letters in {best:.6f} s, {rate:,.0f} letters/s')
+    return 0
+
+
+def _create_machine(options):
+    from simulation.enigma_machine import Machine
+    from simulation.key_sheet import parse_positions, parse_ring_settings
+    from simulation.log_policy import LOGGING_OFF
+
+    rotors = options.rotors.split()
+
+    # Logging is off so nothing is mixed into the output on stdout.
+    machine = Machine(log_policy=LOGGING_OFF)
+
+    if not machine.configure(options.model, rotors, options.reflector):
+        raise ValueError(machine.last_error)
+
+    positions = parse_positions(options.positions or 'A' * len(rotors))
+    if len(positions) != len(rotors):
+        raise ValueError("Invalid number of rotor positions")
+
+    for rotor_no, position in enumerate(positions):
+        machine.set_rotor_position(rotor_no, position)
+
+    if options.rings:
+        machine.set_ring_settings(parse_ring_settings(options.rings))
+
+    if options.plugboard:
+        machine.set_plugboard(options.plugboard)
+
+    return machine
+
+
+def _open(name : str, mode : str, standard):
+    import contextlib
+
+    if name == '-':
+        return contextlib.nullcontext(standard.buffer)
+
+    return open(name, mode)  # pylint: disable=unspecified-encoding
+
+
+def _add_machine_arguments(parser) -> None:
+    parser.add_argument('--model', default='Enigma1',
+                        help='Enigma model (default: %(default)s)')
+    parser.add_argument('--rotors', default='I II III',
+                        help='Rotor names left to right '
+                             '(default: %(default)s)')
+    parser.add_argument('--reflector', default='UKW-B',
+                        help='Reflector name (default: %(default)s)')
+    parser.add_argument('--rings',
+                        help="Ring settings 1-26 or letters, e.g. '01 12 26'")
+    parser.add_argument('--positions',
+                        help="Start position letters, e.g. 'ABC'")
+    parser.add_argument('--plugboard',
+                        help="Plugged letter pairs, e.g. 'AB CD EF'")
+
+
+def _positive_int(value : str) -> int:
+    try:
+        number = int(value)
+
+    except ValueError:
+        number = 0
+
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"'{value}' isn't a positive "
+                                         "integer")
+
+    return number
+
+
+def _parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog=PROGRAM,
+                                     description='Enigma machine simulator')
+    commands = parser.add_subparsers(required=True, metavar='command')
+
+    for name in ('encrypt', 'decrypt'):
+        command = commands.add_parser(name, help=f'{name} a message')
+        _add_machine_arguments(command)
+        command.add_argument('-i', '--input', default='-',
+                             help='Input file (default: stdin)')
+        command.add_argument('-o', '--output', default='-',
+                             help='Output file (default: stdout)')
+        command.add_argument('--drop-non-letters', action='store_true',
+                             help='Drop anything that is not a letter')
+        command.add_argument('--workers', type=int,
+                             help='Encrypt across this many processes')
+        command.set_defaults(command=encrypt_command)
+
+    command = commands.add_parser('batch',
+                                  help='process messages by key sheet')
+    command.add_argument('--key-sheet', required=True,
+                         help='Key sheet, JSON or CSV')
+    command.add_argument('--messages', required=True,
+                         help='Messages, JSON lines or CSV')
+    command.add_argument('--output', required=True,
+                         help='Results file, JSON lines')
+    command.add_argument('--drop-non-letters', action='store_true',
+                         help='Drop anything that is not a letter')
+    command.set_defaults(command=batch_command)
+
+    command = commands.add_parser('benchmark',
+                                  help='measure encryption throughput')
+    _add_machine_arguments(command)
+    command.add_argument('--size', type=_positive_int, default=1000000,
+                         help='Letters to encrypt (default: %(default)s)')
+    command.add_argument('--repeat', type=_positive_int, default=3,
+                         help='Best of this many runs (default: %(default)s)')
+    command.set_defaults(command=benchmark_command)
+
+    return parser
@@ -0,0 +1,332 @@
+'''
+    EnigmaSimulator - A software implementation of the Engima Machine.
+    Copyright (C) 2015-2021 Engima Simulator Development Team
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    Scoring of decrypted text held as letter codes 0-25 rather than strings,
+    with NumPy.  The n-gram log probabilities are a dense array indexed by
+    the letter codes of an n-gram read as a base 26 number, so scoring a
+    text is one gather and a sum instead of a dictionary lookup per n-gram.
+
+    TextScore keeps the n-gram fitness and letter counts (for the index of
+    coincidence) of a text up to date as the text is decrypted, and when
+    letters change only the n-grams around them are scored again, e.g. when
+    a plugboard hill-climb swaps a pair of plugs.
+'''
+import math
+import numpy as np
+from simulation.circuit_tables import LETTER_CODES, NUMBER_OF_CONTACTS
+from simulation.scoring import ngram_length, read_ngram_counts
+from simulation.wire_format import encode_letters
+
+# Number of letters decrypted and scored at a time by score_decryption().
+DEFAULT_CHUNK_SIZE = 64 * 1024
+
+
+class NgramTable:
+    '''
+    N-gram log10 probabilities as a dense array of 26^n entries, scores are
+    the same as NgramScorer for text of letters only.  It can be called with
+    a candidate plaintext wherever a scorer is expected, anything that isn't
+    a letter is dropped before scoring.
+    '''
+    __slots__ = ['_floor', '_length', '_log_probabilities']
+
+    @property
+    def length(self) -> int:
+        ''' Property getter : Length of the n-grams (e.g. 4 for quadgrams). '''
+        return self._length
+
+    @property
+    def floor(self) -> float:
+        ''' Property getter : Log probability of an unseen n-gram. '''
+        return self._floor
+
+    def __init__(self, counts : dict):
+        '''
+        @param counts Dictionary of n-gram => count, all n-grams must be the
+                      same length and only letters.
+        '''
+        self._length = ngram_length(counts)
+
+        total = sum(counts.values())
+        self._floor = math.log10(0.01 / total)
+        self._log_probabilities = np.full(NUMBER_OF_CONTACTS ** self._length,
+                                          self._floor)
+
+        for ngram, count in counts.items():
+            codes = encode_letters(ngram)
+            if len(codes) != self._length:
+                raise ValueError(f"N-gram '{ngram}' is not all letters")
+
+            index = 0
+            for code in codes:
+                index = index * NUMBER_OF_CONTACTS + code
+            self._log_probabilities[index] = math.log10(count / total)
+
+    @classmethod
+    def from_file(cls, filename : str):
+        '''
+        Create a table from a file of 'NGRAM COUNT' lines.
+        @param filename Name of the n-gram file.
+        @return NgramTable instance.
+        '''
+        return cls(read_ngram_counts(filename))
+
+    def __call__(self, text) -> float:
+        return self.fitness(encode_letters(text))
+
+    def fitness(self, codes) -> float:
+        '''
+        Score a text by its n-gram fitness.
+        @param codes bytes-like or array of letter codes 0-25.
+        @return Sum of the log10 probabilities of every n-gram.
+        '''
+        return float(self.window_scores(codes).sum())
+
+    def window_scores(self, codes, start : int = 0) -> np.ndarray:
+        '''
+        Score each n-gram of a text.
+        @param codes bytes-like or array of letter codes 0-25.
+        @param start Index of the first n-gram to score.
+        @return Log10 probability of each n-gram from start.
+        '''
+        codes = _as_codes(codes)
+        count = len(codes) - self._length + 1 - start
+
+        if count <= 0:
+            return np.zeros(0)
+
+        indices = codes[start:start + count].astype(np.intp)
+        for offset in range(1, self._length):
+            indices *= NUMBER_OF_CONTACTS
+            indices += codes[start + offset:start + offset + count]
+
+        return self._log_probabilities[indices]
+
+    def scores_at(self, codes : np.ndarray,
+                  starts : np.ndarray) -> np.ndarray:
+        '''
+        Score the n-grams starting at each index of starts.
+        @param codes Array of letter codes 0-25.
+        @param starts Array of n-gram start indexes into codes.
+        @return Log10 probability of each n-gram.
+        '''
+        indices = codes[starts].astype(np.intp)
+        for offset in range(1, self._length):
+            indices *= NUMBER_OF_CONTACTS
+            indices += codes[starts + offset]
+
+        return self._log_probabilities[indices]
+
+
+class TextScore:
+    '''
+    N-gram fitness and letter counts of a text of letter codes, kept up to
+    date as the text is extended or its letters change.  Changes return a
+    token so they can be undone, e.g. when a hill-climb rejects a move.
+    '''
+    __slots__ = ['_codes', '_counts', '_fitness', '_length', '_table',
+                 '_window_count', '_windows']
+
+    @property
+    def codes(self) -> np.ndarray:
+        ''' Property getter : Letter codes of the text, read only. '''
+        codes = self._codes[:self._length]
+        codes.flags.writeable = False
+        return codes
+
+    @property
+    def fitness(self) -> float:
+        ''' Property getter : N-gram fitness, see NgramTable.fitness(). '''
+        return self._fitness
+
+    @property
+    def index_of_coincidence(self) -> float:
+        '''
+        Property getter : Index of coincidence, see
+        scoring.index_of_coincidence().
+        '''
+        length = self._length
+
+        if length < 2:
+            return 0.0
+
+        return float((self._counts * (self._counts - 1)).sum() /
+                     (length * (length - 1)))
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __init__(self, table : NgramTable, codes = b''):
+        '''
+        @param table NgramTable to score with.
+        @param codes Letter codes 0-25 of the text so far.
+        '''
+        self._table = table
+        self._codes = np.zeros(0, dtype=np.uint8)
+        self._length = 0
+        self._counts = np.zeros(NUMBER_OF_CONTACTS, dtype=np.int64)
+        self._windows = np.zeros(0)
+        self._window_count = 0
+        self._fitness = 0.0
+        self.extend(codes)
+
+    def extend(self, codes) -> None:
+        '''
+        Add letters to the end of the text, only the new n-grams are scored.
+        The letters and scores are held in buffers that grow by doubling, so
+        extending a chunk at a time costs time proportional to the chunk.
+        @param codes bytes-like or array of letter codes 0-25.
+        '''
+        codes = _as_codes(codes)
+        if not len(codes):
+            return
+
+        length = self._length + len(codes)
+        self._codes = _reserve(self._codes, length)
+        self._codes[self._length:length] = codes
+        self._length = length
+        self._counts += np.bincount(codes, minlength=NUMBER_OF_CONTACTS)
+
+        scored = self._window_count
+        windows = self._table.window_scores(self._codes[:length], scored)
+        window_count = scored + len(windows)
+        self._windows = _reserve(self._windows, window_count)
+        self._windows[scored:window_count] = windows
+        self._window_count = window_count
+        self._fitness += float(windows.sum())
+
+    def update(self, positions, codes) -> tuple:
+        '''
+        Change letters of the text, only the n-grams that include a changed
+        letter are scored again.  If a position is given more than once its
+        last code is used.
+        @param positions Indexes of the letters to change.
+        @param codes New letter code of each letter.
+        @return Token to pass to undo() to reverse the change.
+        '''
+        positions = np.asarray(positions, dtype=np.intp)
+        codes = np.asarray(codes, dtype=np.uint8)
+
+        if len(positions) != len(codes):
+            raise ValueError("Invalid number of letter codes")
+
+        # The counts and n-gram scores are only right for distinct positions,
+        # the first index of each in the reversed arrays is its last code.
+        if len(positions) > 1:
+            positions, last = np.unique(positions[::-1], return_index=True)
+            codes = codes[::-1][last]
+
+        return self._update(positions, codes)
+
+    def replace(self, codes) -> tuple:
+        '''
+        Replace the text with one of the same length, e.g. the text decrypted
+        with a different plugboard.  Only the letters that differ are
+        changed, see update().
+        @param codes bytes-like or array of letter codes 0-25.
+        @return Token to pass to undo() to reverse the change.
+        '''
+        codes = _as_codes(codes)
+
+        if len(codes) != self._length:
+            raise ValueError("Text length differs")
+
+        positions = np.flatnonzero(codes != self._codes[:self._length])
+        return self._update(positions, codes[positions])
+
+    def undo(self, token : tuple) -> None:
+        '''
+        Reverse a change, changes must be undone in the reverse order.
+        @param token Token returned by update() or replace().
+        '''
+        positions, codes, fitness = token
+
+        self._update(positions, codes)
+        # Scores are summed in a different order, so the fitness is restored
+        # exactly rather than by adding up the differences again.
+        self._fitness = fitness
+
+    def _update(self, positions : np.ndarray, codes : np.ndarray) -> tuple:
+        ''' Change letters at distinct positions, see update(). '''
+        text = self._codes[:self._length]
+        windows = self._windows[:self._window_count]
+
+        old_codes = text[positions]
+        token = (positions, old_codes, self._fitness)
+
+        self._counts -= np.bincount(old_codes, minlength=NUMBER_OF_CONTACTS)
+        self._counts += np.bincount(codes, minlength=NUMBER_OF_CONTACTS)
+        text[positions] = codes
+
+        starts = self._windows_of(positions)
+        scores = self._table.scores_at(text, starts)
+        self._fitness += float(scores.sum() - windows[starts].sum())
+        windows[starts] = scores
+
+        return token
+
+    def _windows_of(self, positions : np.ndarray) -> np.ndarray:
+        ''' Indexes of the n-grams that include any of the positions. '''
+        length = self._table.length
+        starts = (positions[:, None] -
+                  np.arange(length, dtype=np.intp)[None, :]).ravel()
+
+        return np.unique(starts[(starts >= 0) &
+                                (starts < self._window_count)])
+
+
+def score_decryption(machine, ciphertext, table : NgramTable,
+                     chunk_size : int = DEFAULT_CHUNK_SIZE) -> TextScore:
+    '''
+    Decrypt a message and score the plaintext as it is produced, a chunk at a
+    time.  Anything that isn't a letter is dropped.
+    @param machine Configured Machine at the start position, it is stepped
+                   through the message.
+    @param ciphertext str or bytes-like message.
+    @param table NgramTable to score with.
+    @param chunk_size Number of bytes to decrypt at a time.
+    @return TextScore of the plaintext, its codes are the plaintext.
+    '''
+    if chunk_size < 1:
+        raise ValueError("Invalid chunk size")
+
+    if isinstance(ciphertext, str):
+        ciphertext = ciphertext.encode('utf-8')
+
+    ciphertext = memoryview(ciphertext).cast('B')
+    score = TextScore(table)
+
+    for offset in range(0, len(ciphertext), chunk_size):
+        chunk = bytes(ciphertext[offset:offset + chunk_size]).upper()
+        score.extend(machine.encrypt_bytes(chunk, False).translate(
+            LETTER_CODES))
+
+    return score
+
+
+def _reserve(buffer : np.ndarray, size : int) -> np.ndarray:
+    ''' Grow a buffer to hold at least size items, doubling its capacity. '''
+    if size <= len(buffer):
+        return buffer
+
+    grown = np.empty(max(size, 2 * len(buffer)), dtype=buffer.dtype)
+    grown[:len(buffer)] = buffer
+    return grown
+
+
+def _as_codes(codes) -> np.ndarray:
+    if isinstance(codes, np.ndarray):
+        return codes.astype(np.uint8, copy=False)
+
+    return np.frombuffer(codes, dtype=np.uint8)
@@ -0,0 +1,302 @@
+'''
+    EnigmaSimulator - A software implementation of the Engima Machine.
+    Copyright (C) 2015-2021 Engima Simulator Development Team
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+'''
+import collections
+import functools
+import itertools
+from simulation.circuit_tables import build_reflector_table, \
+                                    build_rotor_tables
+from simulation.extended_models import EXTENDED_MODELS, ModelDefinition
+from simulation.stepping import LEVER_STEPPING, LEVER_STEPPING_ROTORS, \
+                                notch_mask, SteppingMode
+
+# Default number of entries kept in each derived artifact cache.
+DEFAULT_CACHE_SIZE = 256
+
+LETTERS = 'ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+
+CustomRotor = collections.namedtuple('CustomRotor',
+                                     ['name', 'wiring', 'notches'])
+CustomReflector = collections.namedtuple('CustomReflector', ['name', 'wiring'])
+
+
+class ComponentRegistry:
+    '''
+    Indexed view of the Enigma models, their rotors and reflectors.  Lookups
+    are dictionary based rather than scanning the model lists, and the
+    artifacts derived from a component (lookup tables, notch masks) are
+    built once and shared between every machine through LRU caches.  The
+    default models are only imported when a model is first looked up, and
+    each model is only indexed when it is used.  Custom models, rotors and
+    reflectors can be registered at runtime.
+    '''
+    __slots__ = ['_models', '_notch_mask', '_reflector_table', '_reflectors',
+                 '_rotor_tables', '_rotors']
+
+    def __init__(self, models : dict = None,
+                 cache_size : int = DEFAULT_CACHE_SIZE):
+        '''
+        @param models Dictionary of model name => model details, default is
+                      ENIGMA_MODELS plus EXTENDED_MODELS.
+        @param cache_size Maximum entries in each derived artifact cache.
+        '''
+        self._models = None if models is None else dict(models)
+        self._rotors = {}
+        self._reflectors = {}
+
+        self._rotor_tables = functools.lru_cache(cache_size)(
+            build_rotor_tables)
+        self._reflector_table = functools.lru_cache(cache_size)(
+            build_reflector_table)
+        self._notch_mask = functools.lru_cache(cache_size)(notch_mask)
+
+    def model(self, model : str):
+        '''
+        Get the details of a model.
+        @param model Model name, e.g. 'Enigma1'.
+        @return Model details.
+        '''
+        models = self._model_table()
+
+        if model not in models:
+            raise ValueError('Enigma model is not valid')
+
+        return models[model]
+
+    def no_of_rotors(self, model : str) -> int:
+        ''' Get the number of rotors a model takes. '''
+        no_of_rotors = self.model(model).no_of_rotors
+
+        # ENIGMA_MODELS uses an enum for the number of rotors.
+        return getattr(no_of_rotors, 'value', no_of_rotors)
+
+    def stepping(self, model : str):
+        '''
+        Get how a model steps, models without a stepping definition use
+        lever stepping of three rotors with a fixed reflector.
+        @param model Model name.
+        @return SteppingDefinition instance.
+        '''
+        return getattr(self.model(model), 'stepping', None) or LEVER_STEPPING
+
+    def rotor_slots(self, model : str):
+        '''
+        Get which rotors fit each slot of a model.
+        @param model Model name.
+        @return Tuple of a set of rotor names per slot, left to right, or
+                None if any rotor of the model fits any slot.
+        '''
+        slots = getattr(self.model(model), 'rotor_slots', None)
+        if slots is None:
+            return None
+
+        return tuple(frozenset(slot) for slot in slots)
+
+    def rotor_orders(self, model : str):
+        '''
+        Get every order of distinct rotors a model can be set up with,
+        respecting which rotors fit each slot.
+        @param model Model name.
+        @return Generator of rotor name tuples, left to right.
+        '''
+        slots = self.rotor_slots(model)
+
+        for order in itertools.permutations(self.rotor_names(model),
+                                            self.no_of_rotors(model)):
+            if slots is None or all(name in slot
+                                    for name, slot in zip(order, slots)):
+                yield order
+
+    def rotor(self, model : str, name : str):
+        '''
+        Get a rotor of a model.
+        @param model Model name.
+        @param name Rotor name.
+        @return Rotor details or None if the model doesn't have the rotor.
+        '''
+        if model not in self._rotors and model in self._model_table():
+            self._index_model(model)
+
+        return self._rotors.get(model, {}).get(name)
+
+    def reflector(self, model : str, name : str):
+        '''
+        Get a reflector of a model.
+        @param model Model name.
+        @param name Reflector name.
+        @return Reflector details or None if the model doesn't have it.
+        '''
+        if model not in self._reflectors and model in self._model_table():
+            self._index_model(model)
+
+        return self._reflectors.get(model, {}).get(name)
+
+    def rotor_names(self, model : str) -> list:
+        ''' Get the names of every rotor of a model, in order. '''
+        self._index_model(model)
+        return list(self._rotors[model])
+
+    def reflector_names(self, model : str) -> list:
+        ''' Get the names of every reflector of a model, in order. '''
+        self._index_model(model)
+        return list(self._reflectors[model])
+
+    def register_model(self, name : str,
+                       definition : ModelDefinition) -> ModelDefinition:
+        '''
+        Register a model, replacing any model with the same name.
+        @param name Model name.
+        @param definition ModelDefinition of the model, its rotors and
+                          reflectors are validated as if registered one at
+                          a time.
+        @return The registered model definition.
+        '''
+        stepping = definition.stepping or LEVER_STEPPING
+
+        if stepping.mode is SteppingMode.LEVER:
+            valid = stepping.stepping_rotors == LEVER_STEPPING_ROTORS and \
+                    not stepping.reflector_rotates
+        else:
+            valid = stepping.stepping_rotors >= 1
+
+        if not valid or stepping.stepping_rotors > definition.no_of_rotors \
+           or (stepping.reflector_rotates and not stepping.reflector_settable):
+            raise ValueError("Model stepping definition is invalid")
+
+        for rotor in definition.rotors:
+            _validate_rotor(rotor.wiring, rotor.notches)
+
+        for reflector in definition.reflectors:
+            _validate_reflector(reflector.wiring)
+
+        if definition.rotor_slots is not None:
+            names = {rotor.name for rotor in definition.rotors}
+            if len(definition.rotor_slots) != definition.no_of_rotors or \
+               any(not set(slot) <= names
+                   for slot in definition.rotor_slots):
+                raise ValueError("Model rotor slots are invalid")
+
+        self._model_table()[name] = definition
+        self._rotors.pop(name, None)
+        self._reflectors.pop(name, None)
+        return definition
+
+    def register_rotor(self, model : str, name : str, wiring : str,
+                       notches) -> CustomRotor:
+        '''
+        Register a custom rotor against a model, replacing any rotor with
+        the same name.
+        @param model Model name.
+        @param name Rotor name.
+        @param wiring Wiring setting from right to left, e.g. 'EKMF...'.
+        @param notches Letters of the turnover notch/notches, empty for a
+                       rotor that never steps the next one (e.g. the M4
+                       Greek wheels).
+        @return The registered rotor details.
+        '''
+        self._index_model(model)
+        _validate_rotor(wiring, notches)
+
+        rotor = CustomRotor(name, wiring, list(notches))
+        self._rotors[model][name] = rotor
+        return rotor
+
+    def register_reflector(self, model : str, name : str,
+                           wiring : str) -> CustomReflector:
+        '''
+        Register a custom reflector against a model, replacing any reflector
+        with the same name.
+        @param model Model name.
+        @param name Reflector name.
+        @param wiring Reflector wiring, every letter must be paired with a
+                      different letter.
+        @return The registered reflector details.
+        '''
+        self._index_model(model)
+        _validate_reflector(wiring)
+
+        reflector = CustomReflector(name, wiring)
+        self._reflectors[model][name] = reflector
+        return reflector
+
+    def rotor_tables(self, wiring : str, ring_setting : int = 0) -> tuple:
+        '''
+        Get the (cached) forward and inverse lookup tables for a rotor wiring
+        and ring setting, see circuit_tables.build_rotor_tables().
+        '''
+        return self._rotor_tables(wiring, ring_setting)
+
+    def reflector_table(self, wiring : str) -> bytes:
+        '''
+        Get the (cached) lookup table for a reflector wiring, see
+        circuit_tables.build_reflector_table().
+        '''
+        return self._reflector_table(wiring)
+
+    def notch_mask(self, notches) -> int:
+        '''
+        Get the (cached) notch bitmask for a rotor, see stepping.notch_mask().
+        @param notches Letters of the turnover notch/notches.
+        @return Bitmask with bit N set for a notch at contact N.
+        '''
+        return self._notch_mask(tuple(notches))
+
+    def cache_info(self) -> dict:
+        ''' Get the hit/miss statistics of the derived artifact caches. '''
+        return {'rotor_tables': self._rotor_tables.cache_info(),
+                'reflector_table': self._reflector_table.cache_info(),
+                'notch_mask': self._notch_mask.cache_info()}
+
+    def _model_table(self) -> dict:
+        if self._models is None:
+            # pylint: disable=import-outside-toplevel
+            from simulation.enigma_models import ENIGMA_MODELS
+            self._models = {**EXTENDED_MODELS, **ENIGMA_MODELS}
+
+        return self._models
+
+    def _index_model(self, name : str) -> None:
+        if name in self._rotors:
+            return
+
+        details = self.model(name)
+        self._rotors[name] = {rotor.name: rotor for rotor in details.rotors}
+        self._reflectors[name] = {reflector.name: reflector
+                                  for reflector in details.reflectors}
+
+
+def _validate_rotor(wiring : str, notches) -> None:
+    _validate_wiring(wiring)
+
+    if any(notch not in LETTERS for notch in notches):
+        raise ValueError("Rotor notches are invalid")
+
+
+def _validate_reflector(wiring : str) -> None:
+    _validate_wiring(wiring)
+
+    for contact, letter in enumerate(wiring):
+        partner = ord(letter) - ord('A')
+        if partner == contact or ord(wiring[partner]) - ord('A') != contact:
+            raise ValueError("Reflector wiring is not paired")
+
+
+def _validate_wiring(wiring : str) -> None:
+    if not isinstance(wiring, str) or \
+       sorted(wiring) != list(LETTERS):
+        raise ValueError("Wiring must contain every letter A-Z exactly once")
+
+
+# Registry shared by every machine.
+REGISTRY = ComponentRegistry()
@@ -0,0 +1,399 @@
+'''
+    EnigmaSimulator - A software implementation of the Engima Machine.
+    Copyright (C) 2015-2021 Engima Simulator Development Team
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    Crib menus, the method of the Bombe.  A crib (known plaintext) can only
+    sit where no letter of it meets the same ciphertext letter, as the
+    Enigma never encrypts a letter to itself, so most alignments are ruled
+    out at once.  The crib and ciphertext letters of an alignment are the
+    nodes of the menu, each letter pair is an edge labelled with the key
+    press that joins them.
+
+    With the plugboard P, an edge (a, b) at key press i means
+    P[b] = core_i[P[a]], core_i being the rotor core (rotors and reflector)
+    at that key press.  A start position is tested by guessing the plug of
+    the menu's test letter and following the edges; a guess that leads to
+    two plugs for one letter, or to plugs that aren't pairs, is ruled out.
+    Positions where every guess is ruled out are rejected, the rest are
+    stops, with the plugs their surviving guesses imply.  The loops of the
+    menu are what rule guesses out, so longer cribs with more loops give
+    fewer false stops.
+
+    The rotor cores of every start position are taken from a
+    PositionCache table and all positions are tested at once with NumPy,
+    rather than decrypting a trial message per position.
+'''
+import collections
+import itertools
+import numpy as np
+from simulation.circuit_tables import NUMBER_OF_CONTACTS
+from simulation.position_cache import PositionCache
+from simulation.stepping import LEVER_STEPPING_ROTORS, SteppingMode
+from simulation.wire_format import encode_letters
+
+MenuEdge = collections.namedtuple('MenuEdge', ['plain', 'cipher', 'index'])
+
+MenuStop = collections.namedtuple(
+    'MenuStop', ['rotors', 'reflector', 'positions', 'ring_settings',
+                 'steckers', 'plugs'])
+
+# Number of start positions tested at a time, bounding the memory used.
+DEFAULT_BLOCK_SIZE = 1024
+
+_UNKNOWN = -1
+
+# Offset of each contact in a row of a PositionCache table.
+_CONTACT_OFFSETS = np.arange(NUMBER_OF_CONTACTS)
+
+
+def crib_alignments(ciphertext : str, crib : str) -> list:
+    '''
+    Find where a crib could sit in a ciphertext, i.e. where no letter of
+    the crib is the same as the ciphertext letter it meets.  Anything that
+    isn't a letter is dropped from both.
+    @param ciphertext Message.
+    @param crib Known plaintext.
+    @return Letter offsets into the ciphertext the crib could start at.
+    '''
+    ciphertext = encode_letters(ciphertext)
+    crib = encode_letters(crib)
+
+    return [offset for offset in range(len(ciphertext) - len(crib) + 1)
+            if all(map(int.__ne__, crib,
+                       ciphertext[offset:offset + len(crib)]))]
+
+
+class Menu:
+    '''
+    Menu of a crib at one alignment, the graph of letter pairs that the
+    rotor core joins at each key press.
+    '''
+    __slots__ = ['_edges', '_offset']
+
+    @property
+    def edges(self) -> tuple:
+        '''
+        Property getter : MenuEdge of each crib letter, as letter codes
+        0-25 and the key press from the start of the message.
+        '''
+        return self._edges
+
+    @property
+    def offset(self) -> int:
+        ''' Property getter : Letter offset of the crib in the message. '''
+        return self._offset
+
+    @property
+    def letters(self) -> tuple:
+        ''' Property getter : Letter codes of the menu, in order. '''
+        return tuple(sorted({letter for edge in self._edges
+                             for letter in edge[:2]}))
+
+    @property
+    def loops(self) -> int:
+        ''' Property getter : Number of independent loops in the menu. '''
+        return len(self._edges) - len(self.letters) + \
+            len(self.components())
+
+    @property
+    def test_letter(self) -> int:
+        '''
+        Property getter : Letter code the plug guesses are made for, the
+        letter with the most edges in the largest part of the menu.
+        '''
+        degrees = collections.Counter(letter for edge in self._edges
+                                      for letter in edge[:2])
+        component = max(self.components(), key=len)
+
+        return max(sorted(component), key=degrees.__getitem__)
+
+    def __len__(self) -> int:
+        return len(self._edges)
+
+    def __init__(self, ciphertext : str, crib : str, offset : int = 0):
+        '''
+        @param ciphertext Message, anything that isn't a letter is dropped.
+        @param crib Known plaintext, as ciphertext.
+        @param offset Letter offset of the crib in the message.
+        '''
+        ciphertext = encode_letters(ciphertext)
+        crib = encode_letters(crib)
+
+        if not crib:
+            raise ValueError("No crib specified")
+
+        if offset < 0 or offset + len(crib) > len(ciphertext):
+            raise ValueError("Crib doesn't fit the ciphertext")
+
+        edges = []
+        for index, (plain, cipher) in enumerate(
+                zip(crib, ciphertext[offset:offset + len(crib)]), offset):
+            if plain == cipher:
+                raise ValueError(f"Crib letter '{chr(plain + 65)}' can't "
+                                 f"encrypt to itself at {index}")
+            edges.append(MenuEdge(plain, cipher, index))
+
+        self._edges = tuple(edges)
+        self._offset = offset
+
+    def components(self) -> list:
+        '''
+        Get the connected parts of the menu.
+        @return List of sets of letter codes.
+        '''
+        parents = {}
+
+        def root(letter):
+            while parents.setdefault(letter, letter) != letter:
+                letter = parents[letter]
+            return letter
+
+        for plain, cipher, _ in self._edges:
+            parents[root(plain)] = root(cipher)
+
+        components = collections.defaultdict(set)
+        for letter in list(parents):
+            components[root(letter)].add(letter)
+
+        return list(components.values())
+
+
+def search_menu(machine, menu : Menu, positions = None,
+                position_cache : PositionCache = None,
+                block_size : int = DEFAULT_BLOCK_SIZE) -> list:
+    '''
+    Test start positions of a machine against a menu.
+    @param machine Configured lever stepped Machine, its rotor order,
+                   reflector and ring settings are tested.  It isn't
+                   changed, its positions and plugboard are ignored.
+    @param menu Menu of the crib.
+    @param positions Start positions to test, each for every rotor, left to
+                     right.  Default is every position.
+    @param position_cache PositionCache to take the rotor cores from,
+                          default is a new one.
+    @param block_size Number of start positions tested at a time.
+    @return List of MenuStop, one per surviving plug guess.
+    '''
+    if machine.stepping.mode is not SteppingMode.LEVER:
+        raise ValueError("Menu search requires lever stepping")
+
+    if block_size < 1:
+        raise ValueError("Invalid block size")
+
+    state = machine.snapshot()
+    groups = _group_positions(positions, len(state.positions))
+
+    if position_cache is None:
+        position_cache = PositionCache(max_tables=1)
+
+    core_machine = machine.clone()
+    core_machine.set_plugboard(None)
+    stops = []
+
+    for fixed_positions, stepping_positions in groups.items():
+        for rotor_no, position in enumerate(fixed_positions):
+            core_machine.set_rotor_position(rotor_no, position)
+
+        for start_positions, steckers in _search_circuit(
+                core_machine.lever_circuit(),
+                state.ring_settings[len(fixed_positions):],
+                stepping_positions, menu, position_cache, block_size):
+            stops.append(_menu_stop(machine.configuration,
+                                    state.ring_settings,
+                                    fixed_positions + start_positions,
+                                    steckers))
+
+    return stops
+
+
+def _group_positions(positions, no_of_rotors : int) -> dict:
+    '''
+    Group start positions by the positions of the rotors that don't step,
+    they are folded into the reflector so each of their positions is a
+    different circuit.
+    @return Dictionary of fixed positions => list of stepping positions.
+    '''
+    fixed = no_of_rotors - LEVER_STEPPING_ROTORS
+
+    if positions is None:
+        positions = itertools.product(range(NUMBER_OF_CONTACTS),
+                                      repeat=no_of_rotors)
+
+    groups = collections.defaultdict(list)
+    for position in positions:
+        position = tuple(position)
+        if len(position) != no_of_rotors:
+            raise ValueError("Invalid number of rotor positions")
+        groups[position[:fixed]].append(position[fixed:])
+
+    return groups
+
+
+def _search_circuit(circuit : tuple, ring_settings : tuple,
+                    stepping_positions : list, menu : Menu,
+                    position_cache : PositionCache, block_size : int):
+    '''
+    Test start positions of the stepping rotors of one circuit, a block at a
+    time.
+    @return Generator of (stepping rotor positions, steckers dictionary)
+            for every guess that isn't ruled out.
+    '''
+    # pylint: disable=too-many-arguments
+    table = position_cache.table(circuit, ring_settings)
+
+    for start in range(0, len(stepping_positions), block_size):
+        block = np.array(stepping_positions[start:start + block_size],
+                         dtype=np.intp)
+        cores = _menu_cores(table, circuit[2], ring_settings, block, menu)
+
+        for row, steckers in _test_menu(cores, menu):
+            yield tuple(int(position) for position in block[row]), steckers
+
+
+def _menu_stop(configuration : tuple, ring_settings : tuple,
+               positions : tuple, steckers : dict) -> MenuStop:
+    ''' Create the MenuStop of a surviving guess. '''
+    _, rotors, reflector = configuration
+    plugs = ' '.join(chr(letter + 65) + chr(partner + 65)
+                     for letter, partner in steckers.items()
+                     if letter < partner)
+
+    return MenuStop(tuple(rotors), reflector, positions, ring_settings,
+                    {chr(letter + 65): chr(partner + 65)
+                     for letter, partner in steckers.items()},
+                    plugs)
+
+
+def _menu_cores(table : np.ndarray, notches : tuple, ring_settings : tuple,
+                positions : np.ndarray, menu : Menu) -> np.ndarray:
+    '''
+    Step the rotors from every start position at once and take the rotor
+    core at each key press of the menu.
+    @return uint8 array of [edge][start position][contact].
+    '''
+    _, notches_1, notches_2 = notches
+    position_0, position_1, position_2 = (positions[:, 0].copy(),
+                                          positions[:, 1].copy(),
+                                          positions[:, 2].copy())
+    double_step = np.zeros(len(positions), dtype=np.bool_)
+    rows = {}
+    presses = {edge.index for edge in menu.edges}
+
+    for press in range(max(presses) + 1):
+        # Step the rotors, see Machine._step_rotors() for details.
+        will_step_next_rotor = (notches_2 >> position_2 & 1).astype(np.bool_)
+        position_2 = (position_2 + 1) % NUMBER_OF_CONTACTS
+
+        position_0 = (position_0 + double_step) % NUMBER_OF_CONTACTS
+        position_1 = (position_1 + double_step + will_step_next_rotor) % \
+            NUMBER_OF_CONTACTS
+        double_step = will_step_next_rotor & \
+            (notches_1 >> position_1 & 1).astype(np.bool_)
+
+        if press in presses:
+            rows[press] = (((position_0 - ring_settings[0]) % 26 * 26 +
+                            (position_1 - ring_settings[1]) % 26) * 26 +
+                           (position_2 - ring_settings[2]) % 26) * 26
+
+    return np.stack([table[rows[edge.index][:, None] + _CONTACT_OFFSETS]
+                     for edge in menu.edges])
+
+
+def _test_menu(cores : np.ndarray, menu : Menu):
+    '''
+    Test every plug guess of the menu's test letter at every start position
+    of a block.
+    @param cores Rotor cores, see _menu_cores().
+    @return Generator of (start position row, steckers dictionary) for
+            every guess that isn't ruled out.
+    '''
+    count = cores.shape[1]
+
+    # steckers[letter][row][guess] is the plug of the letter implied by the
+    # guess, or _UNKNOWN.
+    steckers = np.full((NUMBER_OF_CONTACTS, count, NUMBER_OF_CONTACTS),
+                       _UNKNOWN, dtype=np.int8)
+    steckers[menu.test_letter] = np.arange(NUMBER_OF_CONTACTS,
+                                           dtype=np.int8)
+    ruled_out = np.zeros((count, NUMBER_OF_CONTACTS), dtype=np.bool_)
+    rows, guesses = np.indices((count, NUMBER_OF_CONTACTS))
+    changed = True
+
+    while changed:
+        changed = _follow_edges(cores, menu, steckers, ruled_out)
+        changed |= _pair_plugs(steckers, ruled_out, rows, guesses)
+
+    for row, guess in zip(*np.nonzero(~ruled_out)):
+        implied = steckers[:, row, guess]
+        yield int(row), {letter: int(plug) for letter, plug
+                         in enumerate(implied) if plug != _UNKNOWN}
+
+
+def _follow_edges(cores : np.ndarray, menu : Menu, steckers : np.ndarray,
+                  ruled_out : np.ndarray) -> bool:
+    '''
+    Follow each edge of the menu both ways, as the rotor core is an
+    involution, recording the plugs it implies and ruling out guesses that
+    disagree with a plug already known.
+    @return Whether any new plug was recorded.
+    '''
+    changed = False
+
+    for core, edge in zip(cores, menu.edges):
+        for first, second in ((edge.plain, edge.cipher),
+                              (edge.cipher, edge.plain)):
+            plugs = steckers[first]
+            known = (plugs != _UNKNOWN) & ~ruled_out
+            implied = np.take_along_axis(
+                core, np.where(known, plugs, 0).astype(np.intp),
+                axis=1).astype(np.int8)
+
+            current = steckers[second]
+            ruled_out[known & (current != _UNKNOWN) &
+                      (current != implied)] = True
+            unknown = known & (current == _UNKNOWN)
+            current[unknown] = implied[unknown]
+            changed |= bool(unknown.any())
+
+    return changed
+
+
+def _pair_plugs(steckers : np.ndarray, ruled_out : np.ndarray,
+                rows : np.ndarray, guesses : np.ndarray) -> bool:
+    '''
+    The plugboard swaps pairs: if a is plugged to b, b is plugged to a.
+    Record the partner of each known plug, ruling out guesses where the
+    partner already has a different plug.
+    @return Whether any new plug was recorded.
+    '''
+    changed = False
+
+    for letter in range(NUMBER_OF_CONTACTS):
+        plugs = steckers[letter]
+        known = (plugs != _UNKNOWN) & ~ruled_out
+        if not known.any():
+            continue
+
+        partners = plugs[known].astype(np.intp)
+        known_rows, known_guesses = rows[known], guesses[known]
+        current = steckers[partners, known_rows, known_guesses]
+        clash = (current != _UNKNOWN) & (current != letter)
+        ruled_out[known_rows[clash], known_guesses[clash]] = True
+
+        unknown = current == _UNKNOWN
+        if unknown.any():
+            steckers[partners[unknown], known_rows[unknown],
+                     known_guesses[unknown]] = letter
+            changed = True
+
+    return changed
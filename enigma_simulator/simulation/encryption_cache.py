@@ -0,0 +1,223 @@
+'''
+    EnigmaSimulator - A software implementation of the Engima Machine.
+    Copyright (C) 2015-2021 Engima Simulator Development Team
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    Memo of encrypted messages for traffic that repeats the same (settings,
+    message) pairs, e.g. indicator groups and message keys under the same
+    daily settings.  Results are keyed on a digest of the model, rotor
+    order, reflector, ring settings, positions, plugboard and message, and
+    the least recently used results are evicted once the memo is full.
+'''
+import collections
+import hashlib
+import threading
+from simulation.circuit_tables import IDENTITY_TABLE
+from simulation.enigma_machine import Machine, MachineState
+from simulation.plugboard_permutation import PlugboardPermutation
+
+# Default maximum number of memoised messages.
+DEFAULT_MAX_ENTRIES = 4096
+
+# Default longest message that is memoised, longer messages rarely repeat
+# and would use most of the memory.
+DEFAULT_MAX_MESSAGE_LENGTH = 1024
+
+CacheStatistics = collections.namedtuple(
+    'CacheStatistics', ['hits', 'misses', 'evictions', 'entries',
+                        'max_entries'])
+
+# Memoised result: encrypted text and the machine state after encrypting.
+_Entry = collections.namedtuple('_Entry', ['output', 'state'])
+
+
+class EncryptionCache:
+    '''
+    Thread-safe LRU memo of encrypted messages.  A message is only ever
+    encrypted outside of the lock, so two threads missing on the same key
+    may both encrypt it; the result is the same either way.
+    '''
+    __slots__ = ['_entries', '_evictions', '_hits', '_lock',
+                 '_max_entries', '_max_message_length', '_misses']
+
+    def __init__(self, max_entries : int = DEFAULT_MAX_ENTRIES,
+                 max_message_length : int = DEFAULT_MAX_MESSAGE_LENGTH):
+        '''
+        @param max_entries Maximum number of memoised messages.
+        @param max_message_length Longest message (in characters) that is
+                                  memoised, longer ones are always encrypted.
+        '''
+        if max_entries < 1:
+            raise ValueError("Cache must hold at least one entry")
+
+        self._max_entries = max_entries
+        self._max_message_length = max_message_length
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def encrypt(self, machine : Machine, text : str,
+                keep_non_letters : bool = True) -> str:
+        '''
+        Encrypt a message with a configured machine, as Machine.encrypt().
+        On a hit the machine is moved to the state it would be in after
+        encrypting the message.
+        @param machine Configured machine, in the state to encrypt from.
+        @param text Message to encrypt.
+        @param keep_non_letters See Machine.encrypt().
+        @return Encrypted message.
+        '''
+        if len(text) > self._max_message_length:
+            return machine.encrypt(text, keep_non_letters)
+
+        key = message_key(machine.configuration, machine.snapshot(), text,
+                          keep_non_letters)
+        entry = self._get(key)
+
+        if entry is None:
+            output = machine.encrypt(text, keep_non_letters)
+            self._put(key, _Entry(output, machine.snapshot()))
+            return output
+
+        machine.restore(entry.state)
+        return entry.output
+
+    def encrypt_message(self, model : str, rotors, reflector : str,
+                        text : str, *, positions=None, ring_settings=None,
+                        plugboard : str = None,
+                        keep_non_letters : bool = True) -> str:
+        '''
+        Encrypt a message from its settings, a machine is only configured
+        when the message isn't memoised.
+        @param model Model name.
+        @param rotors Rotor names, left to right.
+        @param reflector Reflector name.
+        @param text Message to encrypt.
+        @param positions Rotor positions 0-25, left to right, default all 0.
+        @param ring_settings Ring settings 0-25, left to right, default all
+                             0.
+        @param plugboard Plugged letter pairs (see
+                         PlugboardPermutation.from_pairs()), default none.
+        @param keep_non_letters See Machine.encrypt().
+        @return Encrypted message.
+        '''
+        # pylint: disable=too-many-arguments
+        rotors = tuple(rotors)
+        state = _settings_state(len(rotors), positions, ring_settings,
+                                plugboard)
+
+        cached = len(text) <= self._max_message_length
+        if cached:
+            key = message_key((model, rotors, reflector), state, text,
+                              keep_non_letters)
+            entry = self._get(key)
+            if entry is not None:
+                return entry.output
+
+        machine = Machine()
+        if not machine.configure(model, list(rotors), reflector):
+            raise ValueError(machine.last_error)
+
+        machine.restore(state)
+        output = machine.encrypt(text, keep_non_letters)
+
+        if cached:
+            self._put(key, _Entry(output, machine.snapshot()))
+
+        return output
+
+    def cache_info(self) -> CacheStatistics:
+        ''' Get the hit/miss statistics of the memo. '''
+        with self._lock:
+            return CacheStatistics(self._hits, self._misses,
+                                   self._evictions, len(self._entries),
+                                   self._max_entries)
+
+    def clear(self) -> None:
+        ''' Remove every entry and reset the statistics. '''
+        with self._lock:
+            self._entries.clear()
+            self._hits = 0
+            self._misses = 0
+            self._evictions = 0
+
+    def _get(self, key : bytes):
+        with self._lock:
+            entry = self._entries.get(key)
+
+            if entry is None:
+                self._misses += 1
+            else:
+                self._hits += 1
+                self._entries.move_to_end(key)
+
+            return entry
+
+    def _put(self, key : bytes, entry : _Entry) -> None:
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+
+def message_key(configuration : tuple, state : MachineState, text : str,
+                keep_non_letters : bool) -> bytes:
+    '''
+    Get the canonical key of a message, a digest of everything that decides
+    its encryption.
+    @param configuration (model, rotors, reflector), see
+                         Machine.configuration.
+    @param state MachineState the message is encrypted from.
+    @param text Message to encrypt.
+    @param keep_non_letters See Machine.encrypt().
+    @return 16 byte digest.
+    '''
+    model, rotors, reflector = configuration
+    settings = (model, tuple(rotors), reflector, tuple(state.positions),
+                tuple(state.ring_settings), bool(state.double_step),
+                state.reflector_position, keep_non_letters)
+
+    # A plugboard without any plugs is the same as no plugboard.
+    plugboard = state.plugboard
+    if plugboard is not None and bytes(plugboard) == IDENTITY_TABLE:
+        plugboard = None
+
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(repr(settings).encode('utf-8'))
+    digest.update(b'\0' if plugboard is None else b'\1' + bytes(plugboard))
+    digest.update(text.upper().encode('utf-8'))
+    return digest.digest()
+
+
+def _settings_state(no_of_rotors : int, positions, ring_settings,
+                    plugboard : str) -> MachineState:
+    positions = tuple(positions or (0,) * no_of_rotors)
+    ring_settings = tuple(ring_settings or (0,) * no_of_rotors)
+
+    for name, values in (('rotor positions', positions),
+                         ('ring settings', ring_settings)):
+        if len(values) != no_of_rotors:
+            raise ValueError(f"Expected {no_of_rotors} {name}, got "
+                             f"{len(values)}")
+
+        if any(value < 0 or value > 25 for value in values):
+            raise ValueError(f"Invalid {name}")
+
+    if plugboard is not None:
+        plugboard = PlugboardPermutation.from_pairs(plugboard).wiring
+
+    return MachineState(positions, ring_settings, False, plugboard)
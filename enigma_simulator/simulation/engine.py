@@ -0,0 +1,199 @@
+'''
+    EnigmaSimulator - A software implementation of the Engima Machine.
+    Copyright (C) 2015-2021 Engima Simulator Development Team
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    Reentrant encryption engine for concurrent servers.  A CompiledMachine
+    holds the immutable part of a configured machine (wiring tables,
+    notches, reflector and plugboard) and is shared read-only, each thread
+    or asyncio task encrypts through its own Session, a cursor holding only
+    the rotor positions and double-step flag.  No locks are taken.
+'''
+import itertools
+from simulation.circuit_tables import CONTACTS, encrypt_lever_buffer
+from simulation.enigma_machine import Machine
+from simulation.rotor_contact import RotorContact
+from simulation.stepping import LEVER_STEPPING_ROTORS, SteppingMode
+
+
+class CompiledMachine:
+    '''
+    Immutable compiled configuration of a lever stepped machine.  The rotors
+    that don't step (e.g. the M4 Greek wheel) are folded into the reflector,
+    a circuit is compiled for each of their positions.
+    '''
+    __slots__ = ['_circuits', '_configuration', '_fixed', '_no_of_rotors',
+                 '_plugboard', '_ring_settings']
+
+    @property
+    def configuration(self) -> tuple:
+        ''' Property getter : (model, rotors, reflector) compiled. '''
+        return self._configuration
+
+    @property
+    def ring_settings(self) -> tuple:
+        ''' Property getter : Ring settings 0-25, left to right. '''
+        return self._ring_settings
+
+    @property
+    def plugboard(self) -> bytes:
+        ''' Property getter : Plugboard wiring, None if there isn't one. '''
+        return self._plugboard
+
+    def __init__(self, model : str, rotors, reflector : str,
+                 ring_settings = None, plugboard = None):
+        '''
+        @param model Model name, the model must use lever stepping.
+        @param rotors Rotor names, left to right.
+        @param reflector Reflector name.
+        @param ring_settings Ring settings 0-25, left to right, default 0.
+        @param plugboard Plugged letter pairs (see
+                         PlugboardPermutation.from_pairs()), default none.
+        '''
+        machine = Machine()
+        if not machine.configure(model, list(rotors), reflector):
+            raise ValueError(machine.last_error)
+
+        if machine.stepping.mode is not SteppingMode.LEVER:
+            raise ValueError("Compiled machines require lever stepping")
+
+        no_of_rotors = len(rotors)
+        ring_settings = tuple(ring_settings or (0,) * no_of_rotors)
+        machine.set_ring_settings(ring_settings)
+        machine.set_plugboard(plugboard)
+        fixed = no_of_rotors - LEVER_STEPPING_ROTORS
+
+        # One circuit per position of the fixed rotors, the tables of the
+        # stepping rotors are shared between them.
+        circuits = {}
+        for fixed_positions in itertools.product(range(26), repeat=fixed):
+            for rotor_no, position in enumerate(fixed_positions):
+                machine.set_rotor_position(rotor_no, position)
+            circuits[fixed_positions] = machine.lever_circuit()
+
+        self._circuits = circuits
+        self._configuration = (model, tuple(rotors), reflector)
+        self._fixed = fixed
+        self._no_of_rotors = no_of_rotors
+        self._plugboard = machine.snapshot().plugboard
+        self._ring_settings = ring_settings
+
+    def session(self, positions = None):
+        '''
+        Start a session, the cursor used to encrypt with this machine.
+        @param positions Rotor positions 0-25, left to right, default 0.
+        @return New Session instance.
+        '''
+        return Session(self, positions or (0,) * self._no_of_rotors)
+
+    def encrypt(self, text : str, positions,
+                keep_non_letters : bool = True) -> str:
+        '''
+        Encrypt/decrypt a message from the given start positions.
+        @param text Message to encrypt, it is converted to upper case.
+        @param positions Rotor positions 0-25, left to right.
+        @param keep_non_letters See Machine.encrypt().
+        @return Encrypted message.
+        '''
+        return self.session(positions).encrypt(text, keep_non_letters)
+
+    def circuit(self, positions : tuple) -> tuple:
+        '''
+        Get the circuit for the given rotor positions, as
+        Machine.lever_circuit() would return it.  Only the positions of the
+        rotors that don't step select the circuit.
+        @param positions Rotor positions 0-25, left to right.
+        @return Tuple of (forward tables, inverse tables, notches, reflector
+                table, plugboard table).
+        '''
+        if len(positions) != self._no_of_rotors or \
+           any(not 0 <= position <= 25 for position in positions):
+            raise ValueError("Rotor positions are invalid")
+
+        return self._circuits[positions[:self._fixed]]
+
+
+class Session:
+    '''
+    Cursor of one encryption session with a CompiledMachine: the rotor
+    positions and double-step flag.  A session isn't shared between threads
+    but any number of sessions can use the same compiled machine at once.
+    '''
+    __slots__ = ['_circuit', '_compiled', '_double_step', '_fixed_positions',
+                 '_positions']
+
+    @property
+    def compiled(self) -> CompiledMachine:
+        ''' Property getter : The compiled machine. '''
+        return self._compiled
+
+    @property
+    def positions(self) -> tuple:
+        ''' Property getter : Rotor positions 0-25, left to right. '''
+        return self._fixed_positions + self._positions
+
+    @property
+    def double_step(self) -> bool:
+        ''' Property getter : Whether the next key press double steps. '''
+        return self._double_step
+
+    def __init__(self, compiled : CompiledMachine, positions):
+        '''
+        @param compiled CompiledMachine to encrypt with.
+        @param positions Rotor positions 0-25, left to right.
+        '''
+        self._compiled = compiled
+        self.set_positions(positions)
+
+    def set_positions(self, positions) -> None:
+        '''
+        Move the rotors, this also clears a pending double step.
+        @param positions Rotor positions 0-25, left to right.
+        '''
+        positions = tuple(positions)
+        self._circuit = self._compiled.circuit(positions)
+
+        fixed = len(positions) - LEVER_STEPPING_ROTORS
+        self._fixed_positions = positions[:fixed]
+        self._positions = positions[fixed:]
+        self._double_step = False
+
+    def press_key(self, key : RotorContact) -> RotorContact:
+        '''
+        Press a key, see Machine.press_key().
+        @param key Key to encode.
+        @return Encoded character.
+        '''
+        return CONTACTS[self.encrypt_bytes(bytes([key.value + 65]))[0] - 65]
+
+    def encrypt(self, text : str, keep_non_letters : bool = True) -> str:
+        '''
+        Encrypt/decrypt a message, see Machine.encrypt().
+        @param text Message to encrypt, it is converted to upper case.
+        @param keep_non_letters See Machine.encrypt().
+        @return Encrypted message.
+        '''
+        return self.encrypt_bytes(text.upper().encode('utf-8'),
+                                  keep_non_letters).decode('utf-8')
+
+    def encrypt_bytes(self, buffer, keep_non_letters : bool = True) -> bytes:
+        '''
+        Encrypt/decrypt a buffer of ASCII letter codes (A-Z), see
+        Machine.encrypt_bytes().
+        @param buffer bytes, bytearray or memoryview to encrypt.
+        @param keep_non_letters See Machine.encrypt_bytes().
+        @return Encrypted bytes.
+        '''
+        output, self._positions, self._double_step = encrypt_lever_buffer(
+            self._circuit, self._positions, self._double_step, buffer,
+            keep_non_letters)
+        return bytes(output)
@@ -12,24 +12,66 @@
     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
     GNU General Public License for more details.
 '''
-from simulation.enigma_models import ENIGMA_MODELS
-from simulation.logger import Logger
+import collections
+import copy
+from simulation.circuit_tables import build_plugboard_table, CONTACTS, \
+                                    encrypt_lever_buffer, LETTER_CODES, \
+                                    NOT_A_LETTER, NUMBER_OF_CONTACTS
+from simulation.component_registry import REGISTRY
+from simulation.log_policy import LOGGING_OFF, LogPolicy
 from simulation.plugboard import Plugboard
-from simulation.reflector import Reflector
+from simulation.plugboard_permutation import PlugboardPermutation
+from simulation.reflector_permutation import ReflectorPermutation
 from simulation.rotor import Rotor
 from simulation.rotor_contact import RotorContact
+from simulation.stepping import LEVER_STEPPING, LEVER_STEPPING_ROTORS, \
+                                SteppingMode
+
+MachineState = collections.namedtuple(
+    'MachineState', ['positions', 'ring_settings', 'double_step', 'plugboard',
+                     'reflector_position'], defaults=(0,))
+MachineState.__doc__ = '''
+    Immutable snapshot of the mutable state of a machine: rotor positions and
+    ring settings (left to right), the double-step flag, the plugboard
+    wiring as a 26 byte permutation (None if there is no plugboard) and the
+    reflector position.
+'''
 
 class Machine:
     ''' Implementation of the Enigma machine mechanics. '''
     # pylint: disable=too-many-instance-attributes
 
-    __slots__ = ['_double_step', '_is_configured', '_last_error', '_logger',
-                 '_model_details', '_plugboard', '_reflector', '_rotors']
+    __slots__ = ['_configuration', '_double_step', '_forward_tables',
+                 '_instrumentation', '_inverse_tables', '_is_configured',
+                 '_last_error', '_log_policy', '_model_details', '_notches',
+                 '_plugboard', '_position_cache', '_reflector',
+                 '_reflector_position', '_reflector_tables', '_rotors',
+                 '_sequence', '_sequence_index', '_stepping',
+                 '_use_step_sequence']
 
     @property
     def configured(self):
         return self._is_configured
 
+    @property
+    def configuration(self) -> tuple:
+        '''
+        Get the (model, rotors, reflector) the machine was configured with,
+        the machine can be rebuilt from it and a snapshot, e.g. in another
+        process.
+        '''
+        return self._configuration
+
+    @property
+    def instrumentation(self):
+        ''' Get the Instrumentation of the machine, None if it has none. '''
+        return self._instrumentation
+
+    @property
+    def position_cache(self):
+        ''' Get the PositionCache of the machine, None if it has none. '''
+        return self._position_cache
+
     @property
     def last_error(self):
         ''' Get the last reported error in human-readable form. '''
@@ -48,60 +90,118 @@ class Machine:
         ''' Get the instance of the reflector. '''
         return self._reflector
 
-    def __init__(self):
+    @property
+    def stepping(self):
+        ''' Get how the machine steps, a SteppingDefinition. '''
+        return self._stepping
+
+    @property
+    def uses_step_sequence(self) -> bool:
+        ''' Get whether the rotors step from a step sequence. '''
+        return self._use_step_sequence
+
+    def __init__(self, log_policy : LogPolicy = None):
+        '''
+        Machine constructor.
+        @param log_policy Logging policy for the debug output of configure()
+                          and each key press, default is off.  When the
+                          policy is enabled every key press is passed through
+                          the rotor objects one at a time and logged,
+                          otherwise the precomputed lookup tables are used
+                          with no logging cost.
+        '''
         self._model_details = None
+        self._configuration = None
         self._double_step = False
+        self._instrumentation = None
         self._last_error = ''
         self._plugboard = None
+        self._position_cache = None
         self._reflector = None
-        self._rotors = []
+        self._rotors = ()
         self._is_configured = False
-        self._logger = Logger(__name__, write_to_console = True)
+        self._log_policy = log_policy or LOGGING_OFF
+        self._forward_tables = ()
+        self._inverse_tables = ()
+        self._notches = ()
+        self._reflector_tables = None
+        self._reflector_position = 0
+        self._stepping = LEVER_STEPPING
+        self._use_step_sequence = False
+        self._sequence = None
+        self._sequence_index = 0
 
     def configure(self, model : str, rotors, reflector):
 
-        if model not in ENIGMA_MODELS:
-            raise ValueError('Enigma model is not valid')
+        self._model_details = REGISTRY.model(model)
 
-        self._model_details = ENIGMA_MODELS[model]
+        log = self._log_policy
+        if log.enabled:
+            log.debug("Configuring machine as '%s'", model)
 
-        self._logger.log_debug(f"Configuring machine as '{model}'")
-
-        no_of_rotors_req = self._model_details.no_of_rotors.value
+        no_of_rotors_req = REGISTRY.no_of_rotors(model)
 
         if len(rotors) != no_of_rotors_req:
             self._last_error = 'Invalid number of rotors specified, ' + \
                 f'requires {no_of_rotors_req} rotors'
             return False
 
-        for rotor in rotors:
-            details = [r for r in self._model_details.rotors if r.name == rotor]
+        self._stepping = REGISTRY.stepping(model)
+        slots = REGISTRY.rotor_slots(model)
+        entries = []
+
+        for slot, rotor in enumerate(rotors):
+            details = REGISTRY.rotor(model, rotor)
 
-            if not details:
+            if details is None:
                 self._last_error = f"Rotor '{rotor}' is invalid, aborting!"
                 return False
 
-            details = details[0]
-            entry = Rotor(details.name, details.wiring, details.notches,
-                          self._logger)
-            self._rotors.append(entry)
+            if slots is not None and rotor not in slots[slot]:
+                self._last_error = f"Rotor '{rotor}' doesn't fit slot " + \
+                    f"{slot + 1}, aborting!"
+                return False
+
+            entries.append(Rotor(details.name, details.wiring,
+                                 details.notches, self._log_policy))
 
-            self._logger.log_debug(f"Added rotor '{rotor}'")
+            if log.enabled:
+                log.debug("Added rotor '%s'", rotor)
+
+        # The rotors are fixed once configured, so they are held in tuples
+        # (smaller than lists), along with their tables and notches which
+        # are shared with every other machine using the same rotors.
+        self._rotors = tuple(entries)
+        self._notches = tuple(rotor.notch_mask for rotor in self._rotors)
+        self._update_rotor_tables()
+
+        # A pending double-step and the step sequence belonged to the old
+        # rotors, so both are reset.
+        self._double_step = False
+        self._sequence = None
+        self._sequence_index = 0
 
         if self._model_details.has_plugboard:
-            self._logger.log_debug("Machine is using a plugboard")
+            if log.enabled:
+                log.debug("Machine is using a plugboard")
             self._plugboard = Plugboard()
 
-        details = [r for r in self._model_details.reflectors 
-                   if r.name == reflector]
+        details = REGISTRY.reflector(model, reflector)
 
-        if not details:
+        if details is None:
             self._last_error = f"Reflector '{reflector}' is invalid, aborting!"
             return False
 
-        self._logger.log_debug(f"Added reflector '{reflector}'")
-        self._reflector = Reflector(details[0].name, details[0].wiring)
+        if log.enabled:
+            log.debug("Added reflector '%s'", reflector)
+        self._reflector = ReflectorPermutation(details.name, details.wiring)
+
+        # A reflector that can be set is shifted by its position exactly as
+        # a rotor is, so it uses the forward rotor tables.
+        self._reflector_tables, _ = REGISTRY.rotor_tables(details.wiring)
+        self._reflector_position = 0
 
+        self._configuration = (model, tuple(rotors), reflector)
         self._is_configured = True
 
         return True
@@ -114,71 +214,75 @@ class Machine:
         @param key Key to encode.
         @return Encoded character.
         '''
-        self._logger.log_debug(f"Machine::press_key() received : '{key.name}'")
+        if self._instrumentation is not None:
+            return self._press_key_instrumented(key)
 
-        # To encrypt a key entry it needs to run through the circuit:
-        # plug board => rotors => reflector => rotors => plugboard.
-        #  The variable currentLetter will maintain the contact state.
-
-        self._log_rotor_states('Rotors before stepping :')
+        if self._log_policy.enabled:
+            return self._press_key_traced(key)
 
         # Before any encrypting can begin step the rotor.
-        self._step_rotors()
-
-        self._log_rotor_states('Rotors after stepping :')
+        if self._use_step_sequence:
+            self._advance_step_sequence()
+        else:
+            self._step_rotors()
 
         # If a plugboard exists for machine then encode through it.
         if self._plugboard is not None:
-            current_letter = self._plugboard.get_plug(key)
-            self._logger.log_debug(f"Plugboard | Passed '{key.name}' in " + \
-                                   f"and received '{current_letter.name}'")
+            key = self._plugboard.get_plug(key)
 
-        self._logger.log_debug("Passing letter through rotors from right to left")
+        # The circuit is run as integer lookups into the tables built when
+        # the machine was configured, each table already takes the rotor
+        # position into account.
+        current_letter = key.value
+        positions = [rotor.position for rotor in self._rotors]
 
         # Pass the letter through the rotors from right to left.
-        for rotor in reversed(self._rotors):
-            old_letter = RotorContact(current_letter).name
-
-            # Get substituted letter from the rotor.  There are two values that
-            # are returned.  First is what actual letter came out and then the
-            # second that gives you next rotor position after taking the rotors
-            # position into account.
-            #current_letter = rotor.get_forward_circuit(current_letter)
-            current_letter = rotor.encrypt(current_letter)
-
-            debug_msg = f"Rotor | Passing '{old_letter}' to {rotor.name} " + \
-                        f"returned '{RotorContact(current_letter).name}'"
-            self._logger.log_debug(debug_msg)
+        for tables, position in zip(reversed(self._forward_tables),
+                                    reversed(positions)):
+            current_letter = tables[position][current_letter]
 
         # Pass the letter through the reflector.
-        old_letter = RotorContact(current_letter).name
-        current_letter = self._reflector.encrypt(current_letter)
-
-        debug_msg = f"Passed '{old_letter}' to reflector => " + \
-                    f"{current_letter.name}"
-        self._logger.log_debug(debug_msg)
-
-        self._logger.log_debug("Passing letter through rotors from left to right")
+        current_letter = \
+            self._reflector_tables[self._reflector_position][current_letter]
 
         # Pass the letter through the rotors from left to right.
-        for rotor in self._rotors:
-            old_letter = RotorContact(current_letter).name
-            current_letter = rotor.encrypt(current_letter, forward=False)
+        for tables, position in zip(self._inverse_tables, positions):
+            current_letter = tables[position][current_letter]
 
-            debug_msg = f"Passing '{old_letter}' to {rotor.name} =>" + \
-                        f"'{RotorContact(current_letter).name}'"
-            self._logger.log_debug(debug_msg)
+        current_letter = CONTACTS[current_letter]
 
         # If a plugboard exists for machine then encode through it.
         if self._plugboard is not None:
             current_letter = self._plugboard.get_plug(current_letter)
 
-        self._logger.log_debug(f"Output letter '{current_letter.name}'")
-        self._logger.log_debug("*********************************************")
-
         # Return encoded character.
         return current_letter
 
+    def encrypt(self, text : str, keep_non_letters : bool = True) -> str:
+        '''
+        Encrypt/decrypt a whole message in one call.  The rotors are left in
+        the same state as if press_key() had been called for each letter.
+        @param text Message to encrypt, it is converted to upper case.
+        @param keep_non_letters If True anything that isn't a letter is
+                                passed through unchanged, otherwise it is
+                                dropped.
+        @return Encrypted message.
+        '''
+        data = text.upper().encode('utf-8')
+        return self._encrypt_buffer(data, keep_non_letters).decode('utf-8')
+
+    def encrypt_bytes(self, buffer, keep_non_letters : bool = True) -> bytes:
+        '''
+        Encrypt/decrypt a buffer of ASCII letter codes (A-Z) in one call.  The
+        rotors are left in the same state as if press_key() had been called
+        for each letter.
+        @param buffer bytes, bytearray or memoryview to encrypt.
+        @param keep_non_letters If True any byte that isn't A-Z is passed
+                                through unchanged, otherwise it is dropped.
+        @return Encrypted bytes.
+        '''
+        return bytes(self._encrypt_buffer(buffer, keep_non_letters))
+
     def set_rotor_position(self, rotor_no : int, position : int) -> None:
         ''' Set the position of the rotor. '''
 
@@ -192,62 +296,711 @@ class Machine:
         # Set the new rotor position.
         self._rotors[rotor_no].position = position
 
+        # A pending double-step belonged to the old positions, and the step
+        # sequence started from them, so both are reset.
+        self._double_step = False
+        self._sequence = None
+
     def get_rotor_position(self, rotor_no):
         return self._rotors[rotor_no].position
 
+    def set_ring_setting(self, rotor_no : int, ring_setting : int) -> None:
+        '''
+        Set the ring setting (Ringstellung) of a rotor.  The ring setting is
+        folded into the rotor's lookup tables here, so encrypting costs the
+        same whatever the ring settings are.
+        @param rotor_no Rotor number, left to right.
+        @param ring_setting Ring setting 0-25, 0 is 'A' (01).
+        '''
+        if ring_setting < 0 or ring_setting > 25:
+            raise ValueError("Invalid ring setting")
+
+        if rotor_no < 0 or rotor_no > (len(self._rotors) - 1):
+            raise ValueError("Invalid rotor")
+
+        # The stepping only depends on the rotor positions, so any pending
+        # double-step and step sequence are still valid.
+        self._rotors[rotor_no].ring_setting = ring_setting
+        self._update_rotor_tables()
+
+    def get_ring_setting(self, rotor_no : int) -> int:
+        ''' Get the ring setting of a rotor, 0 is 'A' (01). '''
+        return self._rotors[rotor_no].ring_setting
+
+    def set_ring_settings(self, ring_settings) -> None:
+        '''
+        Set the ring settings of every rotor, the lookup tables are taken
+        once rather than once per rotor.
+        @param ring_settings Ring settings 0-25, left to right.
+        '''
+        ring_settings = tuple(ring_settings)
+
+        if len(ring_settings) != len(self._rotors):
+            raise ValueError("Invalid number of ring settings")
+
+        if any(ring_setting < 0 or ring_setting > 25
+               for ring_setting in ring_settings):
+            raise ValueError("Invalid ring setting")
+
+        for rotor, ring_setting in zip(self._rotors, ring_settings):
+            rotor.ring_setting = ring_setting
+
+        self._update_rotor_tables()
+
+    def set_plugboard(self, plugboard) -> None:
+        '''
+        Replace the plugboard with a PlugboardPermutation.
+        @param plugboard Plugged letter pairs (see
+                         PlugboardPermutation.from_pairs()), a 26 byte
+                         wiring or None to remove the plugboard.
+        '''
+        if plugboard is None:
+            self._plugboard = None
+
+        elif isinstance(plugboard, (bytes, bytearray, memoryview)):
+            self._plugboard = PlugboardPermutation(bytes(plugboard))
+
+        else:
+            self._plugboard = PlugboardPermutation.from_pairs(plugboard)
+
+    def set_reflector_position(self, position : int) -> None:
+        '''
+        Set the position of the reflector, only for models with a settable
+        reflector.
+        @param position Reflector position 0-25.
+        '''
+        if not self._stepping.reflector_settable:
+            raise ValueError("Reflector position can not be set")
+
+        if position < 0 or position >= NUMBER_OF_CONTACTS:
+            raise ValueError("Invalid reflector position")
+
+        self._reflector_position = position
+
+    def get_reflector_position(self) -> int:
+        ''' Get the position of the reflector, 0 if it can't be set. '''
+        return self._reflector_position
+
+    def set_instrumentation(self, instrumentation = None) -> None:
+        '''
+        Attach instrumentation to the machine, every key press is then
+        counted and sampled key presses are timed stage by stage.  Without
+        instrumentation an encrypted buffer is checked once rather than per
+        letter, a single key press still checks it.
+        @param instrumentation Instrumentation instance, None to detach.
+        '''
+        self._instrumentation = instrumentation
+
+    def set_position_cache(self, position_cache = None) -> None:
+        '''
+        Attach a position cache to the machine, buffers are then encrypted
+        with one table lookup per letter, see simulation.position_cache.
+        Single key presses are unchanged.
+        @param position_cache PositionCache instance, None to detach.
+        '''
+        if position_cache is not None and \
+           self._stepping.mode is not SteppingMode.LEVER:
+            raise ValueError("Position cache requires lever stepping")
+
+        self._position_cache = position_cache
+
+    def enable_step_sequence(self, enable : bool = True) -> None:
+        '''
+        Opt in to stepping the rotors from a precomputed step sequence, a key
+        press then only advances an index into the sequence.  The sequence
+        starts from the rotor state when it is enabled, or when a rotor
+        position is next set.
+        @param enable True to use the step sequence, False to step normally.
+        '''
+        if enable and self._stepping.mode is not SteppingMode.LEVER:
+            raise ValueError("Step sequence requires lever stepping")
+
+        self._use_step_sequence = enable
+        self._sequence = None
+
+    def seek(self, keypresses : int) -> None:
+        '''
+        Move the rotors directly to their state after a number of key presses
+        from the start of the step sequence, without pressing any keys.
+        @param keypresses Number of key presses from the start state.
+        '''
+        if not self._use_step_sequence:
+            raise ValueError("Step sequence is not enabled")
+
+        sequence = self._get_step_sequence()
+        self._sequence_index = sequence.index(keypresses)
+        self._apply_step_sequence_state()
+
+    def snapshot(self) -> MachineState:
+        '''
+        Capture the mutable state of the machine, the state can be restored
+        with restore() on this machine or any machine with the same rotors.
+        @return MachineState instance.
+        '''
+        plugboard = None
+        if self._plugboard is not None:
+            plugboard = build_plugboard_table(self._plugboard)
+
+        positions = tuple(rotor.position for rotor in self._rotors)
+        ring_settings = tuple(rotor.ring_setting for rotor in self._rotors)
+
+        return MachineState(positions, ring_settings, self._double_step,
+                            plugboard, self._reflector_position)
+
+    def restore(self, state : MachineState) -> None:
+        '''
+        Restore the mutable state of the machine from a snapshot.  If the
+        plugboard wiring differs from the snapshot then the plugboard is
+        replaced by a PlugboardPermutation with the snapshot wiring.  The
+        step sequence, if enabled, restarts from the restored state.
+        @param state MachineState instance from snapshot().
+        '''
+        if len(state.positions) != len(self._rotors):
+            raise ValueError("Invalid number of rotors in machine state")
+
+        for rotor_no, rotor in enumerate(self._rotors):
+            rotor.position = state.positions[rotor_no]
+
+        if tuple(state.ring_settings) != tuple(
+                rotor.ring_setting for rotor in self._rotors):
+            self.set_ring_settings(state.ring_settings)
+
+        self._double_step = state.double_step
+        self._reflector_position = state.reflector_position
+        self._sequence = None
+
+        if state.plugboard is None:
+            self._plugboard = None
+
+        elif self._plugboard is None or \
+             build_plugboard_table(self._plugboard) != state.plugboard:
+            self._plugboard = PlugboardPermutation(state.plugboard)
+
+    def clone(self):
+        '''
+        Create a copy of the machine.  The wiring tables, reflector, model
+        details, log policy and step sequence are immutable and shared, only
+        the rotors and plugboard are copied.
+        @return New Machine instance.
+        '''
+        # The clone is a Machine, so setting its private state is safe.
+        # pylint: disable=protected-access
+        cloned = copy.copy(self)
+        cloned._rotors = tuple(copy.copy(rotor) for rotor in self._rotors)
+        cloned._plugboard = copy.deepcopy(self._plugboard)
+        return cloned
+
+    def _encrypt_buffer(self, buffer, keep_non_letters : bool) -> bytearray:
+        '''
+        Run a buffer of bytes through the lookup tables, the rotors are
+        stepped exactly as _step_rotors() would and their final state is
+        written back once the whole buffer has been processed.
+        '''
+        if self._instrumentation is not None:
+            return self._encrypt_buffer_instrumented(buffer, keep_non_letters)
+
+        if self._stepping.mode is not SteppingMode.LEVER:
+            return self._encrypt_buffer_cog(buffer, keep_non_letters)
+
+        if self._position_cache is not None:
+            return self._encrypt_buffer_cached(buffer, keep_non_letters)
+
+        if self._use_step_sequence:
+            return self._encrypt_buffer_sequence(buffer, keep_non_letters)
+
+        stepping_rotors = self._rotors[-LEVER_STEPPING_ROTORS:]
+        output, positions, self._double_step = encrypt_lever_buffer(
+            self.lever_circuit(),
+            tuple(rotor.position for rotor in stepping_rotors),
+            self._double_step, buffer, keep_non_letters)
+
+        for rotor, position in zip(stepping_rotors, positions):
+            rotor.position = position
+
+        return output
+
+    def _encrypt_buffer_cached(self, buffer, keep_non_letters : bool) \
+            -> bytes:
+        '''
+        Run a buffer of bytes through the position cache tables, the rotors
+        are stepped as _step_rotors() would.
+        '''
+        stepping_rotors = self._rotors[-LEVER_STEPPING_ROTORS:]
+        output, positions, self._double_step = \
+            self._position_cache.encrypt_buffer(
+                self.lever_circuit(),
+                tuple(rotor.ring_setting for rotor in stepping_rotors),
+                tuple(rotor.position for rotor in stepping_rotors),
+                self._double_step, buffer, keep_non_letters)
+
+        for rotor, position in zip(stepping_rotors, positions):
+            rotor.position = position
+
+        # The step sequence, if enabled, restarts from the new state.
+        self._sequence = None
+        return output
+
+    def _encrypt_buffer_sequence(self, buffer, keep_non_letters : bool) \
+            -> bytearray:
+        '''
+        Run a buffer of bytes through the lookup tables of a lever stepped
+        machine, taking the rotor positions from the step sequence.
+        '''
+        # pylint: disable=too-many-locals
+
+        forward, inverse, _, reflector, plugboard = self.lever_circuit()
+        forward_0, forward_1, forward_2 = forward
+        inverse_0, inverse_1, inverse_2 = inverse
+
+        sequence = self._get_step_sequence()
+        sequence_positions = sequence.positions
+        sequence_end = len(sequence)
+        index = self._sequence_index
+
+        output = bytearray()
+
+        for byte in memoryview(buffer).cast('B'):
+            letter = LETTER_CODES[byte]
+
+            if letter == NOT_A_LETTER:
+                if keep_non_letters:
+                    output.append(byte)
+                continue
+
+            index += 1
+            if index == sequence_end:
+                index = sequence.cycle_start
+
+            offset = index * 3
+            position_0 = sequence_positions[offset]
+            position_1 = sequence_positions[offset + 1]
+            position_2 = sequence_positions[offset + 2]
+
+            letter = plugboard[letter]
+            letter = forward_2[position_2][letter]
+            letter = forward_1[position_1][letter]
+            letter = forward_0[position_0][letter]
+            letter = reflector[letter]
+            letter = inverse_0[position_0][letter]
+            letter = inverse_1[position_1][letter]
+            letter = inverse_2[position_2][letter]
+            output.append(plugboard[letter] + 65)
+
+        self._sequence_index = index
+        self._apply_step_sequence_state()
+
+        return output
+
+    def _encrypt_buffer_cog(self, buffer, keep_non_letters : bool) \
+            -> bytearray:
+        '''
+        Run a buffer of bytes through the lookup tables of a cog stepped
+        machine, see _encrypt_buffer().
+        '''
+        # pylint: disable=too-many-locals
+
+        forward_tables = self._forward_tables
+        inverse_tables = self._inverse_tables
+        notches = self._notches
+        reflector_tables = self._reflector_tables
+        reflector_rotates = self._stepping.reflector_rotates
+        plugboard = build_plugboard_table(self._plugboard)
+
+        no_of_rotors = len(self._rotors)
+        stepping_rotors = range(no_of_rotors - 1,
+                                no_of_rotors - self._stepping.stepping_rotors
+                                - 1, -1)
+        right_to_left = range(no_of_rotors - 1, -1, -1)
+        left_to_right = range(no_of_rotors)
+
+        positions = [rotor.position for rotor in self._rotors]
+        reflector_position = self._reflector_position
+
+        output = bytearray()
+
+        for byte in memoryview(buffer).cast('B'):
+            letter = LETTER_CODES[byte]
+
+            if letter == NOT_A_LETTER:
+                if keep_non_letters:
+                    output.append(byte)
+                continue
+
+            # Step the rotors, see _step_rotors_cog() for details.
+            for rotor_no in stepping_rotors:
+                position = positions[rotor_no]
+                positions[rotor_no] = (position + 1) % 26
+                if not notches[rotor_no] >> position & 1:
+                    break
+            else:
+                if reflector_rotates:
+                    reflector_position = (reflector_position + 1) % 26
+
+            letter = plugboard[letter]
+            for rotor_no in right_to_left:
+                letter = forward_tables[rotor_no][positions[rotor_no]][letter]
+            letter = reflector_tables[reflector_position][letter]
+            for rotor_no in left_to_right:
+                letter = inverse_tables[rotor_no][positions[rotor_no]][letter]
+            output.append(plugboard[letter] + 65)
+
+        for rotor, position in zip(self._rotors, positions):
+            rotor.position = position
+        self._reflector_position = reflector_position
+
+        return output
+
+    def _encrypt_buffer_instrumented(self, buffer, keep_non_letters : bool) \
+            -> bytearray:
+        '''
+        Run a buffer of bytes through _press_key_instrumented() one letter
+        at a time, so every letter is counted and sampled.
+        '''
+        output = bytearray()
+
+        for byte in memoryview(buffer).cast('B'):
+            letter = LETTER_CODES[byte]
+
+            if letter == NOT_A_LETTER:
+                if keep_non_letters:
+                    output.append(byte)
+                continue
+
+            output.append(self._press_key_instrumented(CONTACTS[letter]).value
+                          + 65)
+
+        return output
+
+    def lever_circuit(self) -> tuple:
+        '''
+        Get the circuit of a lever stepped machine as lookup tables for the
+        three stepping rotors.  Rotors to the left of the stepping rotors
+        never move, so they are folded into the reflector table, leaving the
+        same three rotor circuit whatever the number of rotors.
+        @return Tuple of (forward tables, inverse tables, notches, reflector
+                table, plugboard table), rotors are left to right.
+        '''
+        fixed = len(self._rotors) - LEVER_STEPPING_ROTORS
+
+        return (self._forward_tables[fixed:], self._inverse_tables[fixed:],
+                self._notches[fixed:],
+                self._build_fixed_reflector_table(fixed),
+                build_plugboard_table(self._plugboard))
+
+    def _build_fixed_reflector_table(self, fixed : int) -> bytes:
+        '''
+        Build a table for the reflector at its current position combined
+        with the rotors that don't step at their current positions.
+        @param fixed Number of non-stepping rotors, from the left.
+        @return 26 byte lookup table.
+        '''
+        reflector = self._reflector_tables[self._reflector_position]
+        if not fixed:
+            return reflector
+
+        rotors = list(zip(self._forward_tables[:fixed],
+                          self._inverse_tables[:fixed],
+                          [rotor.position for rotor in self._rotors[:fixed]]))
+        table = bytearray(NUMBER_OF_CONTACTS)
+
+        for contact in range(NUMBER_OF_CONTACTS):
+            letter = contact
+            for forward, _, position in reversed(rotors):
+                letter = forward[position][letter]
+            letter = reflector[letter]
+            for _, inverse, position in rotors:
+                letter = inverse[position][letter]
+            table[contact] = letter
+
+        return bytes(table)
+
+    def _update_rotor_tables(self) -> None:
+        ''' Take the lookup tables for the current ring settings. '''
+        self._forward_tables = tuple(rotor.forward_tables
+                                     for rotor in self._rotors)
+        self._inverse_tables = tuple(rotor.inverse_tables
+                                     for rotor in self._rotors)
+
+    def _get_step_sequence(self):
+        '''
+        Get the step sequence, building it from the current rotor state if
+        it hasn't been built yet.
+        '''
+        if self._sequence is None:
+            # Step sequences are opt in, so only loaded when used.
+            # pylint: disable=import-outside-toplevel
+            from simulation.step_sequence import get_step_sequence
+
+            # Only the rightmost rotors step, see _step_rotors().
+            start_positions = tuple(rotor.position for rotor in
+                                    self._rotors[-LEVER_STEPPING_ROTORS:])
+            notches = tuple(self._notches[-LEVER_STEPPING_ROTORS:])
+            self._sequence = get_step_sequence(notches, start_positions,
+                                               self._double_step)
+            self._sequence_index = 0
+
+        return self._sequence
+
+    def _advance_step_sequence(self) -> None:
+        ''' Step the rotors by moving on to the next state in the sequence. '''
+        sequence = self._get_step_sequence()
+
+        self._sequence_index += 1
+        if self._sequence_index == len(sequence):
+            self._sequence_index = sequence.cycle_start
+
+        self._apply_step_sequence_state()
+
+    def _apply_step_sequence_state(self) -> None:
+        index = self._sequence_index
+        offset = index * LEVER_STEPPING_ROTORS
+        stepping_rotors = self._rotors[-LEVER_STEPPING_ROTORS:]
+
+        for rotor_no, rotor in enumerate(stepping_rotors):
+            rotor.position = self._sequence.positions[offset + rotor_no]
+
+        self._double_step = bool(self._sequence.double_steps[index])
+
+    def _press_key_traced(self, key : RotorContact) -> RotorContact:
+        '''
+        Press a key by passing it through each rotor object in turn, logging
+        every stage of the circuit through the logging policy.  This is
+        slower than the lookup tables but useful when debugging.
+        @param key Key to encode.
+        @return Encoded character.
+        '''
+        log = self._log_policy
+
+        log.debug("Machine::press_key() received : '%s'", key.name)
+
+        # To encrypt a key entry it needs to run through the circuit:
+        # plug board => rotors => reflector => rotors => plugboard.
+        #  The variable currentLetter will maintain the contact state.
+
+        self._log_rotor_states('Rotors before stepping :')
+
+        # Before any encrypting can begin step the rotor.
+        if self._use_step_sequence:
+            self._advance_step_sequence()
+        else:
+            self._step_rotors()
+
+        self._log_rotor_states('Rotors after stepping :')
+
+        current_letter = key
+
+        # If a plugboard exists for machine then encode through it.
+        if self._plugboard is not None:
+            current_letter = self._plugboard.get_plug(key)
+            log.debug("Plugboard | Passed '%s' in and received '%s'",
+                      key.name, current_letter.name)
+
+        log.debug("Passing letter through rotors from right to left")
+
+        # Pass the letter through the rotors from right to left.
+        for rotor in reversed(self._rotors):
+            old_letter = current_letter
+            current_letter = rotor.encrypt(current_letter)
+            log.debug("Rotor | Passing '%s' to %s returned '%s'",
+                      old_letter.name, rotor.name, current_letter.name)
+
+        # Pass the letter through the reflector, taking its position into
+        # account as for a rotor.
+        old_letter = current_letter
+        reflector_position = self._reflector_position
+        current_letter = self._reflector.encrypt(
+            CONTACTS[(current_letter.value + reflector_position) %
+                     NUMBER_OF_CONTACTS])
+        current_letter = CONTACTS[(current_letter.value - reflector_position)
+                                  % NUMBER_OF_CONTACTS]
+        log.debug("Passed '%s' to reflector => %s", old_letter.name,
+                  current_letter.name)
+
+        log.debug("Passing letter through rotors from left to right")
+
+        # Pass the letter through the rotors from left to right.
+        for rotor in self._rotors:
+            old_letter = current_letter
+            current_letter = rotor.encrypt(current_letter, forward=False)
+            log.debug("Passing '%s' to %s => '%s'", old_letter.name,
+                      rotor.name, current_letter.name)
+
+        # If a plugboard exists for machine then encode through it.
+        if self._plugboard is not None:
+            current_letter = self._plugboard.get_plug(current_letter)
+
+        log.debug("Output letter '%s'", current_letter.name)
+        log.debug("*********************************************")
+
+        # Return encoded character.
+        return current_letter
+
+    def _press_key_instrumented(self, key : RotorContact) -> RotorContact:
+        '''
+        Press a key, counting it with the instrumentation and timing each
+        stage of the circuit when the key press is sampled.
+        @param key Key to encode.
+        @return Encoded character.
+        '''
+        # pylint: disable=too-many-locals
+        instrumentation = self._instrumentation
+        clock = instrumentation.clock
+        sampled = instrumentation.sample()
+
+        instrumentation.count('keys')
+        instrumentation.count('turnovers', self._count_turnovers())
+        if self._double_step and self._stepping.mode is SteppingMode.LEVER:
+            instrumentation.count('double_steps')
+
+        if self._log_policy.enabled:
+            if not sampled:
+                return self._press_key_traced(key)
+
+            start = clock()
+            key = self._press_key_traced(key)
+            instrumentation.add_timing('logging', clock() - start)
+            return key
+
+        if sampled:
+            start = clock()
+
+        if self._use_step_sequence:
+            self._advance_step_sequence()
+        else:
+            self._step_rotors()
+
+        if sampled:
+            stepped = clock()
+
+        current_letter = key.value
+        if self._plugboard is not None:
+            current_letter = self._plugboard.get_plug(key).value
+
+        if sampled:
+            plugged = clock()
+
+        positions = [rotor.position for rotor in self._rotors]
+        for tables, position in zip(reversed(self._forward_tables),
+                                    reversed(positions)):
+            current_letter = tables[position][current_letter]
+
+        if sampled:
+            forward = clock()
+
+        current_letter = \
+            self._reflector_tables[self._reflector_position][current_letter]
+
+        if sampled:
+            reflected = clock()
+
+        for tables, position in zip(self._inverse_tables, positions):
+            current_letter = tables[position][current_letter]
+
+        if sampled:
+            inverse = clock()
+
+        current_letter = CONTACTS[current_letter]
+        if self._plugboard is not None:
+            current_letter = self._plugboard.get_plug(current_letter)
+
+        if sampled:
+            end = clock()
+            instrumentation.add_timing('stepping', stepped - start)
+            instrumentation.add_timing('plugboard',
+                                       plugged - stepped + end - inverse)
+            instrumentation.add_timing('rotors',
+                                       forward - plugged + inverse - reflected)
+            instrumentation.add_timing('reflector', reflected - forward)
+
+        return current_letter
+
+    def _count_turnovers(self) -> int:
+        '''
+        Count the rotors that will step their left-hand neighbour (or a
+        rotating reflector) on the next key press, including the middle
+        rotor stepping the left one in a double step.
+        '''
+        if self._stepping.mode is not SteppingMode.LEVER:
+            stepping_rotors = self._rotors[-self._stepping.stepping_rotors:]
+            turnovers = 0
+
+            for rotor in reversed(stepping_rotors):
+                if not rotor.will_step_next():
+                    return turnovers
+                turnovers += 1
+
+            # The leftmost rotor only steps something if the reflector
+            # rotates.
+            return turnovers - (not self._stepping.reflector_rotates)
+
+        return int(self._rotors[-1].will_step_next()) + int(self._double_step)
 
     def _step_rotors(self):
         '''
         Rotor stepping occurs from the right to left whilst a stepping
         notch is encountered.
         '''
+        if self._stepping.mode is not SteppingMode.LEVER:
+            self._step_rotors_cog()
+            return
 
         # Step next rotor flag.
         will_step_next_rotor = False
 
-        ######################################
-        ### Assume 3 rotor machine for now ###
-        ######################################
-        no_of_rotors = 3
-
-        # Determine the furthest right rotor (0 indexed list)
-        rotor_position = no_of_rotors -1
+        # Only the rightmost three rotors have pawls, any rotors to their
+        # left (e.g. the M4 Greek wheel) are never stepped.
+        left_rotor, middle_rotor, right_rotor = \
+            self._rotors[-LEVER_STEPPING_ROTORS:]
 
         # Because the right-hand pawl has no rotor or ring to its right, rotor
         # stepping happens with every key depression.
-        rotor = self._rotors[rotor_position]
-        will_step_next_rotor = rotor.will_step_next()
-        rotor.step()
+        will_step_next_rotor = right_rotor.will_step_next()
+        right_rotor.step()
 
         # If there is a double-step then perform it and reset the flag.
         if self._double_step:
-            print("[DEBUG] Doing a double step")
-            self._rotors[0].step()
-            self._rotors[1].step()
+            if self._log_policy.enabled:
+                self._log_policy.debug("Doing a double step")
+            left_rotor.step()
+            middle_rotor.step()
             self._double_step = False
 
         # Only continue if there is more If stepping to be done.
         if not will_step_next_rotor:
             return
 
-        # Move to next rotor.
-        rotor_position -= 1
-        rotor = self._rotors[rotor_position]
-
         # Step the next rotor.
-        rotor.step()
+        middle_rotor.step()
 
-        # If the 2nd rotor will step rotor 1 (left most one) then a double-step
-        # needs to take place.  This is where the middle rotor will step again
-        # next button press, along with the left one.
-        if rotor.will_step_next():
+        # If the middle rotor will step the left one then a double-step needs
+        # to take place.  This is where the middle rotor will step again next
+        # button press, along with the left one.
+        if middle_rotor.will_step_next():
             self._double_step = True
 
+    def _step_rotors_cog(self):
+        '''
+        Cog (Zaehlwerk) stepping: the rotors step like an odometer, each one
+        stepping the next only when it turns over from a notch, so there is
+        no double-step.  When the leftmost stepping rotor turns over it
+        steps a rotating reflector.
+        '''
+        stepping_rotors = self._rotors[-self._stepping.stepping_rotors:]
+
+        for rotor in reversed(stepping_rotors):
+            will_step_next_rotor = rotor.will_step_next()
+            rotor.step()
+
+            if not will_step_next_rotor:
+                return
+
+        if self._stepping.reflector_rotates:
+            self._reflector_position = (self._reflector_position + 1) % \
+                NUMBER_OF_CONTACTS
+
     def _log_rotor_states(self, prefix_str : str) -> None:
-        rotor_0 = RotorContact(self._rotors[0].position).name
-        rotor_1 = RotorContact(self._rotors[1].position).name
-        rotor_2 = RotorContact(self._rotors[2].position).name
-        self._logger.log_debug(f"{prefix_str} {rotor_0} | {rotor_1} | " + \
-                               f"{rotor_2}")
+        positions = ' | '.join(CONTACTS[rotor.position].name
+                               for rotor in self._rotors)
+        self._log_policy.debug("%s %s", prefix_str, positions)
 
 # 274 #
\ No newline at end of file
@@ -0,0 +1,59 @@
+'''
+    EnigmaSimulator - A software implementation of the Engima Machine.
+    Copyright (C) 2015-2021 Engima Simulator Development Team
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+'''
+import collections
+from simulation.stepping import SteppingDefinition, SteppingMode
+
+ModelDefinition = collections.namedtuple(
+    'ModelDefinition', ['no_of_rotors', 'has_plugboard', 'rotors',
+                        'reflectors', 'stepping', 'rotor_slots'],
+    defaults=(None,))
+ModelDefinition.__doc__ = '''
+    Definition of a model that isn't part of ENIGMA_MODELS, the stepping
+    field is a SteppingDefinition.  rotor_slots lists the names of the rotors
+    that fit each slot, left to right, None if any rotor fits any slot.
+'''
+
+ComponentDefinition = collections.namedtuple(
+    'ComponentDefinition', ['name', 'wiring', 'notches'])
+
+# The Enigma M4 was used exclusively by the U-boat division of the German
+# Navy.  It has the eight Navy rotors plus a thin fourth 'Greek' wheel (Beta
+# or Gamma) in the leftmost slot that can be set but never steps, and thin
+# reflectors.  With Beta at 'A' and UKW-B-Thin it matches an M3 with UKW-B.
+# The Greek wheels are thin and only fit the leftmost slot, which the Navy
+# rotors don't fit.
+M4_GREEK_WHEELS = ('Beta', 'Gamma')
+M4_NAVY_ROTORS = ('I', 'II', 'III', 'IV', 'V', 'VI', 'VII', 'VIII')
+
+ENIGMA_M4 = ModelDefinition(
+    4, True,
+    [ComponentDefinition('I', 'EKMFLGDQVZNTOWYHXUSPAIBRCJ', ['Q']),
+     ComponentDefinition('II', 'AJDKSIRUXBLHWTMCQGZNPYFVOE', ['E']),
+     ComponentDefinition('III', 'BDFHJLCPRTXVZNYEIWGAKMUSQO', ['V']),
+     ComponentDefinition('IV', 'ESOVPZJAYQUIRHXLNFTGKDCMWB', ['J']),
+     ComponentDefinition('V', 'VZBRGITYUPSDNHLXAWMJQOFECK', ['Z']),
+     ComponentDefinition('VI', 'JPGVOUMFYQBENHZRDKASXLICTW', ['Z', 'M']),
+     ComponentDefinition('VII', 'NZJHGRCXMYSWBOUFAIVLPEKQDT', ['Z', 'M']),
+     ComponentDefinition('VIII', 'FKQHTLXOCBJSPDZRAMEWNIUYGV', ['Z', 'M']),
+     ComponentDefinition('Beta', 'LEYJVCNIXWPBQMDRTAKZGFUHOS', []),
+     ComponentDefinition('Gamma', 'FSOKANUERHMBTIYCWLQPZXVGJD', [])],
+    [ComponentDefinition('UKW-B-Thin', 'ENKQAUYWJICOPBLMDXZVFTHRGS', []),
+     ComponentDefinition('UKW-C-Thin', 'RDOBJNTKVEHMLFCWZAXGYIPSUQ', [])],
+    SteppingDefinition(SteppingMode.LEVER, 3, False, False),
+    (M4_GREEK_WHEELS, M4_NAVY_ROTORS, M4_NAVY_ROTORS, M4_NAVY_ROTORS))
+
+# Models added to the registry alongside ENIGMA_MODELS, a model of the same
+# name in ENIGMA_MODELS takes precedence.
+EXTENDED_MODELS = {'M4': ENIGMA_M4}
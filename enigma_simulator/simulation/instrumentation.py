@@ -0,0 +1,230 @@
+'''
+    EnigmaSimulator - A software implementation of the Engima Machine.
+    Copyright (C) 2015-2021 Engima Simulator Development Team
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    Opt-in instrumentation of a machine: counters of the keys processed,
+    double steps and rotor turnovers plus sampled timings of each stage of
+    the circuit.  Attach an Instrumentation to a machine with
+    Machine.set_instrumentation().  Buffers encrypted by a machine without
+    one check for it once per buffer rather than per letter, while
+    Machine.press_key() still tests for it on every key.  The statistics
+    can be exported in the Prometheus text format to a file or a socket.
+'''
+import os
+import socket
+import tempfile
+import time
+
+# Stages of a key press that are timed, 'logging' is the whole key press
+# when it goes through the logged (traced) circuit.
+STAGES = ('stepping', 'plugboard', 'rotors', 'reflector', 'logging')
+
+COUNTERS = ('keys', 'double_steps', 'turnovers')
+
+# Default number of key presses per timed key press.
+DEFAULT_SAMPLE_INTERVAL = 64
+
+# Help text for each counter in the Prometheus output.
+COUNTER_HELP = {'keys': 'Keys processed.',
+                'double_steps': 'Double steps of the middle rotor.',
+                'turnovers': 'Rotor turnovers stepping the next rotor.'}
+
+
+class Instrumentation:
+    '''
+    Counters and sampled stage timings for one or more machines (a clone
+    of a machine shares its instrumentation).  Every key press is counted,
+    one in every 'sample_interval' key presses is timed stage by stage.
+    '''
+    __slots__ = ['_clock', '_counters', '_exporters', '_sample_interval',
+                 '_samples', '_seconds', '_until_sample']
+
+    @property
+    def clock(self):
+        ''' Property getter : Clock used for the stage timings. '''
+        return self._clock
+
+    @property
+    def sample_interval(self) -> int:
+        ''' Property getter : Key presses per timed key press. '''
+        return self._sample_interval
+
+    def __init__(self, sample_interval : int = DEFAULT_SAMPLE_INTERVAL,
+                 clock = time.perf_counter):
+        '''
+        @param sample_interval Key presses per timed key press, 1 times
+                               every key press.
+        @param clock Callable returning the time in seconds.
+        '''
+        if sample_interval < 1:
+            raise ValueError("Sample interval must be at least 1")
+
+        self._sample_interval = sample_interval
+        self._clock = clock
+        self._exporters = []
+        self.reset()
+
+    def reset(self) -> None:
+        ''' Reset every counter and timing. '''
+        self._counters = dict.fromkeys(COUNTERS, 0)
+        self._samples = dict.fromkeys(STAGES, 0)
+        self._seconds = dict.fromkeys(STAGES, 0.0)
+        self._until_sample = 1
+
+    def count(self, counter : str, amount : int = 1) -> None:
+        '''
+        Increase a counter.
+        @param counter Counter name, one of COUNTERS.
+        @param amount Amount to increase it by.
+        '''
+        self._counters[counter] += amount
+
+    def sample(self) -> bool:
+        '''
+        Called once per key press, check whether it should be timed.
+        @return True for one in every 'sample_interval' calls.
+        '''
+        self._until_sample -= 1
+        if self._until_sample:
+            return False
+
+        self._until_sample = self._sample_interval
+        return True
+
+    def add_timing(self, stage : str, seconds : float) -> None:
+        '''
+        Record the time spent in a stage of a timed key press.
+        @param stage Stage name, one of STAGES.
+        @param seconds Time spent in the stage.
+        '''
+        self._samples[stage] += 1
+        self._seconds[stage] += seconds
+
+    def stats(self) -> dict:
+        '''
+        Get a snapshot of the statistics.
+        @return Dictionary of each counter => value, 'sample_interval' and
+                'stages' => stage => {'samples', 'seconds', 'mean'}.
+        '''
+        stats = dict(self._counters)
+        stats['sample_interval'] = self._sample_interval
+        stats['stages'] = {
+            stage: {'samples': self._samples[stage],
+                    'seconds': self._seconds[stage],
+                    'mean': self._seconds[stage] / self._samples[stage]
+                            if self._samples[stage] else 0.0}
+            for stage in STAGES}
+        return stats
+
+    def add_exporter(self, exporter) -> None:
+        '''
+        Add an export hook.
+        @param exporter Callable that is passed the stats() dictionary, e.g.
+                        a FileExporter or SocketExporter.
+        '''
+        self._exporters.append(exporter)
+
+    def export(self) -> dict:
+        '''
+        Pass a snapshot of the statistics to every export hook.
+        @return The exported statistics.
+        '''
+        stats = self.stats()
+        for exporter in self._exporters:
+            exporter(stats)
+        return stats
+
+
+def prometheus_text(stats : dict, prefix : str = 'enigma') -> str:
+    '''
+    Format statistics in the Prometheus text exposition format.
+    @param stats Dictionary from Instrumentation.stats().
+    @param prefix Prefix of every metric name.
+    @return Metrics text.
+    '''
+    lines = []
+
+    for counter in COUNTERS:
+        name = f'{prefix}_{counter}_total'
+        lines += [f'# HELP {name} {COUNTER_HELP[counter]}',
+                  f'# TYPE {name} counter',
+                  f'{name} {stats[counter]}']
+
+    for field, description in (('samples', 'Timed key presses'),
+                               ('seconds', 'Seconds spent')):
+        name = f'{prefix}_stage_{field}_total'
+        lines += [f'# HELP {name} {description} per circuit stage.',
+                  f'# TYPE {name} counter']
+        lines += [f'{name}{{stage="{stage}"}} {timing[field]!r}'
+                  for stage, timing in stats['stages'].items()]
+
+    return '\n'.join(lines) + '\n'
+
+
+class FileExporter:
+    '''
+    Export hook writing the metrics to a file, e.g. for the node exporter
+    textfile collector.  The file is replaced atomically so a reader never
+    sees a partial write.
+    '''
+    __slots__ = ['_path', '_prefix']
+
+    def __init__(self, path : str, prefix : str = 'enigma'):
+        '''
+        @param path File to write the metrics to.
+        @param prefix Prefix of every metric name.
+        '''
+        self._path = path
+        self._prefix = prefix
+
+    def __call__(self, stats : dict) -> None:
+        directory = os.path.dirname(os.path.abspath(self._path))
+        handle, temporary = tempfile.mkstemp(dir=directory, suffix='.tmp')
+
+        try:
+            with os.fdopen(handle, 'w', encoding='utf-8') as metrics_file:
+                metrics_file.write(prometheus_text(stats, self._prefix))
+            os.replace(temporary, self._path)
+
+        except OSError:
+            os.unlink(temporary)
+            raise
+
+
+class SocketExporter:
+    '''
+    Export hook sending the metrics over a new connection to a local socket
+    (e.g. a metrics agent) each time the statistics are exported.
+    '''
+    __slots__ = ['_address', '_prefix', '_timeout']
+
+    def __init__(self, address, prefix : str = 'enigma',
+                 timeout : float = 1.0):
+        '''
+        @param address Path of a Unix domain socket or a (host, port) tuple.
+        @param prefix Prefix of every metric name.
+        @param timeout Connection timeout in seconds.
+        '''
+        self._address = address
+        self._prefix = prefix
+        self._timeout = timeout
+
+    def __call__(self, stats : dict) -> None:
+        family = socket.AF_UNIX if isinstance(self._address, str) \
+                 else socket.AF_INET
+
+        with socket.socket(family, socket.SOCK_STREAM) as connection:
+            connection.settimeout(self._timeout)
+            connection.connect(self._address)
+            connection.sendall(prometheus_text(stats, self._prefix)
+                               .encode('utf-8'))
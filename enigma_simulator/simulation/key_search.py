@@ -0,0 +1,299 @@
+'''
+    EnigmaSimulator - A software implementation of the Engima Machine.
+    Copyright (C) 2015-2021 Engima Simulator Development Team
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+'''
+import collections
+import concurrent.futures
+import hashlib
+import heapq
+import itertools
+import json
+import os
+import pickle
+from simulation.enigma_machine import Machine
+from simulation.component_registry import REGISTRY
+
+SearchResult = collections.namedtuple(
+    'SearchResult', ['score', 'rotors', 'reflector', 'positions', 'plaintext',
+                     'ring_settings'])
+
+# Number of rightmost rotors whose ring setting ring_setting_candidates()
+# varies by default.
+DEFAULT_VARYING_RINGS = 2
+
+
+class KeySearch:
+    '''
+    Search the key space of a model for the settings that decrypt a message,
+    in the style of the Bombe.  Each rotor order and reflector is a unit of
+    work that is run in a process pool, every start position of the unit is
+    tried and scored and the best results are merged as units complete.
+    '''
+    # pylint: disable=too-many-instance-attributes
+
+    __slots__ = ['_checkpoint', '_ciphertext', '_max_workers', '_model',
+                 '_position_cache', '_positions', '_reflectors', '_results',
+                 '_ring_settings', '_rotor_orders', '_scorer', '_stop_score',
+                 '_top_k']
+
+    @property
+    def results(self) -> list:
+        ''' Property getter : Best results found so far, best first. '''
+        return sorted(self._results, reverse=True)
+
+    def __init__(self, model : str, ciphertext : str, scorer, **options):
+        '''
+        @param model Enigma model name, e.g. 'Enigma1'.
+        @param ciphertext Message to decrypt.
+        @param scorer Picklable callable that takes a candidate plaintext and
+                      returns a score, higher is better.
+        @param options Optional settings:
+            rotor_orders - Rotor orders to try, default is every ordering of
+                           the model's rotors that fits its slots.
+            reflectors - Reflector names to try, default is all of them.
+            positions - Start positions to try, default is every position of
+                        every rotor.
+            ring_settings - Ring settings to try for every start position,
+                            either a list or a picklable callable that takes
+                            a rotor order and returns them, e.g.
+                            ring_setting_candidates.  Default is only 'A'
+                            (0) for every rotor.
+            top_k - Number of best results to keep, default 10.
+            stop_score - Stop once a result scores at least this much.
+            checkpoint - File name to save progress to and resume from,
+                         only a checkpoint of the same search is resumed.
+            max_workers - Number of worker processes, default all cores.
+            position_cache - True to decrypt with a PositionCache in each
+                             worker, or a directory for the workers to
+                             share the tables through.  Default is off.
+        '''
+        self._model = model
+        self._ciphertext = ciphertext
+        self._scorer = scorer
+
+        self._rotor_orders = options.get('rotor_orders')
+        if self._rotor_orders is None:
+            self._rotor_orders = REGISTRY.rotor_orders(model)
+        self._rotor_orders = [tuple(order) for order in self._rotor_orders]
+
+        self._reflectors = options.get('reflectors')
+        if self._reflectors is None:
+            self._reflectors = REGISTRY.reflector_names(model)
+
+        self._positions = options.get('positions')
+        if self._positions is not None:
+            self._positions = [tuple(position)
+                               for position in self._positions]
+
+        self._ring_settings = options.get('ring_settings')
+        if self._ring_settings is not None and \
+           not callable(self._ring_settings):
+            self._ring_settings = [tuple(ring_setting) for ring_setting
+                                   in self._ring_settings]
+
+        self._top_k = options.get('top_k', 10)
+        self._stop_score = options.get('stop_score')
+        self._checkpoint = options.get('checkpoint')
+        self._max_workers = options.get('max_workers')
+        self._position_cache = options.get('position_cache', False)
+        self._results = []
+
+    def run(self):
+        '''
+        Run the search, yielding the best results (best first) each time a
+        unit of work completes.  The search stops early once a result
+        reaches the stop score.
+        '''
+        completed = self._load_checkpoint()
+
+        units = [(rotors, reflector) for rotors in self._rotor_orders
+                 for reflector in self._reflectors
+                 if [list(rotors), reflector] not in completed]
+
+        executor = concurrent.futures.ProcessPoolExecutor(self._max_workers)
+
+        try:
+            futures = {executor.submit(search_unit, self._model, rotors,
+                                       reflector, self._ciphertext,
+                                       self._scorer, self._positions,
+                                       self._ring_settings, self._top_k,
+                                       self._stop_score,
+                                       self._position_cache):
+                       (rotors, reflector) for rotors, reflector in units}
+
+            for future in concurrent.futures.as_completed(futures):
+                rotors, reflector = futures[future]
+                self._merge(future.result())
+                completed.append([list(rotors), reflector])
+                self._save_checkpoint(completed)
+
+                yield self.results
+
+                if self._stop_reached():
+                    break
+
+        finally:
+            # On an early stop, or the caller closing the generator, drop
+            # the queued units rather than waiting for them all to run.
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def search(self) -> list:
+        '''
+        Run the search to completion (or the stop score).
+        @return Best results, best first.
+        '''
+        for _ in self.run():
+            pass
+
+        return self.results
+
+    def _merge(self, results : list) -> None:
+        for result in results:
+            if len(self._results) < self._top_k:
+                heapq.heappush(self._results, result)
+
+            else:
+                heapq.heappushpop(self._results, result)
+
+    def _stop_reached(self) -> bool:
+        return self._stop_score is not None and \
+            any(result.score >= self._stop_score for result in self._results)
+
+    def _load_checkpoint(self) -> list:
+        if self._checkpoint is None or not os.path.exists(self._checkpoint):
+            return []
+
+        with open(self._checkpoint, 'r', encoding='utf-8') as checkpoint:
+            contents = json.load(checkpoint)
+
+        if contents.get('search') != self._fingerprint():
+            raise ValueError(f"Checkpoint '{self._checkpoint}' is from a "
+                             "different search")
+
+        self._merge([SearchResult(result[0], tuple(result[1]), result[2],
+                                  tuple(result[3]), result[4],
+                                  tuple(result[5]))
+                     for result in contents['results']])
+
+        return contents['completed']
+
+    def _fingerprint(self) -> str:
+        '''
+        Hash of everything that decides a search's results, so a checkpoint
+        is only resumed by the search that wrote it.
+        '''
+        # Ring setting hooks and scorers are picklable (they are sent to the
+        # workers), functions pickle by name and scorers by their state.
+        search = (self._model, self._ciphertext, self._rotor_orders,
+                  list(self._reflectors), self._positions,
+                  self._ring_settings, self._scorer, self._top_k)
+
+        return hashlib.sha256(pickle.dumps(search)).hexdigest()
+
+    def _save_checkpoint(self, completed : list) -> None:
+        if self._checkpoint is None:
+            return
+
+        contents = {'search': self._fingerprint(), 'completed': completed,
+                    'results': self._results}
+
+        # Write to a temporary file first so an interrupted save can't leave
+        # a truncated checkpoint behind.
+        temporary = self._checkpoint + '.tmp'
+        with open(temporary, 'w', encoding='utf-8') as checkpoint:
+            json.dump(contents, checkpoint)
+
+        os.replace(temporary, self._checkpoint)
+
+
+def search_unit(model : str, rotors : tuple, reflector : str, ciphertext : str,
+                scorer, positions, ring_settings, top_k : int,
+                stop_score, position_cache = False) -> list:
+    '''
+    Try every ring setting and start position for one rotor order and
+    reflector.  This is run in the worker processes.
+    @return List of the best SearchResult entries for the unit.
+    '''
+    # pylint: disable=too-many-arguments, too-many-locals
+
+    machine = Machine()
+
+    if not machine.configure(model, list(rotors), reflector):
+        raise ValueError(machine.last_error)
+
+    if position_cache:
+        # NumPy is only needed when the cache is used.
+        # pylint: disable=import-outside-toplevel
+        from simulation.position_cache import PositionCache
+
+        # One table serves every ring setting of the unit.
+        machine.set_position_cache(PositionCache(
+            max_tables=1, directory=None if position_cache is True
+            else position_cache))
+
+    if positions is None:
+        positions = itertools.product(range(26), repeat=len(rotors))
+    positions = list(positions)
+
+    if ring_settings is None:
+        ring_settings = [(0,) * len(rotors)]
+
+    elif callable(ring_settings):
+        ring_settings = ring_settings(rotors)
+
+    best = []
+
+    for ring_setting in ring_settings:
+        # Changing the ring settings only swaps the lookup tables, the
+        # cost of each trial decrypt is the same.
+        for rotor_no, rotor_ring_setting in enumerate(ring_setting):
+            machine.set_ring_setting(rotor_no, rotor_ring_setting)
+
+        for position in positions:
+            for rotor_no, rotor_position in enumerate(position):
+                machine.set_rotor_position(rotor_no, rotor_position)
+
+            plaintext = machine.encrypt(ciphertext, keep_non_letters=False)
+            result = SearchResult(scorer(plaintext), rotors, reflector,
+                                  tuple(position), plaintext,
+                                  tuple(ring_setting))
+
+            if len(best) < top_k:
+                heapq.heappush(best, result)
+
+            else:
+                heapq.heappushpop(best, result)
+
+            if stop_score is not None and result.score >= stop_score:
+                return best
+
+    return best
+
+
+def ring_setting_candidates(rotors, varying : int = DEFAULT_VARYING_RINGS):
+    '''
+    Ring settings worth trying for a rotor order, usable as the KeySearch
+    'ring_settings' hook.  A ring setting only matters through the turnover
+    point it moves, and the leftmost rotors never step a rotor that matters,
+    so their ring setting is equivalent to an offset of their start
+    position (which the search already tries).  Only the rightmost rotors
+    have their ring settings varied, the rest are left at 'A' (0).
+    @param rotors Rotor order, left to right.
+    @param varying Number of rightmost rotors to vary the ring setting of.
+    @return Generator of ring setting tuples, left to right.
+    '''
+    fixed = (0,) * max(len(rotors) - varying, 0)
+
+    for varied in itertools.product(range(26),
+                                    repeat=min(varying, len(rotors))):
+        yield fixed + varied
@@ -0,0 +1,314 @@
+'''
+    EnigmaSimulator - A software implementation of the Engima Machine.
+    Copyright (C) 2015-2021 Engima Simulator Development Team
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    Bulk processing of traffic by key sheet.  A key sheet gives each day's
+    rotor order, ring settings and plugboard, every message of a day only
+    has its own start position.  Each day is compiled into a configured
+    machine once, the messages are then streamed through it and the
+    results (or errors) written to a JSON lines file in batches.
+
+    Key sheets are JSON (a list of day objects) or CSV with the columns:
+        day, model, rotors, reflector, ring_settings, plugboard
+    e.g. '31, Enigma1, I IV III, UKW-B, 16 26 08, AD CN ET FL GI JV KZ PU'.
+    Ring settings are numbers 1-26 as on a printed key sheet, or letters.
+
+    Messages are JSON lines or CSV with the columns:
+        id, day, positions, text
+    where positions are the start position letters, e.g. 'QWE'.
+'''
+import collections
+import csv
+import json
+import os
+from simulation.enigma_machine import Machine
+
+# Default number of results written to the output file at a time.
+DEFAULT_BATCH_SIZE = 1000
+
+KEY_SHEET_FIELDS = ['day', 'model', 'rotors', 'reflector', 'ring_settings',
+                    'plugboard']
+MESSAGE_FIELDS = ['id', 'day', 'positions', 'text']
+
+DaySettings = collections.namedtuple('DaySettings', KEY_SHEET_FIELDS)
+DaySettings.__doc__ = '''
+    Settings of one day of a key sheet: rotor names and ring settings
+    (0-25) left to right, and the plugboard as letter pairs, e.g. 'AB CD'.
+'''
+
+Message = collections.namedtuple('Message', MESSAGE_FIELDS + ['error'],
+                                 defaults=(None,))
+Message.__doc__ = '''
+    Message to encrypt/decrypt, error is set (and the other fields may be
+    None) if its line of the messages file couldn't be read.
+'''
+
+PipelineSummary = collections.namedtuple('PipelineSummary',
+                                         ['messages', 'errors', 'days'])
+
+
+class CompiledDay:
+    '''
+    A day's settings compiled into a configured machine, the wiring is
+    validated and the lookup tables are built once.  Each message only
+    restores its start position.  Not thread-safe, use one per thread.
+    '''
+    __slots__ = ['_machine', '_no_of_rotors', '_settings', '_state']
+
+    @property
+    def settings(self) -> DaySettings:
+        ''' Property getter : Settings the day was compiled from. '''
+        return self._settings
+
+    def __init__(self, settings : DaySettings):
+        '''
+        @param settings DaySettings of the day.
+        '''
+        machine = Machine()
+        if not machine.configure(settings.model, list(settings.rotors),
+                                 settings.reflector):
+            raise ValueError(machine.last_error)
+
+        self._no_of_rotors = len(settings.rotors)
+        machine.set_ring_settings(settings.ring_settings)
+        machine.set_plugboard(settings.plugboard or None)
+
+        self._machine = machine
+        self._settings = settings
+        self._state = machine.snapshot()
+
+    def encrypt(self, text : str, positions,
+                keep_non_letters : bool = True) -> str:
+        '''
+        Encrypt/decrypt a message of the day.
+        @param text Message to encrypt.
+        @param positions Start positions, letters (e.g. 'QWE') or numbers
+                         0-25, left to right.
+        @param keep_non_letters See Machine.encrypt().
+        @return Encrypted message.
+        '''
+        positions = parse_positions(positions)
+        if len(positions) != self._no_of_rotors:
+            raise ValueError("Invalid number of rotor positions")
+
+        self._machine.restore(self._state._replace(positions=positions))
+        return self._machine.encrypt(text, keep_non_letters)
+
+
+def parse_positions(positions) -> tuple:
+    '''
+    Convert start positions to contact numbers.
+    @param positions Letters, e.g. 'QWE', or numbers 0-25.
+    @return Tuple of contact numbers.
+    '''
+    if isinstance(positions, str):
+        positions = [ord(letter) - ord('A')
+                     for letter in positions.replace(' ', '').upper()]
+
+    if any(not 0 <= position <= 25 for position in positions):
+        raise ValueError("Rotor positions are invalid")
+
+    return tuple(positions)
+
+
+def parse_ring_settings(ring_settings) -> tuple:
+    '''
+    Convert key sheet ring settings to 0-25.
+    @param ring_settings Space separated numbers 1-26 or letters, e.g.
+                         '16 26 08' or 'P Z H', or a list of either.
+    @return Tuple of ring settings 0-25.
+    '''
+    if isinstance(ring_settings, str):
+        ring_settings = ring_settings.split()
+
+    parsed = []
+    for ring_setting in ring_settings:
+        if isinstance(ring_setting, int) or ring_setting.isdigit():
+            parsed.append(int(ring_setting) - 1)
+        elif len(ring_setting) == 1 and ring_setting.isalpha():
+            parsed.append(ord(ring_setting.upper()) - ord('A'))
+        else:
+            parsed.append(-1)
+
+    if any(not 0 <= ring_setting <= 25 for ring_setting in parsed):
+        raise ValueError("Ring settings are invalid")
+
+    return tuple(parsed)
+
+
+def load_key_sheet(path : str) -> dict:
+    '''
+    Load a key sheet, see the module documentation for the formats.
+    @param path JSON or CSV file, chosen by its extension.
+    @return Dictionary of day => DaySettings.
+    '''
+    with open(path, 'r', encoding='utf-8', newline='') as sheet_file:
+        if _is_csv(path):
+            rows = list(csv.DictReader(sheet_file, skipinitialspace=True))
+        else:
+            rows = json.load(sheet_file)
+
+    key_sheet = {}
+
+    for row in rows:
+        missing = [field for field in KEY_SHEET_FIELDS[:4] if field not in row]
+        if missing:
+            raise ValueError(f"Key sheet entry is missing {missing}")
+
+        rotors = row['rotors']
+        if isinstance(rotors, str):
+            rotors = rotors.split()
+
+        day = str(row['day']).strip()
+        key_sheet[day] = DaySettings(
+            day, row['model'].strip(), tuple(rotors), row['reflector'].strip(),
+            parse_ring_settings(row.get('ring_settings') or
+                                ['1'] * len(rotors)),
+            row.get('plugboard') or None)
+
+    return key_sheet
+
+
+def read_messages(path : str):
+    '''
+    Read messages, see the module documentation for the formats.  A JSON
+    line that can't be parsed is yielded as a Message with only its error
+    set, so one bad line doesn't stop the rest being read.
+    @param path JSON lines or CSV file, chosen by its extension.
+    @return Iterator of Message.
+    '''
+    with open(path, 'r', encoding='utf-8', newline='') as messages_file:
+        if _is_csv(path):
+            rows = csv.DictReader(messages_file, skipinitialspace=True)
+            for row in rows:
+                yield _message(row, rows.line_num)
+            return
+
+        for line_no, line in enumerate(messages_file, 1):
+            if not line.strip():
+                continue
+
+            try:
+                row = json.loads(line)
+
+            except ValueError as error:
+                yield Message(None, None, None, '',
+                              f"Line {line_no} isn't valid JSON : {error}")
+                continue
+
+            if not isinstance(row, dict):
+                yield Message(None, None, None, '',
+                              f"Line {line_no} isn't a JSON object")
+                continue
+
+            yield _message(row, line_no)
+
+
+def run_pipeline(key_sheet : dict, messages, output_path : str,
+                 keep_non_letters : bool = True,
+                 batch_size : int = DEFAULT_BATCH_SIZE) -> PipelineSummary:
+    '''
+    Encrypt/decrypt a stream of messages by key sheet.  Each day is compiled
+    the first time one of its messages is seen, the results are written in
+    input order as JSON lines: {"id", "day", "output"} for a message or
+    {"id", "day", "error"} if it couldn't be read or processed.  The results
+    so far are written even if the messages iterable raises.
+    @param key_sheet Dictionary of day => DaySettings, see load_key_sheet().
+    @param messages Iterable of Message, see read_messages().
+    @param output_path JSON lines file to write the results to.
+    @param keep_non_letters See Machine.encrypt().
+    @param batch_size Number of results written at a time.
+    @return PipelineSummary of the messages, errors and days compiled,
+            days missing from the key sheet or invalid aren't counted.
+    '''
+    compiled = {}
+    batch = []
+    count = errors = 0
+
+    with open(output_path, 'w', encoding='utf-8') as output_file:
+        try:
+            for message in messages:
+                result = {'id': message.id, 'day': message.day}
+
+                try:
+                    if message.error is not None:
+                        raise ValueError(message.error)
+
+                    day = compiled.get(message.day)
+                    if day is None:
+                        day = compiled[message.day] = _compile(key_sheet,
+                                                               message.day)
+
+                    result['output'] = day.encrypt(message.text,
+                                                   message.positions,
+                                                   keep_non_letters)
+
+                except (ValueError, TypeError) as error:
+                    result['error'] = str(error)
+                    errors += 1
+
+                count += 1
+                batch.append(json.dumps(result) + '\n')
+
+                if len(batch) >= batch_size:
+                    output_file.writelines(batch)
+                    batch.clear()
+
+        finally:
+            output_file.writelines(batch)
+
+    # Days that couldn't be compiled are remembered but not counted.
+    days = sum(isinstance(day, CompiledDay) for day in compiled.values())
+    return PipelineSummary(count, errors, days)
+
+
+def _message(row : dict, line_no : int) -> Message:
+    day = str(row.get('day')).strip()
+
+    for field in ('positions', 'text'):
+        value = row.get(field)
+        if value is not None and not isinstance(value, str):
+            return Message(row.get('id'), day, None, '',
+                           f"Line {line_no} '{field}' isn't a string")
+
+    return Message(row.get('id'), day, row.get('positions'),
+                   row.get('text') or '')
+
+
+def _compile(key_sheet : dict, day : str):
+    settings = key_sheet.get(day)
+    if settings is None:
+        return _FailedDay(f"Day '{day}' isn't in the key sheet")
+
+    try:
+        return CompiledDay(settings)
+
+    except ValueError as error:
+        # Remember the failure so the day isn't compiled for every message.
+        return _FailedDay(f"Day '{day}' is invalid : {error}")
+
+
+class _FailedDay:
+    ''' Stands in for a day that couldn't be compiled. '''
+    __slots__ = ['_error']
+
+    def __init__(self, error : str):
+        self._error = error
+
+    def encrypt(self, *_) -> str:
+        ''' Raise the compile error for every message. '''
+        raise ValueError(self._error)
+
+
+def _is_csv(path : str) -> bool:
+    return os.path.splitext(path)[1].lower() == '.csv'
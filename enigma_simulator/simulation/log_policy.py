@@ -0,0 +1,103 @@
+'''
+    EnigmaSimulator - A software implementation of the Engima Machine.
+    Copyright (C) 2015-2021 Engima Simulator Development Team
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+'''
+import collections
+
+# logging.DEBUG, the logging module is only imported when a standard policy
+# is created without a logger so it isn't loaded on every start up.
+DEBUG = 10
+
+class TraceEvent(collections.namedtuple('TraceEvent',
+                                        ['source', 'message', 'args'])):
+    ''' A single unformatted debug message passed to a trace sink. '''
+    __slots__ = ()
+
+    @property
+    def text(self) -> str:
+        ''' Property getter : The message formatted with its arguments. '''
+        return self.message % self.args if self.args else self.message
+
+
+class LogPolicy:
+    '''
+    Logging policy used by the machine and rotors for debug output of each
+    key press.  This base policy is 'off': callers check 'enabled' before
+    building any log arguments, so nothing is formatted or allocated.
+    '''
+    __slots__ = []
+
+    @property
+    def enabled(self) -> bool:
+        ''' Property getter : Whether debug messages are wanted. '''
+        return False
+
+    def debug(self, message : str, *args) -> None:
+        '''
+        Log a debug message, formatting is deferred using %-style arguments.
+        @param message Message format string.
+        @param args Arguments for the format string.
+        '''
+
+
+class StandardLogPolicy(LogPolicy):
+    ''' Log debug messages through the standard logging module. '''
+    __slots__ = ['_logger']
+
+    @property
+    def enabled(self) -> bool:
+        ''' Property getter : Whether the logger has debug enabled. '''
+        return self._logger.isEnabledFor(DEBUG)
+
+    def __init__(self, logger = None):
+        '''
+        @param logger logging.Logger to write to, default is the 'simulation'
+                      logger.
+        '''
+        if logger is None:
+            # pylint: disable=import-outside-toplevel
+            import logging
+            logger = logging.getLogger('simulation')
+
+        self._logger = logger
+
+    def debug(self, message : str, *args) -> None:
+        self._logger.debug(message, *args)
+
+
+class TraceSinkPolicy(LogPolicy):
+    '''
+    Pass every debug message to a sink as an unformatted TraceEvent, so the
+    trace can be inspected or stored without parsing log text.
+    '''
+    __slots__ = ['_sink', '_source']
+
+    @property
+    def enabled(self) -> bool:
+        ''' Property getter : Always enabled. '''
+        return True
+
+    def __init__(self, sink, source : str = 'simulation'):
+        '''
+        @param sink Callable that is passed each TraceEvent.
+        @param source Source name recorded in each event.
+        '''
+        self._sink = sink
+        self._source = source
+
+    def debug(self, message : str, *args) -> None:
+        self._sink(TraceEvent(self._source, message, args))
+
+
+# Shared policy for logging being off.
+LOGGING_OFF = LogPolicy()
@@ -0,0 +1,296 @@
+'''
+    EnigmaSimulator - A software implementation of the Engima Machine.
+    Copyright (C) 2015-2021 Engima Simulator Development Team
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    Optional native accelerator for bulk encryption and batch key trials,
+    using the C interface in src/libEnigmaSimulator/NativeCore.h through
+    ctypes.  Build the library with 'make native' in src/libEnigmaSimulator
+    (or build_library()) and either set ENIGMASIM_NATIVE_LIBRARY to its
+    path or ENIGMASIM_BIN_DIR to the directory it was built in.  When the
+    library isn't available get_core() returns the pure-Python core, which
+    has the same interface.
+'''
+import ctypes
+import ctypes.util
+import os
+import subprocess
+from simulation.circuit_tables import LETTER_CODES, NOT_A_LETTER, \
+                                    NUMBER_OF_CONTACTS
+from simulation.stepping import LEVER_STEPPING_ROTORS, SteppingMode
+
+# Version of the C interface this module was written against.
+NATIVE_VERSION = 1
+
+LIBRARY_ENVIRONMENT_VARIABLE = 'ENIGMASIM_NATIVE_LIBRARY'
+BIN_DIRECTORY_ENVIRONMENT_VARIABLE = 'ENIGMASIM_BIN_DIR'
+LIBRARY_NAME = 'EnigmaNative'
+LIBRARY_FILE_NAME = 'libEnigmaNative.so'
+
+SOURCE_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                '..', '..', 'src', 'libEnigmaSimulator')
+
+# ASCII letter for each contact number, for translating native output.
+CONTACT_LETTERS = bytes(ord('A') + (byte % NUMBER_OF_CONTACTS)
+                        for byte in range(256))
+
+_UINT8_P = ctypes.POINTER(ctypes.c_uint8)
+_UINT32_P = ctypes.POINTER(ctypes.c_uint32)
+
+
+class PythonCore:
+    '''
+    Pure-Python core, the Machine's own lookup tables are used.  It is the
+    fallback when the native library isn't available.
+    '''
+    __slots__ = []
+
+    @property
+    def native(self) -> bool:
+        ''' Property getter : Whether this is the native core. '''
+        return False
+
+    def encrypt(self, machine, text : str,
+                keep_non_letters : bool = True) -> str:
+        ''' Encrypt a message, see Machine.encrypt(). '''
+        return machine.encrypt(text, keep_non_letters)
+
+    def encrypt_bytes(self, machine, buffer,
+                      keep_non_letters : bool = True) -> bytes:
+        ''' Encrypt a buffer of ASCII bytes, see Machine.encrypt_bytes(). '''
+        return machine.encrypt_bytes(buffer, keep_non_letters)
+
+    def trial_decrypt(self, machine, ciphertext : str,
+                      start_positions) -> list:
+        '''
+        Decrypt a message from each of a number of start positions of the
+        three stepping rotors, any other rotors stay where they are.  The
+        machine itself isn't changed.
+        @param machine Configured lever stepped Machine instance.
+        @param ciphertext Message, anything that isn't a letter is dropped.
+        @param start_positions Sequence of (left, middle, right) positions.
+        @return List of decrypted messages, one per start position.
+        '''
+        start_positions = _check_start_positions(start_positions)
+        trial = machine.clone()
+        first = len(trial.snapshot().positions) - LEVER_STEPPING_ROTORS
+        plaintexts = []
+
+        for positions in start_positions:
+            for rotor_no, position in enumerate(positions):
+                trial.set_rotor_position(first + rotor_no, position)
+
+            plaintexts.append(trial.encrypt(ciphertext,
+                                            keep_non_letters=False))
+
+        return plaintexts
+
+
+class NativeCore(PythonCore):
+    '''
+    Core that runs the circuit in the native library.  ctypes releases the
+    GIL during each call, so threads can encrypt in parallel.  Machines the
+    native circuit doesn't cover (cog stepping, a step sequence or
+    instrumentation) are passed to the pure-Python core.
+    '''
+    __slots__ = ['_library']
+
+    @property
+    def native(self) -> bool:
+        ''' Property getter : Whether this is the native core. '''
+        return True
+
+    def __init__(self, path : str):
+        '''
+        Load the native library.
+        @param path Path of the shared library.
+        '''
+        library = ctypes.CDLL(path)
+
+        library.EnigmaNativeVersion.restype = ctypes.c_int
+        if library.EnigmaNativeVersion() != NATIVE_VERSION:
+            raise OSError(f"Native library '{path}' is the wrong version")
+
+        library.EnigmaNativeEncrypt.restype = ctypes.c_size_t
+        library.EnigmaNativeEncrypt.argtypes = [
+            ctypes.c_char_p, ctypes.c_char_p, ctypes.c_char_p,
+            ctypes.c_char_p, _UINT32_P, _UINT8_P, _UINT8_P, ctypes.c_char_p,
+            ctypes.c_size_t, ctypes.c_char_p, ctypes.c_int]
+
+        library.EnigmaNativeTrials.restype = None
+        library.EnigmaNativeTrials.argtypes = [
+            ctypes.c_char_p, ctypes.c_char_p, ctypes.c_char_p,
+            ctypes.c_char_p, _UINT32_P, ctypes.c_char_p, ctypes.c_size_t,
+            ctypes.c_char_p, ctypes.c_size_t, ctypes.c_char_p]
+
+        self._library = library
+
+    def encrypt(self, machine, text : str,
+                keep_non_letters : bool = True) -> str:
+        data = text.upper().encode('utf-8')
+        return self.encrypt_bytes(machine, data,
+                                  keep_non_letters).decode('utf-8')
+
+    def encrypt_bytes(self, machine, buffer,
+                      keep_non_letters : bool = True) -> bytes:
+        if not _is_supported(machine):
+            return super().encrypt_bytes(machine, buffer, keep_non_letters)
+
+        data = bytes(memoryview(buffer).cast('B'))
+        state = machine.snapshot()
+        first = len(state.positions) - LEVER_STEPPING_ROTORS
+
+        positions = (ctypes.c_uint8 * LEVER_STEPPING_ROTORS)(
+            *_check_start_positions([state.positions[first:]])[0])
+        double_step = ctypes.c_uint8(state.double_step)
+        output = ctypes.create_string_buffer(len(data))
+
+        written = self._library.EnigmaNativeEncrypt(
+            *self._circuit_arguments(machine), positions,
+            ctypes.byref(double_step), data, len(data), output,
+            int(keep_non_letters))
+
+        machine.restore(state._replace(
+            positions=state.positions[:first] + tuple(positions),
+            double_step=bool(double_step.value)))
+
+        return output.raw[:written]
+
+    def trial_decrypt(self, machine, ciphertext : str,
+                      start_positions) -> list:
+        if not _is_supported(machine):
+            return super().trial_decrypt(machine, ciphertext,
+                                         start_positions)
+
+        contacts = ciphertext.upper().encode('utf-8').translate(LETTER_CODES)
+        contacts = contacts.replace(bytes([NOT_A_LETTER]), b'')
+
+        start_positions = _check_start_positions(start_positions)
+        starts = bytes(position for positions in start_positions
+                       for position in positions)
+        trials = len(start_positions)
+        output = ctypes.create_string_buffer(trials * len(contacts))
+
+        self._library.EnigmaNativeTrials(
+            *self._circuit_arguments(machine), starts, trials, contacts,
+            len(contacts), output)
+
+        plaintext = output.raw.translate(CONTACT_LETTERS).decode('ascii')
+        return [plaintext[trial * len(contacts):(trial + 1) * len(contacts)]
+                for trial in range(trials)]
+
+    def _circuit_arguments(self, machine) -> tuple:
+        forward, inverse, notches, reflector, plugboard = \
+            machine.lever_circuit()
+
+        return (b''.join(b''.join(tables) for tables in forward),
+                b''.join(b''.join(tables) for tables in inverse),
+                bytes(reflector), plugboard,
+                (ctypes.c_uint32 * LEVER_STEPPING_ROTORS)(*notches))
+
+
+def build_library(destination : str, compiler : str = None) -> str:
+    '''
+    Build the native library with the system C++ compiler.
+    @param destination Path of the shared library to write.
+    @param compiler Compiler to use, default is $CXX or 'c++'.
+    @return Path of the built library.
+    '''
+    compiler = compiler or os.environ.get('CXX', 'c++')
+    source = os.path.join(SOURCE_DIRECTORY, 'NativeCore.cpp')
+
+    subprocess.run([compiler, '-std=c++17', '-O2', '-shared', '-fPIC',
+                    '-I', SOURCE_DIRECTORY, '-o', destination, source],
+                   check=True, capture_output=True)
+
+    return destination
+
+
+def find_library() -> str:
+    '''
+    Find the native library, see the module documentation.
+    @return Path of the library or None if it can't be found.
+    '''
+    path = os.environ.get(LIBRARY_ENVIRONMENT_VARIABLE)
+    if path:
+        return path
+
+    bin_directory = os.environ.get(BIN_DIRECTORY_ENVIRONMENT_VARIABLE)
+    if bin_directory:
+        path = os.path.join(bin_directory, LIBRARY_FILE_NAME)
+        if os.path.exists(path):
+            return path
+
+    return ctypes.util.find_library(LIBRARY_NAME)
+
+
+_DEFAULT_CORE = None
+
+
+def get_core(path : str = None) -> PythonCore:
+    '''
+    Get the native core.  When no path is given the library is found with
+    find_library() and the pure-Python core is the fallback if it can't be
+    found or loaded, the default core is loaded once and shared.
+    @param path Path of the native library, a library that can't be loaded
+                from an explicit path is an error.
+    @return NativeCore or PythonCore instance.
+    @exception OSError The library at path can't be loaded.
+    '''
+    global _DEFAULT_CORE  # pylint: disable=global-statement
+
+    if path is None and _DEFAULT_CORE is not None:
+        return _DEFAULT_CORE
+
+    if path is not None:
+        try:
+            return NativeCore(path)
+
+        except AttributeError as error:
+            raise OSError(f"Native library '{path}' is missing "
+                          f"'{error.name}'") from error
+
+    library_path = find_library()
+    core = PythonCore()
+
+    if library_path:
+        try:
+            core = NativeCore(library_path)
+
+        except (OSError, AttributeError):
+            pass
+
+    _DEFAULT_CORE = core
+    return core
+
+
+def _check_start_positions(start_positions) -> list:
+    # The native library indexes its tables with the positions unchecked, so
+    # they are validated here for both cores.
+    start_positions = [tuple(positions) for positions in start_positions]
+
+    for positions in start_positions:
+        if len(positions) != LEVER_STEPPING_ROTORS:
+            raise ValueError(f"Start positions {positions} aren't "
+                             f"{LEVER_STEPPING_ROTORS} rotor positions")
+
+        for position in positions:
+            if not isinstance(position, int) or \
+                    not 0 <= position < NUMBER_OF_CONTACTS:
+                raise ValueError("Invalid rotor positions")
+
+    return start_positions
+
+
+def _is_supported(machine) -> bool:
+    return machine.stepping.mode is SteppingMode.LEVER and \
+        not machine.uses_step_sequence and machine.instrumentation is None
@@ -0,0 +1,179 @@
+'''
+    EnigmaSimulator - A software implementation of the Engima Machine.
+    Copyright (C) 2015-2021 Engima Simulator Development Team
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    Multi-core encryption/decryption of very long messages.  The message is
+    split into chunks and the machine state at the start of each chunk is
+    found by seeking the step sequence by the number of letters before it,
+    so no earlier key presses are replayed.  The chunks are encrypted by a
+    process pool through shared memory input/output buffers (the text
+    itself is never pickled) and stitched back together in order, the
+    output is identical to Machine.encrypt_bytes().
+'''
+import concurrent.futures
+from multiprocessing import shared_memory
+from simulation.circuit_tables import LETTER_CODES, NOT_A_LETTER
+from simulation.enigma_machine import Machine
+from simulation.stepping import SteppingMode
+
+# Default bytes of message per chunk handed to a worker.
+DEFAULT_CHUNK_SIZE = 1 << 20
+
+# Every byte that isn't one of the letters A-Z, for counting key presses.
+NON_LETTER_BYTES = bytes(byte for byte in range(256)
+                         if LETTER_CODES[byte] == NOT_A_LETTER)
+
+# Machines built by this (worker) process, keyed by configuration, so each
+# worker only configures a machine once however many chunks it encrypts.
+_WORKER_MACHINES = {}
+
+
+def parallel_encrypt(machine : Machine, text : str,
+                     keep_non_letters : bool = True, **options) -> str:
+    '''
+    Encrypt/decrypt a whole message across several processes, see
+    parallel_encrypt_bytes().
+    @param text Message to encrypt, it is converted to upper case.
+    @return Encrypted message.
+    '''
+    data = text.upper().encode('utf-8')
+    return parallel_encrypt_bytes(machine, data, keep_non_letters,
+                                  **options).decode('utf-8')
+
+
+def parallel_encrypt_bytes(machine : Machine, buffer,
+                           keep_non_letters : bool = True,
+                           max_workers : int = None,
+                           chunk_size : int = DEFAULT_CHUNK_SIZE) -> bytes:
+    '''
+    Encrypt/decrypt a buffer of ASCII letter codes (A-Z) across several
+    processes.  The machine is left in the same state as if encrypt_bytes()
+    had been called.  Machines that don't use lever stepping, and buffers
+    no bigger than one chunk, are encrypted serially.  Workers rebuild the
+    machine from Machine.configuration, so custom components must be
+    registered before the pool starts (e.g. at import time).
+    @param machine Configured machine.
+    @param buffer bytes, bytearray or memoryview to encrypt.
+    @param keep_non_letters If True any byte that isn't A-Z is passed
+                            through unchanged, otherwise it is dropped.
+    @param max_workers Number of worker processes, default all cores.
+    @param chunk_size Bytes of message per chunk.
+    @return Encrypted bytes.
+    '''
+    if chunk_size < 1:
+        raise ValueError("Chunk size must be at least 1")
+
+    data = memoryview(buffer).cast('B')
+    length = len(data)
+
+    if machine.stepping.mode is not SteppingMode.LEVER or \
+       length <= chunk_size:
+        return machine.encrypt_bytes(data, keep_non_letters)
+
+    bounds = [(start, min(start + chunk_size, length))
+              for start in range(0, length, chunk_size)]
+    states, final_state = _chunk_states(machine, data, bounds)
+
+    source = shared_memory.SharedMemory(create=True, size=length)
+    target = shared_memory.SharedMemory(create=True, size=length)
+
+    try:
+        source.buf[:length] = data
+
+        with concurrent.futures.ProcessPoolExecutor(max_workers) \
+                as executor:
+            futures = [executor.submit(encrypt_chunk, machine.configuration,
+                                       state, source.name, target.name,
+                                       start, end, keep_non_letters)
+                       for state, (start, end) in zip(states, bounds)]
+            written = [future.result() for future in futures]
+
+        if keep_non_letters:
+            result = bytes(target.buf[:length])
+        else:
+            result = b''.join(bytes(target.buf[start:start + count])
+                              for (start, _), count in zip(bounds, written))
+
+    finally:
+        for memory in (source, target):
+            memory.close()
+            memory.unlink()
+
+    machine.restore(final_state)
+    return result
+
+
+def encrypt_chunk(configuration : tuple, state, source_name : str,
+                  target_name : str, start : int, end : int,
+                  keep_non_letters : bool) -> int:
+    '''
+    Worker for parallel_encrypt_bytes(), encrypt one chunk of the shared
+    input buffer into the same offset of the shared output buffer.
+    @param configuration Machine.configuration of the machine.
+    @param state MachineState at the start of the chunk.
+    @param source_name Name of the shared memory input buffer.
+    @param target_name Name of the shared memory output buffer.
+    @param start Offset of the chunk.
+    @param end Offset of the end of the chunk.
+    @param keep_non_letters See Machine.encrypt_bytes().
+    @return Number of bytes written.
+    '''
+    machine = _worker_machine(configuration)
+    machine.restore(state)
+
+    source = shared_memory.SharedMemory(name=source_name)
+    target = shared_memory.SharedMemory(name=target_name)
+
+    try:
+        with source.buf[start:end] as chunk:
+            encrypted = machine.encrypt_bytes(chunk, keep_non_letters)
+        target.buf[start:start + len(encrypted)] = encrypted
+
+    finally:
+        source.close()
+        target.close()
+
+    return len(encrypted)
+
+
+def _worker_machine(configuration : tuple) -> Machine:
+    machine = _WORKER_MACHINES.get(configuration)
+
+    if machine is None:
+        machine = Machine()
+        if not machine.configure(*configuration):
+            raise ValueError(machine.last_error)
+        _WORKER_MACHINES[configuration] = machine
+
+    return machine
+
+
+def _chunk_states(machine : Machine, data : memoryview, bounds : list):
+    '''
+    Get the machine state at the start of each chunk and after the last
+    one, by seeking a step sequence of a clone of the machine.
+    '''
+    seeker = machine.clone()
+    seeker.enable_step_sequence()
+
+    states = []
+    keypresses = 0
+
+    for start, end in bounds:
+        seeker.seek(keypresses)
+        states.append(seeker.snapshot())
+        keypresses += len(bytes(data[start:end]).translate(None,
+                                                           NON_LETTER_BYTES))
+
+    seeker.seek(keypresses)
+    return states, seeker.snapshot()
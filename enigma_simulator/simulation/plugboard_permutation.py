@@ -0,0 +1,116 @@
+'''
+    EnigmaSimulator - A software implementation of the Engima Machine.
+    Copyright (C) 2015-2021 Engima Simulator Development Team
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+'''
+from simulation.circuit_tables import CONTACTS, IDENTITY_TABLE, \
+                                    NUMBER_OF_CONTACTS
+from simulation.rotor_contact import RotorContact
+
+class PlugboardPermutation:
+    '''
+    Plugboard whose wiring is held as a 26 entry permutation of contact
+    numbers.  It can be used anywhere a Plugboard is, e.g. when a machine is
+    restored from a snapshot.
+    '''
+    __slots__ = ['_wiring']
+
+    @property
+    def wiring(self) -> bytes:
+        ''' Property getter : Output contact indexed by input contact. '''
+        return bytes(self._wiring)
+
+    @property
+    def plug_count(self) -> int:
+        ''' Property getter : Number of plugged pairs. '''
+        return sum(contact != plug
+                   for contact, plug in enumerate(self._wiring)) // 2
+
+    def __init__(self, wiring : bytes = IDENTITY_TABLE):
+        '''
+        @param wiring Permutation of the contact numbers 0-25, every plug
+                      must be paired both ways.  Default is no plugs.
+        '''
+        if sorted(wiring) != list(range(NUMBER_OF_CONTACTS)):
+            raise ValueError("Plugboard wiring is not a permutation")
+
+        if any(wiring[wiring[contact]] != contact
+               for contact in range(NUMBER_OF_CONTACTS)):
+            raise ValueError("Plugboard wiring is not paired")
+
+        self._wiring = bytearray(wiring)
+
+    @classmethod
+    def from_pairs(cls, pairs):
+        '''
+        Create a plugboard from pairs of plugged letters.
+        @param pairs Iterable of two letter strings, e.g. ['AB', 'CD'], or
+                     one string of space separated pairs, e.g. 'AB CD'.
+        @return New PlugboardPermutation instance.
+        '''
+        if isinstance(pairs, str):
+            pairs = pairs.split()
+
+        wiring = bytearray(IDENTITY_TABLE)
+
+        for pair in pairs:
+            pair = pair.upper()
+            if len(pair) != 2 or not pair.isalpha() or not pair.isascii():
+                raise ValueError(f"Plugboard pair '{pair}' is invalid")
+
+            first, second = (ord(letter) - ord('A') for letter in pair)
+            if first == second or wiring[first] != first or \
+               wiring[second] != second:
+                raise ValueError(f"Plugboard pair '{pair}' reuses a letter")
+
+            wiring[first], wiring[second] = second, first
+
+        return cls(wiring)
+
+    def swap(self, first : int, second : int) -> tuple:
+        '''
+        Plug two contacts together, the letters they were plugged to are
+        left unplugged.  Plugging a contact to itself unplugs it.  This is
+        O(1), for the moves of a plugboard hill-climb.
+        @param first Contact number 0-25.
+        @param second Contact number 0-25.
+        @return Token to pass to undo() to reverse the swap.
+        '''
+        wiring = self._wiring
+        old_first = wiring[first]
+        old_second = wiring[second]
+        token = ((old_first, wiring[old_first]),
+                 (old_second, wiring[old_second]),
+                 (first, old_first), (second, old_second))
+
+        wiring[old_first] = old_first
+        wiring[old_second] = old_second
+        wiring[first] = second
+        wiring[second] = first
+        return token
+
+    def undo(self, token : tuple) -> None:
+        '''
+        Reverse a swap, swaps must be undone in the reverse order.
+        @param token Token returned by swap().
+        '''
+        wiring = self._wiring
+        for contact, plug in token:
+            wiring[contact] = plug
+
+    def get_plug(self, contact : RotorContact) -> RotorContact:
+        '''
+        Get the contact a plug is connected to.
+        @param contact Input contact.
+        @return Output contact.
+        '''
+        return CONTACTS[self._wiring[contact.value]]
@@ -0,0 +1,202 @@
+'''
+    EnigmaSimulator - A software implementation of the Engima Machine.
+    Copyright (C) 2015-2021 Engima Simulator Development Team
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    Plugboard recovery once the rotor settings are known.  The plugboard is
+    applied on both sides of the rotor core: out = P[core_i[P[in]]], where
+    core_i is the circuit without a plugboard at the i'th letter.  RotorCore
+    caches core_i for every letter of a ciphertext, so a new plugboard is
+    evaluated with table lookups alone, and climb_plugboard() hill-climbs
+    over O(1) PlugboardPermutation.swap() moves.  climb_plugboard_ngrams()
+    does the same with NumPy, re-scoring only the letters a move changes.
+'''
+from simulation.circuit_tables import IDENTITY_TABLE, LETTER_CODES, \
+                                    NOT_A_LETTER, NUMBER_OF_CONTACTS
+from simulation.plugboard_permutation import PlugboardPermutation
+
+# Most pairs a plugboard was set with in practice.
+DEFAULT_MAX_PLUGS = 10
+
+
+class RotorCore:
+    '''
+    The rotor core (rotors and reflector, no plugboard) of a machine for
+    every letter of a ciphertext, as one table of 26 entries per letter.
+    '''
+    __slots__ = ['_ciphertext', '_core']
+
+    @property
+    def ciphertext_contacts(self) -> bytes:
+        ''' Property getter : Contact numbers 0-25 of the ciphertext. '''
+        return self._ciphertext
+
+    @property
+    def table(self) -> bytes:
+        '''
+        Property getter : Core tables of every letter, the core of the i'th
+        letter is table[26 * i:26 * (i + 1)].
+        '''
+        return self._core
+
+    def __len__(self) -> int:
+        return len(self._ciphertext)
+
+    def __init__(self, machine, ciphertext : str):
+        '''
+        @param machine Configured machine at the start position, it isn't
+                       changed.  Its plugboard is ignored.
+        @param ciphertext Message, anything that isn't a letter is dropped.
+        '''
+        contacts = ciphertext.upper().encode('utf-8').translate(LETTER_CODES)
+        self._ciphertext = contacts.replace(bytes([NOT_A_LETTER]), b'')
+        length = len(self._ciphertext)
+
+        core_machine = machine.clone()
+        core_machine.set_plugboard(None)
+        state = core_machine.snapshot()
+        core = bytearray(length * NUMBER_OF_CONTACTS)
+
+        # Column 'contact' of every table is the encryption of that contact
+        # pressed at every position.
+        for contact in range(NUMBER_OF_CONTACTS):
+            core_machine.restore(state)
+            column = core_machine.encrypt_bytes(bytes([contact + 65]) *
+                                                length)
+            core[contact::NUMBER_OF_CONTACTS] = column.translate(LETTER_CODES)
+
+        self._core = bytes(core)
+
+    def decrypt_contacts(self, plugboard) -> bytes:
+        '''
+        Decrypt the ciphertext with a plugboard.
+        @param plugboard PlugboardPermutation or 26 byte wiring.
+        @return Contact numbers 0-25 of the plaintext.
+        '''
+        wiring = getattr(plugboard, 'wiring', plugboard)
+        core = self._core
+
+        return bytes(wiring[core[offset + wiring[contact]]]
+                     for offset, contact in zip(
+                         range(0, len(core), NUMBER_OF_CONTACTS),
+                         self._ciphertext))
+
+    def decrypt(self, plugboard) -> str:
+        '''
+        Decrypt the ciphertext with a plugboard, the same as
+        Machine.encrypt(ciphertext, keep_non_letters=False) with that
+        plugboard.
+        @param plugboard PlugboardPermutation or 26 byte wiring.
+        @return Plaintext.
+        '''
+        return bytes(contact + 65 for contact in
+                     self.decrypt_contacts(plugboard)).decode('utf-8')
+
+
+def climb_plugboard(core : RotorCore, scorer, plugboard = None,
+                    max_plugs : int = DEFAULT_MAX_PLUGS) -> tuple:
+    '''
+    Hill-climb the plugboard: every pair of contacts is tried plugged
+    together (or a plugged contact unplugged), keeping any move that
+    improves the score, until a full round makes no improvement.
+    @param core RotorCore of the ciphertext.
+    @param scorer Callable scoring a plaintext, higher is better (see
+                  simulation.scoring).
+    @param plugboard Starting PlugboardPermutation, default no plugs.  It
+                     isn't changed.
+    @param max_plugs Most pairs that may be plugged.
+    @return Tuple of (best PlugboardPermutation, its score).
+    '''
+    plugboard = PlugboardPermutation(plugboard.wiring if plugboard
+                                     else IDENTITY_TABLE)
+    best_score = scorer(core.decrypt(plugboard))
+    improved = True
+
+    while improved:
+        improved = False
+
+        for first in range(NUMBER_OF_CONTACTS):
+            for second in range(first, NUMBER_OF_CONTACTS):
+                # Already plugged together (or already unplugged).
+                if plugboard.wiring[first] == second:
+                    continue
+
+                token = plugboard.swap(first, second)
+                if plugboard.plug_count > max_plugs:
+                    plugboard.undo(token)
+                    continue
+
+                score = scorer(core.decrypt(plugboard))
+                if score > best_score:
+                    best_score = score
+                    improved = True
+                else:
+                    plugboard.undo(token)
+
+    return plugboard, best_score
+
+
+def climb_plugboard_ngrams(core : RotorCore, table, plugboard = None,
+                           max_plugs : int = DEFAULT_MAX_PLUGS) -> tuple:
+    '''
+    Hill-climb the plugboard as climb_plugboard() does, scoring by n-gram
+    fitness.  The plaintext is decrypted with NumPy and kept in a
+    code_scoring.TextScore, so each move only re-scores the n-grams around
+    the letters it changes.
+    @param core RotorCore of the ciphertext.
+    @param table code_scoring.NgramTable to score with.
+    @param plugboard Starting PlugboardPermutation, default no plugs.  It
+                     isn't changed.
+    @param max_plugs Most pairs that may be plugged.
+    @return Tuple of (best PlugboardPermutation, its fitness).
+    '''
+    # pylint: disable=import-outside-toplevel
+    import numpy as np
+    from simulation.code_scoring import TextScore
+
+    plugboard = PlugboardPermutation(plugboard.wiring if plugboard
+                                     else IDENTITY_TABLE)
+    cores = np.frombuffer(core.table, dtype=np.uint8).reshape(
+        -1, NUMBER_OF_CONTACTS)
+    rows = np.arange(len(core))
+    ciphertext = np.frombuffer(core.ciphertext_contacts, dtype=np.uint8)
+
+    def decrypt(wiring : bytes):
+        wiring = np.frombuffer(wiring, dtype=np.uint8)
+        return wiring[cores[rows, wiring[ciphertext]]]
+
+    score = TextScore(table, decrypt(plugboard.wiring))
+    improved = True
+
+    while improved:
+        improved = False
+
+        for first in range(NUMBER_OF_CONTACTS):
+            for second in range(first, NUMBER_OF_CONTACTS):
+                # Already plugged together (or already unplugged).
+                if plugboard.wiring[first] == second:
+                    continue
+
+                token = plugboard.swap(first, second)
+                if plugboard.plug_count > max_plugs:
+                    plugboard.undo(token)
+                    continue
+
+                best_fitness = score.fitness
+                score_token = score.replace(decrypt(plugboard.wiring))
+                if score.fitness > best_fitness:
+                    improved = True
+                else:
+                    score.undo(score_token)
+                    plugboard.undo(token)
+
+    return plugboard, score.fitness
@@ -0,0 +1,334 @@
+'''
+    EnigmaSimulator - A software implementation of the Engima Machine.
+    Copyright (C) 2015-2021 Engima Simulator Development Team
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    Opt-in cache of the rotor core permutation at every rotor position.
+    Without the plugboard, a lever stepped machine at one position of its
+    three stepping rotors is a fixed 26 letter involution, and there are only
+    26^3 positions.  All of them are built at once into one contiguous
+    456,976 byte table per wheel order, indexed [left][middle][right][letter]
+    by rotor offset (position less ring setting), so a single table serves
+    every ring setting.
+
+    Encrypting a buffer is then stepping the rotors, one table lookup per
+    letter and the plugboard.  The stepping is worked out a run at a time
+    (the middle and left rotors only move when the right rotor passes a
+    notch), and the lookups are one NumPy gather for the whole buffer.
+
+    With a directory the tables are kept as files and memory-mapped, so
+    every process using the directory shares one copy through the page
+    cache; a tmpfs directory such as /dev/shm shares them in memory.
+'''
+import collections
+import functools
+import hashlib
+import os
+import threading
+import numpy as np
+from simulation.circuit_tables import encrypt_lever_buffer, lever_step, \
+                                    LETTER_CODES, NOT_A_LETTER, \
+                                    NUMBER_OF_CONTACTS
+from simulation.encryption_cache import CacheStatistics
+
+# Size of the table of one wheel order.
+TABLE_SIZE = NUMBER_OF_CONTACTS ** 4
+
+# Default number of wheel orders kept, about 3.6MB of tables.
+DEFAULT_MAX_TABLES = 8
+
+# Buffers with fewer letters are quicker through the rotor tables, the NumPy
+# set up costs more than it saves.
+MIN_CACHED_LETTERS = 32
+
+# Entries of one rotor position, and of one left/middle position.
+_ROW_SIZE = NUMBER_OF_CONTACTS
+_BLOCK_SIZE = NUMBER_OF_CONTACTS ** 2
+
+# Offset of each right rotor offset within a block, twice over so a full
+# turn from any offset is a slice.
+_RIGHT_ROWS = np.tile(np.arange(NUMBER_OF_CONTACTS, dtype=np.int32) *
+                      _ROW_SIZE, 2)
+
+# Run length for a rotor that never reaches a notch.
+_NO_NOTCH = 1 << 62
+
+_IS_LETTER = np.frombuffer(bytes(code != NOT_A_LETTER
+                                 for code in LETTER_CODES), dtype=np.bool_)
+
+_NON_LETTERS = bytes(byte for byte in range(256)
+                     if LETTER_CODES[byte] == NOT_A_LETTER)
+
+
+class PositionCache:
+    '''
+    Thread-safe cache of position tables, keyed by the wiring of the three
+    stepping rotors and the (folded) reflector, the least recently used
+    wheel order is evicted.  Attach it to machines with
+    Machine.set_position_cache(), one cache can be shared by any number of
+    machines.
+    '''
+    __slots__ = ['_directory', '_evictions', '_hits', '_lock', '_max_tables',
+                 '_misses', '_tables']
+
+    def __init__(self, max_tables : int = DEFAULT_MAX_TABLES,
+                 directory : str = None):
+        '''
+        @param max_tables Most wheel orders whose tables are kept.
+        @param directory Directory to keep the tables in as files shared
+                         between processes, default is process memory.
+        '''
+        if max_tables < 1:
+            raise ValueError("Invalid maximum number of tables")
+
+        if directory is not None and not os.path.isdir(directory):
+            raise ValueError(f"'{directory}' is not a directory")
+
+        self._directory = directory
+        self._max_tables = max_tables
+        self._tables = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def table(self, circuit : tuple, ring_settings : tuple) -> np.ndarray:
+        '''
+        Get the position table of a circuit, building it if needed.
+        @param circuit Circuit of the three stepping rotors, see
+                       Machine.lever_circuit().
+        @param ring_settings Ring settings of the stepping rotors, left to
+                             right.
+        @return TABLE_SIZE uint8 array.
+        '''
+        forward, inverse, _, reflector, _ = circuit
+
+        # Undo the ring settings so the table suits any ring setting.
+        forward = [tables[ring_setting:] + tables[:ring_setting]
+                   for tables, ring_setting in zip(forward, ring_settings)]
+        inverse = [tables[ring_setting:] + tables[:ring_setting]
+                   for tables, ring_setting in zip(inverse, ring_settings)]
+
+        # The tables are shared between machines (see
+        # ComponentRegistry.rotor_tables()), so hashing the key is cheap.
+        key = (tuple(forward), reflector)
+
+        with self._lock:
+            table = self._tables.get(key)
+
+            if table is not None:
+                self._hits += 1
+                self._tables.move_to_end(key)
+                return table
+
+            self._misses += 1
+            table = self._load(forward, inverse, reflector)
+            self._tables[key] = table
+
+            if len(self._tables) > self._max_tables:
+                self._tables.popitem(last=False)
+                self._evictions += 1
+
+            return table
+
+    def encrypt_buffer(self, circuit : tuple, ring_settings : tuple,
+                       positions : tuple, double_step : bool, buffer,
+                       keep_non_letters : bool) -> tuple:
+        '''
+        Encrypt a buffer of bytes, the same as
+        circuit_tables.encrypt_lever_buffer() but with the position table.
+        @param circuit See table().
+        @param ring_settings See table().
+        @param positions (left, middle, right) stepping rotor positions.
+        @param double_step Whether the next key press is a double step.
+        @param buffer bytes, bytearray or memoryview of ASCII letters.
+        @param keep_non_letters If True any byte that isn't A-Z is passed
+                                through unchanged, otherwise it is dropped.
+        @return Tuple of (output bytes, positions, double step).
+        '''
+        # pylint: disable=too-many-arguments
+
+        plug_in, plug_out = _plugboard_tables(circuit[4])
+        data = bytes(buffer)
+        letters = data.translate(plug_in, _NON_LETTERS)
+
+        if len(letters) < MIN_CACHED_LETTERS:
+            output, positions, double_step = encrypt_lever_buffer(
+                circuit, positions, double_step, data, keep_non_letters)
+            return bytes(output), positions, double_step
+
+        rows, positions, double_step = _position_rows(
+            circuit[2], ring_settings, positions, double_step, len(letters))
+
+        rows += np.frombuffer(letters, dtype=np.uint8)
+        output = self.table(circuit, ring_settings)[rows].tobytes()
+        output = output.translate(plug_out)
+
+        if keep_non_letters and len(letters) != len(data):
+            merged = np.frombuffer(data, dtype=np.uint8).copy()
+            merged[_IS_LETTER[merged]] = np.frombuffer(output,
+                                                       dtype=np.uint8)
+            output = merged.tobytes()
+
+        return output, positions, double_step
+
+    def cache_info(self) -> CacheStatistics:
+        ''' Get the hit/miss statistics of the cache. '''
+        with self._lock:
+            return CacheStatistics(self._hits, self._misses,
+                                   self._evictions, len(self._tables),
+                                   self._max_tables)
+
+    def clear(self) -> None:
+        ''' Drop every table and reset the statistics, files are kept. '''
+        with self._lock:
+            self._tables.clear()
+            self._hits = 0
+            self._misses = 0
+            self._evictions = 0
+
+    def _load(self, forward : list, inverse : list,
+              reflector : bytes) -> np.ndarray:
+        if self._directory is None:
+            return build_position_table(forward, inverse, reflector)
+
+        digest = hashlib.blake2b(b''.join(table for tables in forward
+                                          for table in tables) + reflector,
+                                 digest_size=16)
+        path = os.path.join(self._directory,
+                            digest.hexdigest() + '.positions')
+
+        if not os.path.exists(path) or os.path.getsize(path) != TABLE_SIZE:
+            # Written under a unique name and renamed, so other processes
+            # never map a partly written table.
+            temporary = f'{path}.{os.getpid()}.{threading.get_ident()}'
+            build_position_table(forward, inverse, reflector).tofile(
+                temporary)
+            os.replace(temporary, path)
+
+        return np.memmap(path, dtype=np.uint8, mode='r', shape=(TABLE_SIZE,))
+
+
+def build_position_table(forward, inverse, reflector : bytes) -> np.ndarray:
+    '''
+    Build the position table of three stepping rotors.
+    @param forward Forward tables of the rotors at ring setting 'A', left
+                   to right, see circuit_tables.build_rotor_tables().
+    @param inverse Inverse tables of the rotors, as forward.
+    @param reflector Reflector table, with any fixed rotors folded in.
+    @return TABLE_SIZE uint8 array, entry [left][middle][right][letter].
+    '''
+    forward_0, forward_1, forward_2 = (
+        np.frombuffer(b''.join(tables), dtype=np.uint8).reshape(
+            NUMBER_OF_CONTACTS, NUMBER_OF_CONTACTS) for tables in forward)
+    inverse_0, inverse_1, inverse_2 = (
+        np.frombuffer(b''.join(tables), dtype=np.uint8).reshape(
+            NUMBER_OF_CONTACTS, NUMBER_OF_CONTACTS) for tables in inverse)
+    reflector = np.frombuffer(reflector, dtype=np.uint8)
+
+    offsets = np.arange(NUMBER_OF_CONTACTS)
+    left = offsets[:, None, None, None]
+    middle = offsets[None, :, None, None]
+    right = offsets[None, None, :, None]
+    letter = offsets[None, None, None, :]
+
+    # Every position and letter at once, in the order of press_key().
+    letter = forward_2[right, letter]
+    letter = forward_1[middle, letter]
+    letter = forward_0[left, letter]
+    letter = reflector[letter]
+    letter = inverse_0[left, letter]
+    letter = inverse_1[middle, letter]
+    letter = inverse_2[right, letter]
+
+    return np.ascontiguousarray(letter, dtype=np.uint8).reshape(TABLE_SIZE)
+
+
+def _position_rows(notches : tuple, ring_settings : tuple, positions : tuple,
+                   double_step : bool, count : int) -> tuple:
+    '''
+    Step the rotors for a number of key presses.
+    @return Tuple of (table offset of each key press as an int32 array,
+            positions, double step).
+    '''
+    # pylint: disable=too-many-locals
+
+    _, _, notches_2 = notches
+    ring_0, ring_1, ring_2 = ring_settings
+    distances = _notch_distances(notches_2)
+
+    # The middle and left rotors only move on the key press after the right
+    # rotor leaves a notch, or on a double step, so the key presses between
+    # are a run of one block of the table.
+    blocks = []
+    run_lengths = []
+    done = 0
+    right_start = (positions[2] + 1 - ring_2) % NUMBER_OF_CONTACTS
+
+    while done < count:
+        positions, double_step = lever_step(notches, positions, double_step)
+        position_0, position_1, position_2 = positions
+
+        run_length = 1 if double_step else 1 + distances[position_2]
+        blocks.append(position_0 * 26 + position_1)
+        run_lengths.append(run_length)
+
+        done += run_length
+        position_2 = (position_2 + run_length - 1) % 26
+        positions = (position_0, position_1, position_2)
+
+    # Only the right rotor moves during a run, so the last can be cut short.
+    run_lengths[-1] -= done - count
+    position_2 = (position_2 - (done - count)) % 26
+
+    blocks = np.array(blocks, dtype=np.int32)
+    blocks = ((blocks // 26 - ring_0) % 26 * 26 +
+              (blocks % 26 - ring_1) % 26) * _BLOCK_SIZE
+
+    rows = np.repeat(blocks, run_lengths)
+    right_rows = _RIGHT_ROWS[right_start:right_start + NUMBER_OF_CONTACTS]
+
+    if count <= NUMBER_OF_CONTACTS:
+        rows += right_rows[:count]
+    else:
+        rows += np.tile(right_rows, count // NUMBER_OF_CONTACTS + 1)[:count]
+
+    return rows, (positions[0], positions[1], position_2), double_step
+
+
+@functools.lru_cache(maxsize=None)
+def _notch_distances(notches : int) -> tuple:
+    ''' Key presses from each position until a notch is reached. '''
+    distances = []
+
+    for position in range(NUMBER_OF_CONTACTS):
+        distance = _NO_NOTCH
+        for steps in range(NUMBER_OF_CONTACTS):
+            if notches >> (position + steps) % NUMBER_OF_CONTACTS & 1:
+                distance = steps
+                break
+        distances.append(distance)
+
+    return tuple(distances)
+
+
+@functools.lru_cache(maxsize=64)
+def _plugboard_tables(plugboard : bytes) -> tuple:
+    '''
+    Translation tables from ASCII letters to plugged letter codes, and from
+    letter codes back through the plugboard to ASCII letters.
+    '''
+    plug_in = bytes(NOT_A_LETTER if code == NOT_A_LETTER else plugboard[code]
+                    for code in LETTER_CODES)
+    plug_out = bytes(plugboard[code] + 65 if code < NUMBER_OF_CONTACTS
+                     else code for code in range(256))
+    return plug_in, plug_out
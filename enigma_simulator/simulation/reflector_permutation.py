@@ -0,0 +1,57 @@
+'''
+    EnigmaSimulator - A software implementation of the Engima Machine.
+    Copyright (C) 2015-2021 Engima Simulator Development Team
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+'''
+from simulation.circuit_tables import CONTACTS
+from simulation.component_registry import REGISTRY
+from simulation.rotor_contact import RotorContact
+
+class ReflectorPermutation:
+    '''
+    Reflector whose wiring is held as a 26 byte lookup table shared with
+    every other reflector with the same wiring.  It has the same interface
+    as Reflector.
+    '''
+    __slots__ = ['_name', '_table', '_wiring']
+
+    @property
+    def name(self) -> str:
+        ''' Property getter : Name of the reflector. '''
+        return self._name
+
+    @property
+    def wiring(self) -> str:
+        ''' Property getter : How the reflector is wired. '''
+        return self._wiring
+
+    @property
+    def table(self) -> bytes:
+        ''' Property getter : Output contact indexed by input contact. '''
+        return self._table
+
+    def __init__(self, name : str, wiring : str):
+        '''
+        @param name Human readable reflector name, e.g. 'UKW-B'.
+        @param wiring Reflector wiring, e.g. 'YRUHQSLDPXNGOKMIEBFZCWVJAT'.
+        '''
+        self._name = name
+        self._wiring = wiring
+        self._table = REGISTRY.reflector_table(wiring)
+
+    def encrypt(self, contact : RotorContact) -> RotorContact:
+        '''
+        Pass a contact through the reflector.
+        @param contact Input contact.
+        @return Output contact.
+        '''
+        return CONTACTS[self._table[contact.value]]
@@ -12,11 +12,21 @@
     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
     GNU General Public License for more details.
 '''
+from simulation.circuit_tables import CONTACTS
+from simulation.component_registry import REGISTRY
+from simulation.log_policy import LOGGING_OFF
 from simulation.rotor_contact import RotorContact
 
 class Rotor:
-    ''' Class representing an Enigma rotor wheel / drum / Walzen (German). '''
-    __slots__ = ['_logger', '_notch_locations', '_name',  '_position',
+    '''
+    Class representing an Enigma rotor wheel / drum / Walzen (German).  The
+    wiring is held as position keyed byte tables that are shared with every
+    other rotor with the same wiring and ring setting, so a rotor only holds
+    references and its position, and contacts are only converted to and from
+    RotorContact at the API boundary.
+    '''
+    __slots__ = ['_forward_tables', '_inverse_tables', '_log_policy',
+                 '_notch_locations', '_notch_mask', '_name', '_position',
                  '_ring_setting', '_wiring']
 
     MAX_CONTACT_NO = 25
@@ -38,6 +48,24 @@ class Rotor:
             notch or notches. '''
         return self._notch_locations
 
+    @property
+    def notch_mask(self) -> int:
+        ''' Property getter : Notch bitmask, see stepping.notch_mask(). '''
+        return self._notch_mask
+
+    @property
+    def forward_tables(self) -> tuple:
+        '''
+        Property getter : Forward lookup tables for the ring setting, see
+        circuit_tables.build_rotor_tables().
+        '''
+        return self._forward_tables
+
+    @property
+    def inverse_tables(self) -> tuple:
+        ''' Property getter : Inverse lookup tables for the ring setting. '''
+        return self._inverse_tables
+
     @property
     def position(self) -> int:
         ''' Property getter : Position of the rotor. '''
@@ -63,18 +91,21 @@ class Rotor:
     def ring_setting(self, value) -> None:
         ''' Property setter 'RingSetting' : Ring setting of the rotor. '''
 
-        if value < 1 or value > self.MAX_CONTACT_NO:
+        if value < 0 or value > self.MAX_CONTACT_NO:
             raise ValueError("Invalid ring positions")
 
         self._ring_setting = value
+        self._forward_tables, self._inverse_tables = \
+            REGISTRY.rotor_tables(self._wiring, value)
 
     def __init__(self, name : str, wiring : str, notch_locations : list,
-                 logger):
+                 log_policy = None):
         '''
         Rotor constructor method, a rotor is wired from right to left.
         # @param name Human readable rotor name.
         # @param wiring Wiring setting from right to left.
         # @param notch_locations Location of the turnover notches.
+        # @param log_policy Logging policy for debug output, default is off.
         '''
 
         # Name of the rotor (e.g. Rotor I).
@@ -82,14 +113,15 @@ class Rotor:
 
         # Location of the turnover notch/notches.
         self._notch_locations = notch_locations
+        self._notch_mask = REGISTRY.notch_mask(notch_locations)
 
         # Current position of the rotor.
         self._position = 0
 
-        # Ring setting (Ringstellung) for the rotor
+        # Ring setting (Ringstellung) for the rotor, 0 is 'A' (01).
         self._ring_setting = 0
 
-        self._logger = logger
+        self._log_policy = log_policy or LOGGING_OFF
 
         if not isinstance(wiring, (str)):
             raise ValueError("Rotor wiring is not a string")
@@ -99,10 +131,12 @@ class Rotor:
 
         # define how the rotor is internally wired.
         self._wiring = wiring
+        self._forward_tables, self._inverse_tables = \
+            REGISTRY.rotor_tables(wiring, self._ring_setting)
 
     def step(self):
         ''' Step the rotor. '''
-        self._position = (self._position + 1) % self.MAX_CONTACT_NO
+        self._position = (self._position + 1) % self.WIRING_LENGTH
 
     def encrypt(self, contact : RotorContact, forward = True):
         '''
@@ -118,7 +152,13 @@ class Rotor:
         E.g. Enigma Rotor 1 will return 'K' for a letter 'B'
 
         STEP 2: Take ring settings into account:
-        CURRENTLY NOT IMPLEMENTED
+        The ring setting turns the wiring core against the lettered ring in
+        the opposite direction to the rotor position, so the entry and exit
+        offsets are the rotor position less the ring setting.
+        Example
+        'A' is pressed with the rotor in position 'A' and ring setting 'B'
+        (1), it will return the output from 'Z', e.g. Enigma Rotor 1 will
+        return 'J' for 'Z', which the exit offset then moves on 1 to 'K'.
 
         STEP 3: Take rotor offset into account
         When a rotor has stepped, the offset must be taken into account when it
@@ -134,55 +174,18 @@ class Rotor:
         forward 1 = 'A'), e.g. Enigma Rotor 1 will return 'E' for a letter 'A',
         but the rotor is in position 'B' (forward 1) so 'J' is returned.
 
+        The lookup tables already have all three steps applied for each
+        position, so encrypting is a single lookup unless debug logging is
+        enabled, in which case every step is worked through and logged.
+
         @param contact Reference contact to get circuit with.
         @return A contact number.
         '''
+        if self._log_policy.enabled:
+            return self._encrypt_traced(contact, forward)
 
-        self._logger.log_debug(
-            f"Encrypting '{contact} on rotor {self._name}, foward = {forward}")
-        self._logger.log_debug(f"=> Rotor position = {self._position}")
-
-        # STEP 1: Correct the input contact entrypoint for position
-        contact_position = self._determine_next_position(contact.value +
-                                                         self._position)
-        self._logger.log_debug("=> Compensating rotor entry. Originally " + \
-            f"'{contact.name}', now '{RotorContact(contact_position).name}'")
-
-        if forward:
-            output_contact = RotorContact[self._wiring[contact_position]]
-            self._logger.log_debug(
-                f"=> Foward Rotor position = '{output_contact.name}'")
-
-        else:
-            letter = RotorContact(contact_position).name
-            output_contact = RotorContact(self._wiring.index(letter))
-            self._logger.log_debug(
-                f"=> Backwards Rotor position = '{output_contact.name}'")
-
-        # STEP 2: Take ring settings into account
-        # Ring settings are not implemented - untested code
-        # if self.__ringSetting > 1:
-        #     #outputPin = outputPin + (self.__ringSetting -1)
-        #
-        #     if (outputPin - (self.__ringSetting -1)) <= 0:
-        #         outputPin = NumberOfRotorPins - ((self.__ringSetting -1) \
-        #          - outputPin)
-        #     else:
-        #         outputPin -= (self.__ringSetting -1)
-        #
-        #     #if outputPin > NumberOfRotorPins:
-        #     #    outputPin = outputPin - NumberOfRotorPins;
-        # final_contact = output_contact
-
-        # STEP 3: Take rotor offset into account
-        self._logger.log_debug("=> Adjusting outgoing rotor, it was " + \
-            f"'{output_contact.name}'")
-
-        output_contact = self._determine_next_position(output_contact.value -
-                                                       self._position)
-        self._logger.log_debug(
-            f"=> Outgoing Rotor position = '{RotorContact(output_contact).name}'")
-        return RotorContact(output_contact)
+        tables = self._forward_tables if forward else self._inverse_tables
+        return CONTACTS[tables[self._position][contact.value]]
 
     def will_step_next(self) -> bool:
         '''
@@ -190,22 +193,45 @@ class Rotor:
         @return True if when this steps it will cause the next to to, otherwise
                 False is returned.
         '''
-        curr_position = RotorContact(self._position).name
-        return curr_position in self._notch_locations
+        return bool(self._notch_mask >> self._position & 1)
 
-    def _determine_next_position(self, contact : int) -> int:
+    def _encrypt_traced(self, contact : RotorContact, forward : bool):
+        ''' Work through encrypt() a step at a time, logging each step. '''
+        log = self._log_policy
 
-        if contact in [0, 25]:
-            new_pos = contact
+        log.debug("Encrypting '%s' on rotor %s, forward = %s",
+                  contact.name, self._name, forward)
+        log.debug("=> Rotor position = %d, ring setting = %d",
+                  self._position, self._ring_setting)
 
-        elif contact >= 1:
-            if contact > self.MAX_CONTACT_NO:
-                new_pos = (contact % self.MAX_CONTACT_NO) -1
+        # STEP 1 and 2: Correct the input contact entrypoint for position
+        # and ring setting.
+        offset = self._position - self._ring_setting
+        contact_position = self._determine_next_position(contact.value +
+                                                         offset)
+        log.debug("=> Compensating rotor entry. Originally '%s', now '%s'",
+                  contact.name, CONTACTS[contact_position].name)
 
-            else:
-                new_pos = contact
+        if forward:
+            output_contact = RotorContact[self._wiring[contact_position]]
 
         else:
-            new_pos = (self.MAX_CONTACT_NO + 1) + contact
+            letter = CONTACTS[contact_position].name
+            output_contact = CONTACTS[self._wiring.index(letter)]
 
-        return new_pos
+        log.debug("=> %s Rotor position = '%s'",
+                  'Forward' if forward else 'Backwards', output_contact.name)
+
+        # STEP 3: Take rotor offset (position and ring setting) into account
+        log.debug("=> Adjusting outgoing rotor, it was '%s'",
+                  output_contact.name)
+
+        output_contact = CONTACTS[self._determine_next_position(
+            output_contact.value - offset)]
+
+        log.debug("=> Outgoing Rotor position = '%s'", output_contact.name)
+
+        return output_contact
+
+    def _determine_next_position(self, contact : int) -> int:
+        return contact % self.WIRING_LENGTH
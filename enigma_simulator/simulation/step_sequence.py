@@ -0,0 +1,129 @@
+'''
+    EnigmaSimulator - A software implementation of the Engima Machine.
+    Copyright (C) 2015-2021 Engima Simulator Development Team
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+'''
+from array import array
+import functools
+from simulation.circuit_tables import lever_step
+
+# Number of step sequences kept by get_step_sequence().
+STEP_SEQUENCE_CACHE_SIZE = 64
+
+
+class StepSequence:
+    '''
+    Every state the three stepping rotors of a lever stepped machine pass
+    through from a start state.
+    Stepping is deterministic, so after at most 26^3 key presses the states
+    start repeating.  Entry N of the sequence is the state after N key
+    presses, anything past the end of the table wraps back into the cycle.
+    '''
+    __slots__ = ['_cycle_length', '_cycle_start', '_double_steps',
+                 '_positions']
+
+    NO_OF_ROTORS = 3
+
+    @property
+    def cycle_start(self) -> int:
+        ''' Property getter : Index of the first state that repeats. '''
+        return self._cycle_start
+
+    @property
+    def cycle_length(self) -> int:
+        ''' Property getter : Number of key presses before states repeat. '''
+        return self._cycle_length
+
+    @property
+    def positions(self) -> array:
+        '''
+        Property getter : Rotor positions, NO_OF_ROTORS entries per state.
+        '''
+        return self._positions
+
+    @property
+    def double_steps(self) -> array:
+        ''' Property getter : Double-step flag for each state. '''
+        return self._double_steps
+
+    def __init__(self, notches : tuple, start_positions : tuple,
+                 double_step : bool = False):
+        '''
+        Build the sequence by stepping the rotors until a state repeats.
+        @param notches Notch bitmask of each rotor, left to right.
+        @param start_positions Rotor positions, left to right.
+        @param double_step Double-step flag of the start state.
+        '''
+        positions = tuple(start_positions)
+
+        self._positions = array('B')
+        self._double_steps = array('B')
+        seen = {}
+
+        while True:
+            state = (positions, double_step)
+
+            if state in seen:
+                break
+
+            seen[state] = len(self._double_steps)
+            self._positions.extend(positions)
+            self._double_steps.append(double_step)
+
+            positions, double_step = lever_step(notches, positions,
+                                                double_step)
+
+        self._cycle_start = seen[state]
+        self._cycle_length = len(self._double_steps) - self._cycle_start
+
+    def __len__(self) -> int:
+        return len(self._double_steps)
+
+    def index(self, keypresses : int) -> int:
+        '''
+        Get the table index of the state after a number of key presses.
+        @param keypresses Number of key presses from the start state.
+        @return Index into the sequence.
+        '''
+        if keypresses < 0:
+            raise ValueError("Invalid number of key presses")
+
+        if keypresses < len(self._double_steps):
+            return keypresses
+
+        return self._cycle_start + \
+            (keypresses - self._cycle_start) % self._cycle_length
+
+    def state(self, keypresses : int) -> tuple:
+        '''
+        Get the rotor state after a number of key presses.
+        @param keypresses Number of key presses from the start state.
+        @return Tuple of (rotor positions, double-step flag).
+        '''
+        index = self.index(keypresses)
+        offset = index * self.NO_OF_ROTORS
+        positions = tuple(self._positions[offset:offset + self.NO_OF_ROTORS])
+        return positions, bool(self._double_steps[index])
+
+
+@functools.lru_cache(maxsize=STEP_SEQUENCE_CACHE_SIZE)
+def get_step_sequence(notches : tuple, start_positions : tuple,
+                      double_step : bool = False) -> StepSequence:
+    '''
+    Get the step sequence for a rotor order and start state, sequences are
+    cached so machines sharing a rotor order and start state share one.
+    @param notches Tuple of notch bitmasks, left to right.
+    @param start_positions Tuple of rotor positions, left to right.
+    @param double_step Double-step flag of the start state.
+    @return StepSequence instance.
+    '''
+    return StepSequence(notches, start_positions, double_step)
@@ -0,0 +1,59 @@
+'''
+    EnigmaSimulator - A software implementation of the Engima Machine.
+    Copyright (C) 2015-2021 Engima Simulator Development Team
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+'''
+import collections
+import enum
+
+class SteppingMode(enum.Enum):
+    ''' Mechanism that steps the rotors of a machine. '''
+
+    # Ratchet and pawl stepping of three rotors, including the double-step
+    # of the middle rotor (Enigma I, M3, M4).
+    LEVER = 'lever'
+
+    # Cog wheel (Zaehlwerk) stepping, the rotors step like an odometer with
+    # no double-step and the reflector can be driven by the leftmost rotor.
+    COG = 'cog'
+
+
+SteppingDefinition = collections.namedtuple(
+    'SteppingDefinition',
+    ['mode', 'stepping_rotors', 'reflector_settable', 'reflector_rotates'])
+SteppingDefinition.__doc__ = '''
+    How a model steps.  Only the rightmost 'stepping_rotors' rotors step, any
+    rotors to their left (e.g. the M4 Greek wheel) stay where they are set.
+    A settable reflector can be set to a position, a rotating reflector is
+    also stepped when the leftmost stepping rotor turns over.
+'''
+
+# Stepping of models that don't define their own, e.g. Enigma I and M3.
+LEVER_STEPPING = SteppingDefinition(SteppingMode.LEVER, 3, False, False)
+
+# Number of stepping rotors the lever mechanism has pawls for.
+LEVER_STEPPING_ROTORS = 3
+
+
+def notch_mask(notches) -> int:
+    '''
+    Convert notch letters into a bitmask, bit N is set if the rotor causes
+    the next rotor to step when it steps from position N.
+    @param notches Letters of the turnover notch/notches.
+    @return Notch bitmask.
+    '''
+    mask = 0
+
+    for notch in notches:
+        mask |= 1 << (ord(notch) - ord('A'))
+
+    return mask
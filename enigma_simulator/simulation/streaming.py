@@ -0,0 +1,134 @@
+'''
+    EnigmaSimulator - A software implementation of the Engima Machine.
+    Copyright (C) 2015-2021 Engima Simulator Development Team
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+'''
+import contextlib
+import mmap
+import os
+
+# Default number of bytes read and encrypted at a time.
+DEFAULT_CHUNK_SIZE = 64 * 1024
+
+
+def encrypt_chunks(machine, chunks, keep_non_letters : bool = True):
+    '''
+    Encrypt an iterable of chunks, yielding each encrypted chunk as soon as
+    it is ready.  The rotor state carries over from one chunk to the next,
+    so the joined output is identical to encrypting the joined input.
+    Chunks are converted to upper case, as Machine.encrypt() does.
+    @param machine Configured Machine instance.
+    @param chunks Iterable of str or bytes-like chunks.
+    @param keep_non_letters If True non-letters are passed through,
+                            otherwise they are dropped.
+    '''
+    for chunk in chunks:
+        if isinstance(chunk, str):
+            yield machine.encrypt(chunk, keep_non_letters)
+
+        else:
+            yield machine.encrypt_bytes(bytes(chunk).upper(),
+                                        keep_non_letters)
+
+
+def encrypt_file(machine, source, destination,
+                 chunk_size : int = DEFAULT_CHUNK_SIZE,
+                 keep_non_letters : bool = True,
+                 use_mmap : bool = False) -> int:
+    '''
+    Encrypt a file into another file a chunk at a time, memory use depends
+    on the chunk size only and not on the size of the file.  The file is
+    converted to upper case, see encrypt_chunks().
+    @param machine Configured Machine instance.
+    @param source File name or binary file object to read.
+    @param destination File name or binary file object to write.
+    @param chunk_size Number of bytes to encrypt at a time.
+    @param keep_non_letters If True non-letters are passed through,
+                            otherwise they are dropped.
+    @param use_mmap If True the source file is memory-mapped and paged in by
+                    the operating system rather than read, which suits
+                    very large files.
+    @return Number of bytes written.
+    '''
+    # pylint: disable=too-many-arguments
+
+    if chunk_size < 1:
+        raise ValueError("Invalid chunk size")
+
+    with _open(source, 'rb') as source_file, \
+         _open(destination, 'wb') as destination_file:
+
+        if use_mmap:
+            chunks = _mapped_chunks(source_file, chunk_size)
+
+        else:
+            chunks = iter(lambda: source_file.read(chunk_size), b'')
+
+        written = 0
+        for encrypted in encrypt_chunks(machine, chunks, keep_non_letters):
+            destination_file.write(encrypted)
+            written += len(encrypted)
+
+    return written
+
+
+async def encrypt_stream(machine, reader, writer,
+                         chunk_size : int = DEFAULT_CHUNK_SIZE,
+                         keep_non_letters : bool = True) -> int:
+    '''
+    Encrypt an asyncio stream into another, a chunk at a time.  The writer is
+    drained after every chunk so a slow consumer applies back pressure
+    rather than output building up in memory.  The stream is converted to
+    upper case, see encrypt_chunks().
+    @param machine Configured Machine instance.
+    @param reader asyncio.StreamReader to read from until EOF.
+    @param writer asyncio.StreamWriter to write to, it is not closed.
+    @param chunk_size Maximum number of bytes to encrypt at a time.
+    @param keep_non_letters If True non-letters are passed through,
+                            otherwise they are dropped.
+    @return Number of bytes written.
+    '''
+    if chunk_size < 1:
+        raise ValueError("Invalid chunk size")
+
+    written = 0
+
+    while True:
+        chunk = await reader.read(chunk_size)
+        if not chunk:
+            break
+
+        encrypted = machine.encrypt_bytes(chunk.upper(), keep_non_letters)
+        writer.write(encrypted)
+        written += len(encrypted)
+        await writer.drain()
+
+    return written
+
+
+def _mapped_chunks(source_file, chunk_size : int):
+    # An empty file can't be memory-mapped.
+    if os.fstat(source_file.fileno()).st_size == 0:
+        return
+
+    with mmap.mmap(source_file.fileno(), 0, access=mmap.ACCESS_READ) \
+            as mapped:
+        for offset in range(0, len(mapped), chunk_size):
+            yield mapped[offset:offset + chunk_size]
+
+
+def _open(file, mode : str):
+    ''' Open a file by name, or pass an already open file object through. '''
+    if isinstance(file, (str, bytes, os.PathLike)):
+        return open(file, mode)  # pylint: disable=unspecified-encoding
+
+    return contextlib.nullcontext(file)
@@ -0,0 +1,546 @@
+'''
+    EnigmaSimulator - A software implementation of the Engima Machine.
+    Copyright (C) 2015-2021 Engima Simulator Development Team
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    Compact binary format (version 1) for moving machine settings and
+    messages between processes and hosts.
+
+    Packed settings are a 4 byte header:
+        format version, model number, number of rotors, number of plugged
+        pairs (0xFF if the machine has no plugboard)
+    followed by 5 bit fields, least significant bits first:
+        rotor numbers (left to right), reflector number, reflector
+        position, ring settings, plugged pairs, rotor positions
+    Rotors and reflectors are numbered by their order in the model, so an
+    Enigma 1 with ten plugs packs into 24 bytes.  The rotor positions are
+    last, everything before them is packed once for a day's messages.
+
+    Messages are held as letter codes 0-25, one per byte, anything that
+    isn't a letter is dropped.  A record is packed settings, the message
+    length (32 bit) and the letter codes.
+
+    A container is a 24 byte header (magic, format version, number of
+    records, index offset), the records and then an index of 64 bit record
+    offsets.  Containers are read memory-mapped, the letter codes of a
+    record are a memoryview of the file and are never copied until they
+    are encrypted.  All integers are little endian.
+'''
+import collections
+import functools
+import mmap
+import os
+import struct
+import sys
+from array import array
+from simulation.circuit_tables import IDENTITY_TABLE, LETTER_CODES, \
+                                    NOT_A_LETTER, NUMBER_OF_CONTACTS
+from simulation.component_registry import REGISTRY
+from simulation.enigma_machine import Machine
+
+FORMAT_VERSION = 1
+
+# Model numbers are part of the format, models are only ever added.
+MODEL_IDS = {'Enigma1': 1, 'M3': 2, 'M4': 3}
+
+# Number of plugged pairs of a machine without a plugboard.
+NO_PLUGBOARD = 0xFF
+
+FIELD_BITS = 5
+FIELD_MASK = (1 << FIELD_BITS) - 1
+
+SETTINGS_HEADER = struct.Struct('<BBBB')
+MESSAGE_LENGTH = struct.Struct('<I')
+CONTAINER_HEADER = struct.Struct('<4sB3xQQ')
+CONTAINER_MAGIC = b'ENGW'
+
+# Default number of distinct settings a machine is kept configured for.
+DEFAULT_MACHINE_CACHE_SIZE = 256
+
+# ASCII letter of each letter code, for Machine.encrypt_bytes().
+CODE_LETTERS = bytes(code + 65 if code < NUMBER_OF_CONTACTS else NOT_A_LETTER
+                     for code in range(256))
+
+NON_LETTERS = bytes(byte for byte in range(256)
+                    if LETTER_CODES[byte] == NOT_A_LETTER)
+
+WireSettings = collections.namedtuple(
+    'WireSettings', ['model', 'rotors', 'reflector', 'reflector_position',
+                     'ring_settings', 'positions', 'plugboard'])
+WireSettings.__doc__ = '''
+    Settings of a machine as held in the wire format: rotor names, ring
+    settings and positions left to right, and the plugboard wiring as a 26
+    byte permutation (None if there is no plugboard).
+'''
+
+Record = collections.namedtuple('Record', ['settings', 'codes'])
+Record.__doc__ = '''
+    A message and the WireSettings it is encrypted with, the message is a
+    bytes-like object of letter codes 0-25.
+'''
+
+
+def settings_of(machine) -> WireSettings:
+    '''
+    Get the settings of a configured machine, the double step flag isn't
+    part of the settings so the machine should be at a start position.
+    @param machine Configured Machine instance.
+    @return WireSettings instance.
+    '''
+    if machine.configuration is None:
+        raise ValueError("Machine is not configured")
+
+    model, rotors, reflector = machine.configuration
+    state = machine.snapshot()
+
+    return WireSettings(model, tuple(rotors), reflector,
+                        state.reflector_position, state.ring_settings,
+                        state.positions, state.plugboard)
+
+
+def create_machine(settings : WireSettings) -> Machine:
+    '''
+    Create a machine from its settings.
+    @param settings WireSettings instance.
+    @return Configured Machine instance.
+    '''
+    machine = Machine()
+    if not machine.configure(settings.model, list(settings.rotors),
+                             settings.reflector):
+        raise ValueError(machine.last_error)
+
+    machine.set_ring_settings(settings.ring_settings)
+    machine.set_plugboard(settings.plugboard)
+
+    if len(settings.positions) != len(settings.rotors):
+        raise ValueError("Invalid number of rotor positions")
+
+    for rotor_no, position in enumerate(settings.positions):
+        machine.set_rotor_position(rotor_no, position)
+
+    # Only models with a settable reflector accept a position.
+    if settings.reflector_position:
+        machine.set_reflector_position(settings.reflector_position)
+
+    return machine
+
+
+def pack_settings(settings : WireSettings) -> bytes:
+    '''
+    Pack the settings of a machine.
+    @param settings WireSettings instance.
+    @return Packed settings.
+    '''
+    plugboard = settings.plugboard
+    header, value, count = _pack_day_settings(settings._replace(
+        rotors=tuple(settings.rotors),
+        ring_settings=tuple(settings.ring_settings), positions=None,
+        plugboard=None if plugboard is None else bytes(plugboard)))
+
+    if len(settings.positions) != len(settings.rotors):
+        raise ValueError("Invalid number of rotor positions")
+
+    for position in settings.positions:
+        if not 0 <= position < NUMBER_OF_CONTACTS:
+            raise ValueError("Rotor positions are invalid")
+
+        value |= position << count * FIELD_BITS
+        count += 1
+
+    return header + value.to_bytes(_fields_size(count), 'little')
+
+
+def unpack_settings(buffer, offset : int = 0) -> tuple:
+    '''
+    Unpack the settings of a machine.
+    @param buffer bytes-like object holding packed settings.
+    @param offset Offset of the packed settings in the buffer.
+    @return Tuple of (WireSettings, offset after the packed settings).
+    '''
+    end = offset + settings_size(buffer, offset)
+    if end > len(buffer):
+        raise ValueError("Packed settings are truncated")
+
+    return _unpack_settings(bytes(buffer[offset:end])), end
+
+
+def settings_size(buffer, offset : int = 0) -> int:
+    '''
+    Get the size of packed settings from their header.
+    @param buffer bytes-like object holding packed settings.
+    @param offset Offset of the packed settings in the buffer.
+    @return Size in bytes.
+    '''
+    if len(buffer) - offset < SETTINGS_HEADER.size:
+        raise ValueError("Packed settings are truncated")
+
+    version, _, no_of_rotors, plugs = SETTINGS_HEADER.unpack_from(buffer,
+                                                                  offset)
+    if version != FORMAT_VERSION:
+        raise ValueError(f"Wire format version {version} is not supported")
+
+    return SETTINGS_HEADER.size + _fields_size(_field_count(no_of_rotors,
+                                                            plugs))
+
+
+def encode_letters(text) -> bytes:
+    '''
+    Convert a message to letter codes, anything that isn't a letter is
+    dropped.
+    @param text str or bytes-like message.
+    @return Letter codes 0-25.
+    '''
+    if isinstance(text, str):
+        text = text.encode('utf-8')
+
+    return bytes(text).upper().translate(LETTER_CODES, NON_LETTERS)
+
+
+def decode_letters(codes) -> str:
+    '''
+    Convert letter codes to a message.
+    @param codes bytes-like letter codes 0-25.
+    @return Message letters.
+    '''
+    return bytes(codes).translate(CODE_LETTERS).decode('utf-8')
+
+
+def encrypt_codes(machine, codes) -> bytes:
+    '''
+    Encrypt/decrypt letter codes, the machine steps as it would for the
+    letters.
+    @param machine Configured Machine instance.
+    @param codes bytes-like letter codes 0-25.
+    @return Encrypted letter codes.
+    '''
+    letters = machine.encrypt_bytes(bytes(codes).translate(CODE_LETTERS),
+                                    False)
+    return bytes(letters).translate(LETTER_CODES)
+
+
+def encrypt_records(records,
+                    cache_size : int = DEFAULT_MACHINE_CACHE_SIZE):
+    '''
+    Encrypt/decrypt records, yielding each encrypted record in turn.  One
+    machine is configured for each distinct settings (ignoring positions)
+    and reused, so a batch of a day's messages only configures it once.
+    @param records Iterable of Record, e.g. a Container.
+    @param cache_size Most distinct settings a machine is kept for.
+    '''
+    compile_settings = functools.lru_cache(cache_size)(_compile_settings)
+
+    for settings, codes in records:
+        machine = compile_settings(pack_settings(settings._replace(
+            positions=(0,) * len(settings.rotors))))
+
+        for rotor_no, position in enumerate(settings.positions):
+            machine.set_rotor_position(rotor_no, position)
+
+        yield Record(settings, encrypt_codes(machine, codes))
+
+
+def encrypt_container(source : str, destination : str,
+                      cache_size : int = DEFAULT_MACHINE_CACHE_SIZE) -> int:
+    '''
+    Encrypt/decrypt every record of a container into a new container.
+    @param source Container file to read.
+    @param destination Container file to write.
+    @param cache_size See encrypt_records().
+    @return Number of records written.
+    '''
+    with Container(source) as records, \
+         ContainerWriter(destination) as writer:
+        for record in encrypt_records(records, cache_size):
+            writer.write(record.settings, record.codes)
+
+        return len(writer)
+
+
+class ContainerWriter:
+    '''
+    Write records to a container file, the index is written when the
+    writer is closed.
+    '''
+    __slots__ = ['_file', '_offsets', '_position']
+
+    def __len__(self) -> int:
+        return len(self._offsets)
+
+    def __init__(self, path : str):
+        '''
+        @param path Container file to create.
+        '''
+        self._file = open(path, 'wb')  # pylint: disable=consider-using-with
+        self._file.write(bytes(CONTAINER_HEADER.size))
+        self._offsets = array('Q')
+        self._position = CONTAINER_HEADER.size
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exception) -> None:
+        self.close()
+
+    def write(self, settings, codes) -> None:
+        '''
+        Append a record.
+        @param settings WireSettings, or settings already packed.
+        @param codes bytes-like letter codes 0-25, e.g. a memoryview.  It
+                     is written as is without being copied.
+        '''
+        if isinstance(settings, WireSettings):
+            settings = pack_settings(settings)
+
+        codes = memoryview(codes).cast('B')
+        self._offsets.append(self._position)
+
+        self._file.write(settings)
+        self._file.write(MESSAGE_LENGTH.pack(len(codes)))
+        self._file.write(codes)
+        self._position += len(settings) + MESSAGE_LENGTH.size + len(codes)
+
+    def close(self) -> None:
+        ''' Write the index and header, then close the file. '''
+        if self._file.closed:
+            return
+
+        offsets = self._offsets
+        if sys.byteorder != 'little':
+            offsets = array('Q', offsets)
+            offsets.byteswap()
+
+        self._file.write(offsets.tobytes())
+        self._file.seek(0)
+        self._file.write(CONTAINER_HEADER.pack(CONTAINER_MAGIC,
+                                               FORMAT_VERSION,
+                                               len(self._offsets),
+                                               self._position))
+        self._file.close()
+
+
+class Container:
+    '''
+    Memory-mapped container file.  Records are read by index or in order,
+    their letter codes are memoryviews of the file which should be released
+    before the container is closed.
+    '''
+    __slots__ = ['_index', '_mapped', '_view']
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def __init__(self, path : str):
+        '''
+        @param path Container file to read.
+        '''
+        with open(path, 'rb') as container_file:
+            if os.fstat(container_file.fileno()).st_size < \
+               CONTAINER_HEADER.size:
+                raise ValueError("Container file is truncated")
+
+            self._mapped = mmap.mmap(container_file.fileno(), 0,
+                                     access=mmap.ACCESS_READ)
+
+        self._view = memoryview(self._mapped)
+        magic, version, count, index_offset = \
+            CONTAINER_HEADER.unpack_from(self._view)
+
+        if magic != CONTAINER_MAGIC:
+            self.close()
+            raise ValueError("File is not a container")
+
+        if version != FORMAT_VERSION:
+            self.close()
+            raise ValueError(f"Wire format version {version} is not "
+                             "supported")
+
+        index_end = index_offset + count * 8
+        if not CONTAINER_HEADER.size <= index_offset <= index_end <= \
+           len(self._view):
+            self.close()
+            raise ValueError("Container file is truncated")
+
+        if sys.byteorder == 'little':
+            self._index = self._view[index_offset:index_end].cast('Q')
+        else:
+            self._index = array('Q', self._view[index_offset:index_end])
+            self._index.byteswap()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exception) -> None:
+        self.close()
+
+    def __getitem__(self, record_no : int) -> Record:
+        return self._record_at(self._index[record_no])
+
+    def __iter__(self):
+        for offset in self._index:
+            yield self._record_at(offset)
+
+    def close(self) -> None:
+        ''' Unmap the file. '''
+        if isinstance(getattr(self, '_index', None), memoryview):
+            self._index.release()
+        self._index = ()
+        self._view.release()
+
+        try:
+            self._mapped.close()
+
+        # Records still hold views of the file, it is unmapped once they
+        # have been released.
+        except BufferError:
+            pass
+
+    def _record_at(self, offset : int) -> Record:
+        view = self._view
+        end = offset + settings_size(view, offset)
+        settings = _unpack_settings(bytes(view[offset:end]))
+
+        length, = MESSAGE_LENGTH.unpack_from(view, end)
+        start = end + MESSAGE_LENGTH.size
+        if start + length > len(view):
+            raise ValueError("Container record is truncated")
+
+        return Record(settings, view[start:start + length])
+
+
+@functools.lru_cache(DEFAULT_MACHINE_CACHE_SIZE)
+def _pack_day_settings(settings : WireSettings) -> tuple:
+    '''
+    Pack everything but the rotor positions.
+    @return Tuple of (header, fields as an integer, number of fields).
+    '''
+    if settings.model not in MODEL_IDS:
+        raise ValueError(f"Model '{settings.model}' has no wire format "
+                         "number")
+
+    no_of_rotors = len(settings.rotors)
+    if len(settings.ring_settings) != no_of_rotors:
+        raise ValueError("Invalid number of ring settings")
+
+    rotors = [_component_number(REGISTRY.rotor_names(settings.model), name)
+              for name in settings.rotors]
+    reflector = _component_number(REGISTRY.reflector_names(settings.model),
+                                  settings.reflector)
+
+    contacts = [settings.reflector_position, *settings.ring_settings]
+    if any(not 0 <= contact < NUMBER_OF_CONTACTS for contact in contacts):
+        raise ValueError("Machine settings are out of range")
+
+    plugs = NO_PLUGBOARD
+    if settings.plugboard is not None:
+        wiring = settings.plugboard
+        if sorted(wiring) != list(IDENTITY_TABLE) or \
+           any(wiring[plug] != contact for contact, plug in enumerate(wiring)):
+            raise ValueError("Plugboard wiring is not paired")
+
+        pairs = [(contact, plug) for contact, plug in enumerate(wiring)
+                 if contact < plug]
+        plugs = len(pairs)
+        contacts.extend(contact for pair in pairs for contact in pair)
+
+    value = 0
+    for field_no, field in enumerate(rotors + [reflector] + contacts):
+        value |= field << field_no * FIELD_BITS
+
+    header = SETTINGS_HEADER.pack(FORMAT_VERSION, MODEL_IDS[settings.model],
+                                  no_of_rotors, plugs)
+    return header, value, no_of_rotors + 1 + len(contacts)
+
+
+def _unpack_settings(packed : bytes) -> WireSettings:
+    _, _, no_of_rotors, plugs = SETTINGS_HEADER.unpack_from(packed)
+
+    day_bits = (_field_count(no_of_rotors, plugs) - no_of_rotors) * \
+               FIELD_BITS
+    value = int.from_bytes(packed[SETTINGS_HEADER.size:], 'little')
+
+    positions = tuple(value >> day_bits + rotor_no * FIELD_BITS & FIELD_MASK
+                      for rotor_no in range(no_of_rotors))
+    if any(position >= NUMBER_OF_CONTACTS for position in positions):
+        raise ValueError("Packed settings are invalid")
+
+    settings = _unpack_day_settings(packed[:SETTINGS_HEADER.size],
+                                    value & (1 << day_bits) - 1)
+    return settings._replace(positions=positions)
+
+
+@functools.lru_cache(DEFAULT_MACHINE_CACHE_SIZE)
+def _unpack_day_settings(header : bytes, value : int) -> WireSettings:
+    ''' Unpack everything but the rotor positions. '''
+    _, model_id, no_of_rotors, plugs = SETTINGS_HEADER.unpack(header)
+
+    model = _MODELS_BY_ID.get(model_id)
+    if model is None:
+        raise ValueError(f"Model number {model_id} is not valid")
+
+    fields = [value >> field_no * FIELD_BITS & FIELD_MASK for field_no in
+              range(_field_count(no_of_rotors, plugs) - no_of_rotors)]
+
+    rotor_names = REGISTRY.rotor_names(model)
+    reflector_names = REGISTRY.reflector_names(model)
+    if any(field >= len(rotor_names) for field in fields[:no_of_rotors]) \
+       or fields[no_of_rotors] >= len(reflector_names) or \
+       any(field >= NUMBER_OF_CONTACTS
+           for field in fields[no_of_rotors + 1:]):
+        raise ValueError("Packed settings are invalid")
+
+    rotors = tuple(rotor_names[field] for field in fields[:no_of_rotors])
+    reflector = reflector_names[fields[no_of_rotors]]
+    rings = no_of_rotors + 2
+
+    plugboard = None
+    if plugs != NO_PLUGBOARD:
+        wiring = bytearray(IDENTITY_TABLE)
+        contacts = fields[rings + no_of_rotors:]
+
+        for contact, plug in zip(contacts[::2], contacts[1::2]):
+            if contact == plug or wiring[contact] != contact or \
+               wiring[plug] != plug:
+                raise ValueError("Packed plugboard is invalid")
+            wiring[contact], wiring[plug] = plug, contact
+
+        plugboard = bytes(wiring)
+
+    return WireSettings(model, rotors, reflector, fields[no_of_rotors + 1],
+                        tuple(fields[rings:rings + no_of_rotors]), None,
+                        plugboard)
+
+
+def _compile_settings(packed : bytes) -> Machine:
+    return create_machine(_unpack_settings(packed))
+
+
+def _component_number(names : list, name : str) -> int:
+    if name not in names:
+        raise ValueError(f"Component '{name}' is not valid")
+
+    number = names.index(name)
+    if number > FIELD_MASK:
+        raise ValueError(f"Component '{name}' has no wire format number")
+
+    return number
+
+
+def _field_count(no_of_rotors : int, plugs : int) -> int:
+    plugs = 0 if plugs == NO_PLUGBOARD else plugs
+    return 3 * no_of_rotors + 2 + 2 * plugs
+
+
+def _fields_size(count : int) -> int:
+    return (count * FIELD_BITS + 7) // 8
+
+
+_MODELS_BY_ID = {model_id: model for model, model_id in MODEL_IDS.items()}
@@ -0,0 +1,41 @@
+'''
+    EnigmaSimulator - A software implementation of the Engima Machine.
+    Copyright (C) 2015-2021 Engima Simulator Development Team
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+'''
+from simulation.enigma_machine import Machine
+
+
+def configured_machine(model : str, rotors, reflector : str, ring_settings,
+                       positions, plugs = None) -> Machine:
+    '''
+    Create a configured machine for a test.
+    @param model Model name.
+    @param rotors Rotor names, left to right.
+    @param reflector Reflector name.
+    @param ring_settings Ring settings 0-25, left to right.
+    @param positions Rotor positions 0-25, left to right.
+    @param plugs Plugged letter pairs, e.g. 'AB CD', None for no plugboard.
+    @return Machine instance.
+    '''
+    # pylint: disable=too-many-arguments
+    machine = Machine()
+
+    if not machine.configure(model, list(rotors), reflector):
+        raise ValueError(machine.last_error)
+
+    machine.set_ring_settings(ring_settings)
+    for rotor_no, position in enumerate(positions):
+        machine.set_rotor_position(rotor_no, position)
+    machine.set_plugboard(plugs)
+
+    return machine
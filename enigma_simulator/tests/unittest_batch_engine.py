@@ -0,0 +1,111 @@
+'''
+    EnigmaSimulator - A software implementation of the Engima Machine.
+    Copyright (C) 2015-2021 Engima Simulator Development Team
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+'''
+import itertools
+import random
+import unittest
+from simulation.enigma_machine import Machine
+
+try:
+    import numpy as np
+    from simulation.batch_engine import BatchEngine, codes_to_text
+
+except ImportError:
+    np = None
+
+@unittest.skipIf(np is None, 'NumPy is not installed')
+class UnitTestBatchEngine(unittest.TestCase):
+    ''' Unit tests for the NumPy batch engine. '''
+
+    def test_invalid_model(self):
+        ''' BatchEngine | Invalid machine type '''
+        with self.assertRaises(ValueError):
+            BatchEngine('Unknown')
+
+    def test_rows_match_machine(self):
+        ''' BatchEngine::encrypt() | Each row matches Machine.encrypt() '''
+        engine = BatchEngine('Enigma1')
+        generator = random.Random(1942)
+
+        orders = list(itertools.permutations(['I', 'II', 'III', 'IV', 'V'],
+                                             3))
+        positions = [[generator.randrange(26) for _ in range(3)]
+                     for _ in orders]
+        reflectors = [generator.choice(['UKW-B', 'UKW-C']) for _ in orders]
+        message = 'DERFUEHRERISTTOTDERKAMPFGEHTWEITER' * 20
+
+        output = engine.encrypt(message, engine.rotor_index(orders),
+                                engine.reflector_index(reflectors),
+                                positions)
+        self.assertEqual(output.shape, (len(orders), len(message)))
+
+        for row, order in enumerate(orders):
+            machine = Machine()
+            if not machine.configure('Enigma1', list(order), reflectors[row]):
+                self.fail(machine.last_error)
+
+            for rotor_no, position in enumerate(positions[row]):
+                machine.set_rotor_position(rotor_no, position)
+
+            self.assertEqual(codes_to_text(output[row]),
+                             machine.encrypt(message))
+
+    def test_plugboard_permutation(self):
+        ''' BatchEngine::encrypt() | Plugboard swaps are applied both ways '''
+        engine = BatchEngine('Enigma1')
+        orders = engine.rotor_index([['I', 'II', 'III']] * 2)
+        reflectors = engine.reflector_index(['UKW-B'] * 2)
+        positions = [[0, 0, 0]] * 2
+
+        identity = np.arange(26)
+        swapped = identity.copy()
+        swapped[[0, 1]] = [1, 0]
+
+        output = engine.encrypt('AAAAA', orders, reflectors, positions,
+                                np.array([identity, swapped]))
+
+        self.assertEqual(codes_to_text(output[0]), 'BDZGO')
+
+        # With A/B swapped, 'A' enters as 'B' and any 'A'/'B' output swaps.
+        plain = engine.encrypt('BBBBB', orders[:1], reflectors[:1],
+                               positions[:1])
+        expected = codes_to_text(swapped[plain[0]])
+        self.assertEqual(codes_to_text(output[1]), expected)
+
+    def test_ring_settings(self):
+        ''' BatchEngine::encrypt() | Ring settings match the machine '''
+        engine = BatchEngine('Enigma1')
+        orders = [['I', 'II', 'III'], ['V', 'IV', 'I']]
+        reflectors = ['UKW-B', 'UKW-C']
+        positions = [[0, 0, 0], [4, 21, 16]]
+        ring_settings = [[1, 1, 1], [12, 3, 25]]
+        message = 'VORMARSCHNACHOSTEN' * 30
+
+        output = engine.encrypt(message, engine.rotor_index(orders),
+                                engine.reflector_index(reflectors),
+                                positions, ring_settings=ring_settings)
+
+        for row, order in enumerate(orders):
+            machine = Machine()
+            if not machine.configure('Enigma1', order, reflectors[row]):
+                self.fail(machine.last_error)
+
+            for rotor_no in range(3):
+                machine.set_rotor_position(rotor_no,
+                                           positions[row][rotor_no])
+                machine.set_ring_setting(rotor_no,
+                                         ring_settings[row][rotor_no])
+
+            self.assertEqual(codes_to_text(output[row]),
+                             machine.encrypt(message))
@@ -0,0 +1,120 @@
+'''
+    EnigmaSimulator - A software implementation of the Engima Machine.
+    Copyright (C) 2015-2021 Engima Simulator Development Team
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+'''
+import contextlib
+import io
+import json
+import os
+import tempfile
+import unittest
+from machine_factory import configured_machine
+from simulation.cli import main
+from simulation.component_registry import ComponentRegistry
+
+MESSAGE = b'Feindliche Zerstoerer in Sicht, Planquadrat AN 1234\n' * 20
+SETTINGS = ['--rotors', 'II IV V', '--reflector', 'UKW-B', '--rings',
+            '02 21 12', '--positions', 'BLA', '--plugboard', 'AV BS CG DL']
+
+class UnitTestCli(unittest.TestCase):
+    ''' Unit tests for the enigma-sim command line. '''
+
+    def setUp(self):
+        self._directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self._directory.cleanup)
+
+    def _path(self, name, content=None):
+        path = os.path.join(self._directory.name, name)
+        if content is not None:
+            with open(path, 'wb') as content_file:
+                content_file.write(content)
+        return path
+
+    def _read(self, path):
+        with open(path, 'rb') as content_file:
+            return content_file.read()
+
+    def _expected(self):
+        machine = configured_machine('Enigma1', ['II', 'IV', 'V'], 'UKW-B',
+                                     (1, 20, 11), (1, 11, 0), 'AV BS CG DL')
+        return machine.encrypt_bytes(MESSAGE.upper())
+
+    def test_encrypt_decrypt(self):
+        ''' enigma-sim encrypt/decrypt | Files round trip '''
+        plain = self._path('plain.txt', MESSAGE)
+        cipher = self._path('cipher.txt')
+        decrypted = self._path('decrypted.txt')
+
+        self.assertEqual(main(['encrypt', *SETTINGS, '-i', plain,
+                               '-o', cipher]), 0)
+        self.assertEqual(self._read(cipher), self._expected())
+
+        self.assertEqual(main(['decrypt', *SETTINGS, '-i', cipher,
+                               '-o', decrypted]), 0)
+        self.assertEqual(self._read(decrypted), MESSAGE.upper())
+
+    def test_batch(self):
+        ''' enigma-sim batch | Messages are processed by key sheet '''
+        sheet = self._path('sheet.json', json.dumps(
+            [{'day': 3, 'model': 'Enigma1', 'rotors': 'II IV V',
+              'reflector': 'UKW-B', 'ring_settings': '02 21 12',
+              'plugboard': 'AV BS CG DL'}]).encode('utf-8'))
+        messages = self._path('messages.jsonl', json.dumps(
+            {'id': 1, 'day': 3, 'positions': 'BLA',
+             'text': MESSAGE.decode('utf-8')}).encode('utf-8'))
+        output = self._path('results.jsonl')
+
+        with contextlib.redirect_stderr(io.StringIO()):
+            self.assertEqual(main(['batch', '--key-sheet', sheet,
+                                   '--messages', messages,
+                                   '--output', output]), 0)
+
+        result = json.loads(self._read(output))
+        self.assertEqual(result['output'].encode('utf-8'), self._expected())
+
+    def test_invalid_settings(self):
+        ''' enigma-sim | Invalid settings are reported with exit code 1 '''
+        plain = self._path('plain.txt', MESSAGE)
+
+        for settings in (['--rotors', 'I II'], ['--positions', 'AB'],
+                         ['--plugboard', 'AB BC']):
+            with contextlib.redirect_stderr(io.StringIO()) as errors:
+                self.assertEqual(main(['encrypt', *settings, '-i', plain,
+                                       '-o', self._path('out.txt')]), 1)
+            self.assertIn('error', errors.getvalue())
+
+    def test_benchmark_options(self):
+        ''' enigma-sim benchmark | Size and repeat must be positive '''
+        with contextlib.redirect_stdout(io.StringIO()) as output:
+            self.assertEqual(main(['benchmark', '--size', '100',
+                                   '--repeat', '1']), 0)
+        self.assertIn('100 letters in', output.getvalue())
+
+        for option, value in (('--size', '-5'), ('--size', '0'),
+                              ('--repeat', '0'), ('--repeat', 'x')):
+            with contextlib.redirect_stderr(io.StringIO()) as errors, \
+                 self.assertRaises(SystemExit) as context:
+                main(['benchmark', option, value])
+            self.assertNotEqual(context.exception.code, 0)
+            self.assertIn('positive integer', errors.getvalue())
+
+    def test_lazy_models(self):
+        ''' ComponentRegistry | Models are indexed when first used '''
+        registry = ComponentRegistry()
+        self.assertIsNone(registry._models)
+
+        self.assertIsNone(registry.rotor('Unknown', 'I'))
+        self.assertEqual(list(registry._rotors), [])
+
+        self.assertIsNotNone(registry.rotor('Enigma1', 'I'))
+        self.assertEqual(list(registry._rotors), ['Enigma1'])
@@ -0,0 +1,159 @@
+'''
+    EnigmaSimulator - A software implementation of the Engima Machine.
+    Copyright (C) 2015-2021 Engima Simulator Development Team
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+'''
+import collections
+import random
+import unittest
+from machine_factory import configured_machine
+from simulation.code_scoring import NgramTable, score_decryption, TextScore
+from simulation.plugboard_search import climb_plugboard_ngrams, RotorCore
+from simulation.scoring import index_of_coincidence, NgramScorer
+from simulation.wire_format import decode_letters, encode_letters
+
+PLAINTEXT = 'ANXGENERALSTABXDERXLUFTWAFFEXMELDETXWETTERLAGEXKLAR' * 4
+PLUGS = 'AM FI NV PS TU WZ'
+
+def _count_ngrams(text, length):
+    return collections.Counter(text[index:index + length]
+                               for index in range(len(text) - length + 1))
+
+class UnitTestCodeScoring(unittest.TestCase):
+    ''' Unit tests for scoring letter codes. '''
+
+    def _create_machine(self, plugs=None):
+        return configured_machine('Enigma1', ['V', 'III', 'I'], 'UKW-B',
+                                  (1, 20, 5), (4, 17, 9), plugs)
+
+    def _random_codes(self, seed, length):
+        generator = random.Random(seed)
+        return bytes(generator.randrange(26) for _ in range(length))
+
+    def test_ngram_table(self):
+        ''' NgramTable | Scores match NgramScorer '''
+        counts = _count_ngrams(PLAINTEXT, 4)
+        table = NgramTable(counts)
+        scorer = NgramScorer(counts)
+
+        for text in (PLAINTEXT, 'WETTER', 'ABC', '',
+                     decode_letters(self._random_codes(0, 500))):
+            self.assertAlmostEqual(table(text), scorer(text))
+
+        self.assertEqual(table.length, 4)
+        self.assertAlmostEqual(table.floor, scorer('ZZZZ'))
+
+        for counts in ({}, {'AB': 1, 'ABC': 2}, {'A1': 3}):
+            with self.assertRaises(ValueError):
+                NgramTable(counts)
+
+    def test_extend(self):
+        ''' TextScore::extend() | Streamed text scores as one text '''
+        table = NgramTable(_count_ngrams(PLAINTEXT, 3))
+        codes = self._random_codes(1, 1000)
+        whole = TextScore(table, codes)
+
+        streamed = TextScore(table)
+        for start in range(0, len(codes), 7):
+            streamed.extend(codes[start:start + 7])
+
+        self.assertEqual(len(streamed), len(codes))
+        self.assertEqual(bytes(streamed.codes), codes)
+        self.assertFalse(streamed.codes.flags.writeable)
+        self.assertAlmostEqual(streamed.fitness, whole.fitness)
+        self.assertAlmostEqual(streamed.fitness, table.fitness(codes))
+        self.assertAlmostEqual(streamed.index_of_coincidence,
+                               index_of_coincidence(decode_letters(codes)))
+
+    def test_update_undo(self):
+        ''' TextScore::update() | Changes re-score and are undone '''
+        table = NgramTable(_count_ngrams(PLAINTEXT, 4))
+        codes = encode_letters(PLAINTEXT)
+        score = TextScore(table, codes)
+        generator = random.Random(2)
+        expected = bytearray(codes)
+        tokens = []
+
+        for _ in range(20):
+            positions = generator.sample(range(len(codes)), 3)
+            letters = [generator.randrange(26) for _ in positions]
+            for position, letter in zip(positions, letters):
+                expected[position] = letter
+
+            tokens.append(score.update(positions, letters))
+            fresh = TextScore(table, bytes(expected))
+            self.assertAlmostEqual(score.fitness, fresh.fitness)
+            self.assertAlmostEqual(score.index_of_coincidence,
+                                   fresh.index_of_coincidence)
+
+        token = score.replace(codes)
+        self.assertAlmostEqual(score.fitness, table.fitness(codes))
+        score.undo(token)
+        self.assertEqual(bytes(score.codes), bytes(expected))
+
+        for token in reversed(tokens):
+            score.undo(token)
+        self.assertEqual(bytes(score.codes), codes)
+        self.assertEqual(score.fitness, TextScore(table, codes).fitness)
+
+        with self.assertRaises(ValueError):
+            score.replace(codes[1:])
+
+    def test_update_duplicate_positions(self):
+        ''' TextScore::update() | The last code of a repeated position wins '''
+        table = NgramTable(_count_ngrams(PLAINTEXT, 4))
+        codes = encode_letters(PLAINTEXT)
+        score = TextScore(table, codes)
+
+        token = score.update([5, 9, 5, 5], [1, 3, 2, 4])
+
+        expected = bytearray(codes)
+        expected[5], expected[9] = 4, 3
+        fresh = TextScore(table, bytes(expected))
+        self.assertEqual(bytes(score.codes), bytes(expected))
+        self.assertAlmostEqual(score.fitness, fresh.fitness)
+        self.assertAlmostEqual(score.index_of_coincidence,
+                               fresh.index_of_coincidence)
+
+        score.undo(token)
+        self.assertEqual(bytes(score.codes), codes)
+        self.assertAlmostEqual(score.index_of_coincidence,
+                               TextScore(table, codes).index_of_coincidence)
+
+    def test_score_decryption(self):
+        ''' score_decryption() | Decrypts and scores in chunks '''
+        table = NgramTable(_count_ngrams(PLAINTEXT, 4))
+        ciphertext = self._create_machine(PLUGS).encrypt(PLAINTEXT)
+
+        machine = self._create_machine(PLUGS)
+        score = score_decryption(machine, ciphertext, table, chunk_size=11)
+
+        self.assertEqual(decode_letters(score.codes), PLAINTEXT)
+        self.assertAlmostEqual(score.fitness, table(PLAINTEXT))
+        self.assertEqual(machine.snapshot(),
+                         self._create_machine(PLUGS).snapshot()._replace(
+                             positions=machine.snapshot().positions))
+        self.assertNotEqual(machine.snapshot().positions, (4, 17, 9))
+
+        with self.assertRaises(ValueError):
+            score_decryption(machine, ciphertext, table, chunk_size=0)
+
+    def test_climb_plugboard_ngrams(self):
+        ''' climb_plugboard_ngrams() | Recovers the plugboard '''
+        table = NgramTable(_count_ngrams(PLAINTEXT, 4))
+        ciphertext = self._create_machine(PLUGS).encrypt(PLAINTEXT)
+        core = RotorCore(self._create_machine(), ciphertext)
+
+        plugboard, fitness = climb_plugboard_ngrams(core, table)
+
+        self.assertEqual(core.decrypt(plugboard), PLAINTEXT)
+        self.assertAlmostEqual(fitness, table(PLAINTEXT))
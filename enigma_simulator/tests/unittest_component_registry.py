@@ -0,0 +1,84 @@
+'''
+    EnigmaSimulator - A software implementation of the Engima Machine.
+    Copyright (C) 2015-2021 Engima Simulator Development Team
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+'''
+import unittest
+from simulation.component_registry import ComponentRegistry, REGISTRY
+from simulation.enigma_machine import Machine
+
+class UnitTestComponentRegistry(unittest.TestCase):
+    ''' Unit tests for the component registry. '''
+
+    def test_lookups(self):
+        ''' ComponentRegistry | Model, rotor and reflector lookups '''
+        registry = ComponentRegistry()
+
+        self.assertEqual(registry.rotor('Enigma1', 'I').wiring,
+                         'EKMFLGDQVZNTOWYHXUSPAIBRCJ')
+        self.assertIsNone(registry.rotor('Enigma1', 'Ix'))
+        self.assertIsNone(registry.reflector('Unknown', 'UKW-B'))
+
+        with self.assertRaises(ValueError):
+            registry.model('Unknown')
+
+    def test_tables_are_shared(self):
+        ''' ComponentRegistry | Derived tables are built once '''
+        registry = ComponentRegistry()
+        wiring = registry.rotor('Enigma1', 'II').wiring
+
+        first = registry.rotor_tables(wiring)
+        self.assertIs(registry.rotor_tables(wiring), first)
+        self.assertEqual(registry.cache_info()['rotor_tables'].hits, 1)
+
+    def test_cache_eviction(self):
+        ''' ComponentRegistry | Least recently used tables are evicted '''
+        registry = ComponentRegistry(cache_size=1)
+        wiring_1 = registry.rotor('Enigma1', 'I').wiring
+        wiring_2 = registry.rotor('Enigma1', 'II').wiring
+
+        first = registry.rotor_tables(wiring_1)
+        registry.rotor_tables(wiring_2)
+        self.assertIsNot(registry.rotor_tables(wiring_1), first)
+
+    def test_register_invalid_components(self):
+        ''' ComponentRegistry | Invalid custom components are rejected '''
+        registry = ComponentRegistry()
+
+        with self.assertRaises(ValueError):
+            registry.register_rotor('Enigma1', 'X', 'ABC', ['A'])
+
+        with self.assertRaises(ValueError):
+            registry.register_rotor('Enigma1', 'X',
+                                    'EKMFLGDQVZNTOWYHXUSPAIBRCJ', ['1'])
+
+        # Rotor I wiring isn't paired, so it can't be a reflector.
+        with self.assertRaises(ValueError):
+            registry.register_reflector('Enigma1', 'X',
+                                        'EKMFLGDQVZNTOWYHXUSPAIBRCJ')
+
+    def test_machine_with_custom_components(self):
+        ''' Machine::configure() | Custom rotors and reflectors '''
+        REGISTRY.register_rotor('Enigma1', 'Test-I',
+                                'EKMFLGDQVZNTOWYHXUSPAIBRCJ', ['Q'])
+        REGISTRY.register_reflector('Enigma1', 'Test-B',
+                                    'YRUHQSLDPXNGOKMIEBFZCWVJAT')
+
+        machine = Machine()
+
+        status = machine.configure('Enigma1', ['Test-I', 'II', 'III'],
+                                   'Test-B')
+        if not status:
+            self.fail(machine.last_error)
+
+        # Same wiring as rotor I and UKW-B.
+        self.assertEqual(machine.encrypt('AAAAA'), 'BDZGO')
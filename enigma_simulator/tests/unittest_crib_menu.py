@@ -0,0 +1,105 @@
+'''
+    EnigmaSimulator - A software implementation of the Engima Machine.
+    Copyright (C) 2015-2021 Engima Simulator Development Team
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+'''
+import itertools
+import unittest
+from machine_factory import configured_machine
+from simulation.crib_menu import crib_alignments, Menu, search_menu
+
+PLAINTEXT = 'ANXGENERALSTABXDERXLUFTWAFFEXMELDETXWETTERLAGEXKLAR' * 4
+CRIB = 'ANXGENERALSTABXDERXLUFTWAFFE'
+PLUGS = 'AM FI NV PS TU WZ'
+
+class UnitTestCribMenu(unittest.TestCase):
+    ''' Unit tests for crib menus. '''
+
+    def test_crib_alignments(self):
+        ''' crib_alignments() | Alignments where a letter meets itself '''
+        self.assertEqual(crib_alignments('ABCDE', 'BC'), [0, 2, 3])
+        self.assertEqual(crib_alignments('AB', 'ABC'), [])
+
+        ciphertext = configured_machine(
+            'Enigma1', ('V', 'III', 'I'), 'UKW-B', (1, 20, 5), (4, 17, 9),
+            PLUGS).encrypt(PLAINTEXT)
+        alignments = crib_alignments(ciphertext, CRIB)
+
+        self.assertIn(0, alignments)
+        self.assertLess(len(alignments), len(ciphertext) - len(CRIB) + 1)
+
+        for offset in range(len(ciphertext) - len(CRIB) + 1):
+            if offset in alignments:
+                Menu(ciphertext, CRIB, offset)
+            else:
+                with self.assertRaises(ValueError):
+                    Menu(ciphertext, CRIB, offset)
+
+    def test_menu(self):
+        ''' Menu | Letters, loops and parts of the graph '''
+        # Edges A-B, B-C, C-A (a loop), A-B again (a loop) and D-E.
+        menu = Menu('XBCABE', 'ABCAD', 1)
+
+        self.assertEqual(len(menu), 5)
+        self.assertEqual(menu.offset, 1)
+        self.assertEqual(menu.edges[0], (0, 1, 1))
+        self.assertEqual(menu.letters, (0, 1, 2, 3, 4))
+        self.assertEqual(sorted(map(sorted, menu.components())),
+                         [[0, 1, 2], [3, 4]])
+        self.assertEqual(menu.loops, 2)
+        self.assertEqual(menu.test_letter, 0)
+
+        for ciphertext, crib, offset in (('ABC', '', 0), ('ABC', 'BC', 2),
+                                         ('ABC', 'B', -1), ('ABC', 'XB', 0)):
+            with self.assertRaises(ValueError):
+                Menu(ciphertext, crib, offset)
+
+    def test_search_menu(self):
+        ''' search_menu() | Stops at the key and derives the plugs '''
+        ciphertext = configured_machine(
+            'Enigma1', ('V', 'III', 'I'), 'UKW-B', (1, 20, 5), (4, 17, 9),
+            PLUGS).encrypt(PLAINTEXT)
+        machine = configured_machine('Enigma1', ('V', 'III', 'I'), 'UKW-B',
+                                     (1, 20, 5), (0, 0, 0))
+
+        stops = search_menu(machine, Menu(ciphertext, CRIB))
+
+        # Almost every one of the 17,576 positions is rejected.
+        self.assertLess(len(stops), 10)
+        stop = [stop for stop in stops if stop.positions == (4, 17, 9)]
+        self.assertEqual(len(stop), 1)
+        self.assertEqual(stop[0].rotors, ('V', 'III', 'I'))
+        self.assertEqual(stop[0].ring_settings, (1, 20, 5))
+        self.assertEqual(stop[0].plugs, PLUGS)
+        self.assertEqual(stop[0].steckers['A'], 'M')
+        self.assertEqual(stop[0].steckers['B'], 'B')
+
+        # The machine isn't changed.
+        self.assertEqual(machine.snapshot().positions, (0, 0, 0))
+
+    def test_search_menu_m4(self):
+        ''' search_menu() | Rotors that don't step are tested too '''
+        plaintext = 'VONVONJLOOKSJHABEN' * 5
+        ciphertext = configured_machine(
+            'M4', ('Beta', 'II', 'IV', 'I'), 'UKW-B-Thin', (0, 0, 0, 21),
+            (21, 9, 14, 2), 'AT BL DF GJ HM NW OP QY RZ VX').encrypt(plaintext)
+        machine = configured_machine('M4', ('Beta', 'II', 'IV', 'I'),
+                                     'UKW-B-Thin', (0, 0, 0, 21), (0, 0, 0, 0))
+
+        positions = [(fixed, 9, middle, right) for fixed in (3, 21)
+                     for middle, right in itertools.product(range(26),
+                                                            repeat=2)]
+        stops = search_menu(machine, Menu(ciphertext, plaintext[:40]),
+                            positions, block_size=100)
+
+        self.assertIn((21, 9, 14, 2), [stop.positions for stop in stops])
+        self.assertLess(len(stops), 10)
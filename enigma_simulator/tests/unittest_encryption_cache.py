@@ -0,0 +1,130 @@
+'''
+    EnigmaSimulator - A software implementation of the Engima Machine.
+    Copyright (C) 2015-2021 Engima Simulator Development Team
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+'''
+import concurrent.futures
+import unittest
+from simulation.encryption_cache import EncryptionCache
+from simulation.enigma_machine import Machine
+from simulation.plugboard_permutation import PlugboardPermutation
+
+PLUGS = 'AQ BV CX DZ'
+
+class UnitTestEncryptionCache(unittest.TestCase):
+    ''' Unit tests for the encryption memo. '''
+
+    def _create_machine(self, positions=(0, 0, 0), plugs=PLUGS):
+        machine = Machine()
+
+        if not machine.configure('Enigma1', ['IV', 'II', 'V'], 'UKW-B'):
+            self.fail(machine.last_error)
+
+        machine.set_ring_setting(2, 11)
+        machine.restore(machine.snapshot()._replace(
+            positions=positions,
+            plugboard=PlugboardPermutation.from_pairs(plugs).wiring))
+        return machine
+
+    def test_machine_hit(self):
+        ''' EncryptionCache::encrypt() | A hit matches Machine.encrypt() '''
+        cache = EncryptionCache()
+        expected = self._create_machine((1, 2, 3))
+        output = expected.encrypt('AXLE GRUPPE')
+
+        for _ in range(2):
+            machine = self._create_machine((1, 2, 3))
+            self.assertEqual(cache.encrypt(machine, 'axle gruppe'), output)
+            self.assertEqual(machine.snapshot(), expected.snapshot())
+
+        info = cache.cache_info()
+        self.assertEqual((info.hits, info.misses, info.entries), (1, 1, 1))
+
+    def test_encrypt_message(self):
+        ''' EncryptionCache::encrypt_message() | Settings match a machine '''
+        cache = EncryptionCache()
+        expected = self._create_machine((5, 25, 7)).encrypt('QWE RTZ')
+
+        for _ in range(3):
+            self.assertEqual(cache.encrypt_message(
+                'Enigma1', ['IV', 'II', 'V'], 'UKW-B', 'QWE RTZ',
+                positions=(5, 25, 7), ring_settings=(0, 0, 11),
+                plugboard=PLUGS), expected)
+
+        # The machine based and settings based keys are the same.
+        cache.encrypt(self._create_machine((5, 25, 7)), 'QWE RTZ')
+        self.assertEqual(cache.cache_info().hits, 3)
+
+    def test_encrypt_message_invalid_settings(self):
+        ''' EncryptionCache::encrypt_message() | Bad settings are rejected '''
+        cache = EncryptionCache()
+        arguments = ('Enigma1', ['IV', 'II', 'V'], 'UKW-B', 'QWE RTZ')
+
+        with self.assertRaises(TypeError):
+            cache.encrypt_message(*arguments, position=(5, 25, 7))
+
+        for settings in ({'positions': (5, 25)},
+                         {'ring_settings': (0, 0, 0, 11)},
+                         {'positions': (5, 26, 7)}):
+            with self.assertRaises(ValueError):
+                cache.encrypt_message(*arguments, **settings)
+
+    def test_lru_eviction(self):
+        ''' EncryptionCache | The least recently used entry is evicted '''
+        cache = EncryptionCache(max_entries=2)
+
+        for text in ('AAA', 'BBB', 'AAA', 'CCC', 'AAA', 'BBB'):
+            cache.encrypt(self._create_machine(), text)
+
+        info = cache.cache_info()
+        self.assertEqual((info.hits, info.misses, info.evictions),
+                         (2, 4, 2))
+        self.assertEqual(info.entries, 2)
+
+        cache.clear()
+        self.assertEqual(cache.cache_info().entries, 0)
+
+    def test_long_messages_not_cached(self):
+        ''' EncryptionCache | Long messages are always encrypted '''
+        cache = EncryptionCache(max_message_length=10)
+        machine = self._create_machine()
+
+        self.assertEqual(cache.encrypt(machine, 'A' * 11),
+                         self._create_machine().encrypt('A' * 11))
+        self.assertEqual(cache.cache_info().entries, 0)
+
+    def test_threads(self):
+        ''' EncryptionCache | Concurrent use from several threads '''
+        cache = EncryptionCache(max_entries=8)
+        messages = [f'MESSAGE {number % 12}' for number in range(600)]
+
+        def encrypt(text):
+            return cache.encrypt_message('Enigma1', ['IV', 'II', 'V'],
+                                         'UKW-B', text, plugboard=PLUGS,
+                                         ring_settings=(0, 0, 11))
+
+        with concurrent.futures.ThreadPoolExecutor(8) as executor:
+            outputs = list(executor.map(encrypt, messages))
+
+        expected = {text: self._create_machine().encrypt(text)
+                    for text in set(messages)}
+        self.assertEqual(outputs, [expected[text] for text in messages])
+
+        info = cache.cache_info()
+        self.assertEqual(info.hits + info.misses, len(messages))
+        self.assertLessEqual(info.entries, 8)
+
+    def test_invalid_plugboard_pairs(self):
+        ''' PlugboardPermutation::from_pairs() | Invalid pairs '''
+        for pairs in ('AB BC', 'AA', 'ABC', 'A1'):
+            with self.assertRaises(ValueError):
+                PlugboardPermutation.from_pairs(pairs)
@@ -0,0 +1,80 @@
+'''
+    EnigmaSimulator - A software implementation of the Engima Machine.
+    Copyright (C) 2015-2021 Engima Simulator Development Team
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+'''
+import concurrent.futures
+import random
+import unittest
+from machine_factory import configured_machine
+from simulation.engine import CompiledMachine
+from simulation.rotor_contact import RotorContact
+
+MESSAGE = 'VON LEUTNANT ZUR SEE' * 40
+PLUGS = 'AT BL DF GJ HM NW OP QY RZ VX'
+
+class UnitTestEngine(unittest.TestCase):
+    ''' Unit tests for compiled machines and sessions. '''
+
+    def test_matches_machine(self):
+        ''' CompiledMachine | Sessions match Machine.encrypt() '''
+        settings = [('Enigma1', ('II', 'V', 'III'), 'UKW-C', (3, 0, 17)),
+                    ('M4', ('Gamma', 'VI', 'I', 'VIII'), 'UKW-C-Thin',
+                     (0, 5, 0, 12))]
+
+        for model, rotors, reflector, ring_settings in settings:
+            compiled = CompiledMachine(model, rotors, reflector,
+                                       ring_settings, PLUGS)
+            positions = tuple(range(7, 7 + len(rotors)))
+
+            machine = configured_machine(model, rotors, reflector,
+                                         ring_settings, positions, PLUGS)
+            session = compiled.session(positions)
+
+            self.assertEqual(compiled.circuit(positions),
+                             machine.lever_circuit())
+            self.assertEqual(session.encrypt(MESSAGE),
+                             machine.encrypt(MESSAGE))
+            self.assertEqual(session.press_key(RotorContact.K),
+                             machine.press_key(RotorContact.K))
+            self.assertEqual(session.positions, machine.snapshot().positions)
+
+    def test_concurrent_sessions(self):
+        ''' CompiledMachine | Threads share one compiled machine '''
+        compiled = CompiledMachine('Enigma1', ['I', 'II', 'III'], 'UKW-B',
+                                   (0, 0, 0), PLUGS)
+        starts = [tuple(random.Random(seed).randrange(26) for _ in range(3))
+                  for seed in range(64)]
+
+        def encrypt(positions):
+            session = compiled.session(positions)
+            return [session.encrypt(MESSAGE[:50]) for _ in range(20)]
+
+        with concurrent.futures.ThreadPoolExecutor(8) as executor:
+            outputs = list(executor.map(encrypt, starts))
+
+        for positions, output in zip(starts, outputs):
+            machine = configured_machine('Enigma1', ['I', 'II', 'III'],
+                                         'UKW-B', (0, 0, 0), positions,
+                                         PLUGS)
+            self.assertEqual(output, [machine.encrypt(MESSAGE[:50])
+                                      for _ in range(20)])
+
+    def test_invalid_settings(self):
+        ''' CompiledMachine | Invalid settings are rejected '''
+        with self.assertRaises(ValueError):
+            CompiledMachine('Enigma1', ['I', 'II', 'III'], 'UKW-B', (0, 0))
+
+        compiled = CompiledMachine('Enigma1', ['I', 'II', 'III'], 'UKW-B')
+        for positions in ((0, 0), (0, 0, 26)):
+            with self.assertRaises(ValueError):
+                compiled.session(positions)
@@ -0,0 +1,134 @@
+'''
+    EnigmaSimulator - A software implementation of the Engima Machine.
+    Copyright (C) 2015-2021 Engima Simulator Development Team
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+'''
+import itertools
+import os
+import socket
+import tempfile
+import unittest
+from simulation.enigma_machine import Machine
+from simulation.instrumentation import FileExporter, Instrumentation, \
+                                       prometheus_text, SocketExporter, STAGES
+from simulation.log_policy import TraceSinkPolicy
+from simulation.rotor_contact import RotorContact
+
+MESSAGE = 'WETTERVORHERSAGE BISKAYA' * 50
+
+class UnitTestInstrumentation(unittest.TestCase):
+    ''' Unit tests for machine instrumentation. '''
+
+    def _create_machine(self, instrumentation=None, log_policy=None):
+        machine = Machine(log_policy=log_policy)
+
+        if not machine.configure('Enigma1', ['I', 'II', 'III'], 'UKW-B'):
+            self.fail(machine.last_error)
+
+        machine.set_rotor_position(1, RotorContact.D.value)
+        machine.set_rotor_position(2, RotorContact.U.value)
+        machine.set_instrumentation(instrumentation)
+        return machine
+
+    def test_output_unchanged(self):
+        ''' Machine | Instrumented encryption matches uninstrumented '''
+        expected = self._create_machine()
+        instrumented = self._create_machine(Instrumentation(sample_interval=3))
+
+        self.assertEqual(instrumented.encrypt(MESSAGE),
+                         expected.encrypt(MESSAGE))
+        self.assertEqual(instrumented.press_key(RotorContact.Q),
+                         expected.press_key(RotorContact.Q))
+        self.assertEqual(instrumented.snapshot(), expected.snapshot())
+
+    def test_counters(self):
+        ''' Instrumentation | Keys, turnovers and double steps are counted '''
+        instrumentation = Instrumentation()
+        machine = self._create_machine(instrumentation)
+
+        # ADU => ADV => AEW => BFX, the third key press is a double step.
+        machine.encrypt('A A A')
+        self.assertEqual([machine.get_rotor_position(rotor_no)
+                          for rotor_no in range(3)],
+                         [RotorContact.B.value, RotorContact.F.value,
+                          RotorContact.X.value])
+
+        stats = instrumentation.stats()
+        self.assertEqual(stats['keys'], 3)
+        self.assertEqual(stats['turnovers'], 2)
+        self.assertEqual(stats['double_steps'], 1)
+
+    def test_sampled_timings(self):
+        ''' Instrumentation | One in every N key presses is timed '''
+        ticks = itertools.count()
+        instrumentation = Instrumentation(sample_interval=4,
+                                          clock=lambda: next(ticks))
+        machine = self._create_machine(instrumentation)
+        machine.encrypt('A' * 40)
+
+        stages = instrumentation.stats()['stages']
+        for stage in ('stepping', 'plugboard', 'rotors', 'reflector'):
+            self.assertEqual(stages[stage]['samples'], 10)
+            self.assertGreater(stages[stage]['mean'], 0)
+        self.assertEqual(stages['logging']['samples'], 0)
+
+        instrumentation.reset()
+        self.assertEqual(instrumentation.stats()['keys'], 0)
+
+    def test_logging_stage(self):
+        ''' Instrumentation | Logged key presses are timed as logging '''
+        instrumentation = Instrumentation(sample_interval=1)
+        machine = self._create_machine(instrumentation,
+                                       TraceSinkPolicy(lambda event: None))
+        machine.encrypt('ABCDE')
+
+        stages = instrumentation.stats()['stages']
+        self.assertEqual(stages['logging']['samples'], 5)
+        self.assertEqual(stages['stepping']['samples'], 0)
+
+    def test_prometheus_export(self):
+        ''' Instrumentation | Metrics are exported to a file and a socket '''
+        instrumentation = Instrumentation()
+        self._create_machine(instrumentation).encrypt(MESSAGE)
+
+        text = prometheus_text(instrumentation.stats())
+        self.assertIn(f'enigma_keys_total {len(MESSAGE) - 50}\n', text)
+        self.assertIn('# TYPE enigma_double_steps_total counter\n', text)
+        for stage in STAGES:
+            self.assertIn(f'enigma_stage_seconds_total{{stage="{stage}"}}',
+                          text)
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'enigma.prom')
+            address = os.path.join(directory, 'metrics.sock')
+
+            with socket.socket(socket.AF_UNIX) as listener:
+                listener.bind(address)
+                listener.listen(1)
+
+                instrumentation.add_exporter(FileExporter(path))
+                instrumentation.add_exporter(SocketExporter(address))
+                instrumentation.export()
+
+                connection, _ = listener.accept()
+                with connection:
+                    received = b''.join(iter(lambda: connection.recv(4096),
+                                             b''))
+
+            with open(path, 'r', encoding='utf-8') as metrics_file:
+                self.assertEqual(metrics_file.read(), text)
+            self.assertEqual(received.decode('utf-8'), text)
+
+    def test_invalid_sample_interval(self):
+        ''' Instrumentation | Sample interval must be positive '''
+        with self.assertRaises(ValueError):
+            Instrumentation(sample_interval=0)
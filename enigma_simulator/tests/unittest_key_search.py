@@ -0,0 +1,136 @@
+'''
+    EnigmaSimulator - A software implementation of the Engima Machine.
+    Copyright (C) 2015-2021 Engima Simulator Development Team
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+'''
+import itertools
+import json
+import os
+import tempfile
+import unittest
+from simulation.enigma_machine import Machine
+from simulation.key_search import KeySearch, ring_setting_candidates
+from simulation.scoring import CribScorer, index_of_coincidence, NgramScorer
+
+PLAINTEXT = 'KEINEBESONDERENEREIGNISSEZUMELDEN'
+
+class UnitTestKeySearch(unittest.TestCase):
+    ''' Unit tests for the key search and scorers. '''
+
+    def setUp(self):
+        machine = Machine()
+        machine.configure('Enigma1', ['II', 'I', 'III'], 'UKW-B')
+        machine.set_rotor_position(0, 3)
+        machine.set_rotor_position(1, 1)
+        machine.set_rotor_position(2, 7)
+        self._ciphertext = machine.encrypt(PLAINTEXT)
+
+        # Only search a slice of the positions to keep the test quick.
+        self._positions = [(3, 1, right) for right in range(26)] + \
+                          [(0, 0, right) for right in range(26)]
+
+    def test_scorers(self):
+        ''' Scorers | Crib, index of coincidence and n-gram fitness '''
+        self.assertEqual(CribScorer('BESONDER', 5)(PLAINTEXT), 8.0)
+        self.assertEqual(index_of_coincidence('AABB'), 4 / 12)
+
+        scorer = NgramScorer({'EINE': 10, 'NDER': 5})
+        self.assertGreater(scorer('KEINE'), scorer('KXYZQ'))
+
+        with self.assertRaises(ValueError):
+            NgramScorer({'EIN': 1, 'NDER': 1})
+
+    def test_search_finds_key(self):
+        ''' KeySearch::search() | Best result is the correct key '''
+        search = KeySearch('Enigma1', self._ciphertext, CribScorer(PLAINTEXT),
+                           rotor_orders=itertools.permutations(
+                               ['I', 'II', 'III'], 3),
+                           reflectors=['UKW-B'], positions=self._positions,
+                           top_k=3, max_workers=2)
+        best = search.search()[0]
+
+        self.assertEqual(best.rotors, ('II', 'I', 'III'))
+        self.assertEqual(best.positions, (3, 1, 7))
+        self.assertEqual(best.plaintext, PLAINTEXT)
+
+    def test_search_checkpoint_resume(self):
+        ''' KeySearch::run() | Completed units are skipped on resume '''
+        with tempfile.TemporaryDirectory() as directory:
+            checkpoint = os.path.join(directory, 'search.json')
+            options = {'rotor_orders': [('II', 'I', 'III'),
+                                        ('I', 'II', 'III')],
+                       'reflectors': ['UKW-B'], 'positions': self._positions,
+                       'checkpoint': checkpoint, 'max_workers': 1}
+
+            search = KeySearch('Enigma1', self._ciphertext,
+                               CribScorer(PLAINTEXT), **options)
+            next(search.run())
+
+            with open(checkpoint, 'r', encoding='utf-8') as checkpoint_file:
+                self.assertEqual(len(json.load(checkpoint_file)['completed']),
+                                 1)
+
+            resumed = KeySearch('Enigma1', self._ciphertext,
+                                CribScorer(PLAINTEXT), **options)
+            self.assertEqual(len(list(resumed.run())), 1)
+            self.assertEqual(resumed.results[0].plaintext, PLAINTEXT)
+
+            # A checkpoint of a different search isn't resumed.
+            for ciphertext, scorer, positions in (
+                    (self._ciphertext[1:], CribScorer(PLAINTEXT),
+                     self._positions),
+                    (self._ciphertext, CribScorer(PLAINTEXT[1:]),
+                     self._positions),
+                    (self._ciphertext, CribScorer(PLAINTEXT),
+                     self._positions[1:])):
+                other = KeySearch('Enigma1', ciphertext, scorer,
+                                  **dict(options, positions=positions))
+                with self.assertRaises(ValueError):
+                    next(other.run())
+
+    def test_search_stop_score(self):
+        ''' KeySearch::run() | Search stops once the stop score is reached '''
+        search = KeySearch('Enigma1', self._ciphertext, CribScorer(PLAINTEXT),
+                           rotor_orders=[('II', 'I', 'III')] * 4,
+                           reflectors=['UKW-B'], positions=self._positions,
+                           stop_score=len(PLAINTEXT), max_workers=1)
+
+        self.assertEqual(len(list(search.run())), 1)
+
+    def test_search_ring_settings(self):
+        ''' KeySearch::search() | Ring settings are searched '''
+        machine = Machine()
+        machine.configure('Enigma1', ['II', 'I', 'III'], 'UKW-B')
+        machine.set_ring_setting(2, 11)
+        machine.set_rotor_position(0, 3)
+        machine.set_rotor_position(1, 1)
+        machine.set_rotor_position(2, 7)
+        ciphertext = machine.encrypt(PLAINTEXT)
+
+        search = KeySearch('Enigma1', ciphertext, CribScorer(PLAINTEXT),
+                           rotor_orders=[('II', 'I', 'III')],
+                           reflectors=['UKW-B'], positions=self._positions,
+                           ring_settings=[(0, 0, ring_setting)
+                                          for ring_setting in range(26)],
+                           top_k=1, max_workers=1)
+        best = search.search()[0]
+
+        self.assertEqual(best.ring_settings, (0, 0, 11))
+        self.assertEqual(best.plaintext, PLAINTEXT)
+
+    def test_ring_setting_candidates(self):
+        ''' ring_setting_candidates() | Only the rightmost rings vary '''
+        candidates = list(ring_setting_candidates(('I', 'II', 'III')))
+
+        self.assertEqual(len(candidates), 26 * 26)
+        self.assertTrue(all(candidate[0] == 0 for candidate in candidates))
+        self.assertIn((0, 25, 3), candidates)
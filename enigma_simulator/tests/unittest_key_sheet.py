@@ -0,0 +1,162 @@
+'''
+    EnigmaSimulator - A software implementation of the Engima Machine.
+    Copyright (C) 2015-2021 Engima Simulator Development Team
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+'''
+import json
+import os
+import tempfile
+import unittest
+from simulation.enigma_machine import Machine
+from simulation.key_sheet import CompiledDay, load_key_sheet, \
+                                 read_messages, run_pipeline
+
+KEY_SHEET_CSV = '''day,model,rotors,reflector,ring_settings,plugboard
+31,Enigma1,I IV III,UKW-B,16 26 08,AD CN ET FL GI JV KZ PU QY WX
+30,Enigma1,II V I,UKW-C,A B C,
+29,M4,Beta II IV I,UKW-B-Thin,01 01 01 22,AT BL DF GJ HM NW OP QY RZ VX
+28,Enigma1,I I IX,UKW-B,1 1 1,
+'''
+
+KEY_SHEET_JSON = [
+    {'day': 31, 'model': 'Enigma1', 'rotors': ['I', 'IV', 'III'],
+     'reflector': 'UKW-B', 'ring_settings': [16, 26, 8],
+     'plugboard': ['AD', 'CN', 'ET', 'FL', 'GI', 'JV', 'KZ', 'PU', 'QY',
+                   'WX']}]
+
+MESSAGES = [{'id': 1, 'day': '31', 'positions': 'RTZ',
+             'text': 'DAS OBERKOMMANDO DER WEHRMACHT'},
+            {'id': 2, 'day': '30', 'positions': 'ABC', 'text': 'WETTER'},
+            {'id': 3, 'day': '29', 'positions': 'VJNA', 'text': 'FUNK'},
+            {'id': 4, 'day': '31', 'positions': 'QQQ', 'text': 'KEINE'},
+            {'id': 5, 'day': '1', 'positions': 'AAA', 'text': 'UNKNOWN'},
+            {'id': 6, 'day': '31', 'positions': 'AB', 'text': 'SHORT'},
+            {'id': 7, 'day': '28', 'positions': 'AAA', 'text': 'INVALID'}]
+
+class UnitTestKeySheet(unittest.TestCase):
+    ''' Unit tests for the key sheet pipeline. '''
+
+    def setUp(self):
+        self._directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self._directory.cleanup)
+
+    def _path(self, name, content):
+        path = os.path.join(self._directory.name, name)
+        with open(path, 'w', encoding='utf-8') as content_file:
+            content_file.write(content)
+        return path
+
+    def _expected(self, settings, positions, text):
+        machine = Machine()
+
+        if not machine.configure(settings.model, list(settings.rotors),
+                                 settings.reflector):
+            self.fail(machine.last_error)
+
+        for rotor_no, ring_setting in enumerate(settings.ring_settings):
+            machine.set_ring_setting(rotor_no, ring_setting)
+            machine.set_rotor_position(rotor_no,
+                                       ord(positions[rotor_no]) - ord('A'))
+
+        if settings.plugboard:
+            machine.set_plugboard(settings.plugboard)
+
+        return machine.encrypt(text)
+
+    def test_load_key_sheet(self):
+        ''' load_key_sheet() | CSV and JSON key sheets '''
+        from_csv = load_key_sheet(self._path('sheet.csv', KEY_SHEET_CSV))
+        from_json = load_key_sheet(self._path('sheet.json',
+                                              json.dumps(KEY_SHEET_JSON)))
+
+        self.assertEqual(sorted(from_csv), ['28', '29', '30', '31'])
+        self.assertEqual(from_csv['31'].ring_settings, (15, 25, 7))
+        self.assertEqual(from_csv['30'].ring_settings, (0, 1, 2))
+        self.assertIsNone(from_csv['30'].plugboard)
+
+        self.assertEqual(
+            CompiledDay(from_json['31']).encrypt('ENIGMA', 'RTZ'),
+            CompiledDay(from_csv['31']).encrypt('ENIGMA', 'RTZ'))
+
+    def test_run_pipeline(self):
+        ''' run_pipeline() | Results and errors are written in order '''
+        key_sheet = load_key_sheet(self._path('sheet.csv', KEY_SHEET_CSV))
+        messages = self._path('messages.jsonl', ''.join(
+            json.dumps(message) + '\n' for message in MESSAGES))
+        output = os.path.join(self._directory.name, 'results.jsonl')
+
+        summary = run_pipeline(key_sheet, read_messages(messages), output,
+                               batch_size=2)
+        self.assertEqual(tuple(summary), (7, 3, 3))
+
+        with open(output, 'r', encoding='utf-8') as output_file:
+            results = [json.loads(line) for line in output_file]
+
+        self.assertEqual([result['id'] for result in results],
+                         list(range(1, 8)))
+
+        for message, result in zip(MESSAGES[:4], results):
+            self.assertEqual(result['output'], self._expected(
+                key_sheet[message['day']], message['positions'],
+                message['text']))
+
+        for result in results[4:]:
+            self.assertIn('error', result)
+
+    def test_csv_messages(self):
+        ''' read_messages() | CSV messages '''
+        path = self._path('messages.csv',
+                          'id,day,positions,text\n'
+                          'A1,31,RTZ,DAS OBERKOMMANDO\n')
+
+        self.assertEqual(list(read_messages(path))[0][:3], ('A1', '31', 'RTZ'))
+
+    def test_malformed_messages(self):
+        ''' run_pipeline() | A bad JSON line is an error, not the end '''
+        key_sheet = load_key_sheet(self._path('sheet.csv', KEY_SHEET_CSV))
+        messages = self._path('messages.jsonl', ''.join(
+            [json.dumps(MESSAGES[0]) + '\n', '{bad json\n', '[1, 2]\n',
+             json.dumps(dict(MESSAGES[3], id=8, text=123)) + '\n',
+             json.dumps(dict(MESSAGES[3], id=9, positions=[1, 2, 3])) +
+             '\n', json.dumps(MESSAGES[3]) + '\n']))
+        output = os.path.join(self._directory.name, 'results.jsonl')
+
+        summary = run_pipeline(key_sheet, read_messages(messages), output)
+        self.assertEqual(tuple(summary), (6, 4, 1))
+
+        with open(output, 'r', encoding='utf-8') as output_file:
+            results = [json.loads(line) for line in output_file]
+
+        self.assertEqual([result['id'] for result in results],
+                         [1, None, None, 8, 9, 4])
+        self.assertIn('Line 2', results[1]['error'])
+        self.assertIn('Line 3', results[2]['error'])
+        self.assertIn("Line 4 'text'", results[3]['error'])
+        self.assertIn("Line 5 'positions'", results[4]['error'])
+        self.assertIn('output', results[5])
+
+    def test_partial_results_flushed(self):
+        ''' run_pipeline() | Results so far are written if input fails '''
+        key_sheet = load_key_sheet(self._path('sheet.csv', KEY_SHEET_CSV))
+        output = os.path.join(self._directory.name, 'results.jsonl')
+
+        def messages():
+            yield from read_messages(self._path(
+                'messages.jsonl', json.dumps(MESSAGES[0]) + '\n'))
+            raise OSError('Connection lost')
+
+        with self.assertRaises(OSError):
+            run_pipeline(key_sheet, messages(), output)
+
+        with open(output, 'r', encoding='utf-8') as output_file:
+            self.assertEqual([json.loads(line)['id'] for line in output_file],
+                             [1])
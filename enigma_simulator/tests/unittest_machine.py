@@ -12,8 +12,11 @@
     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
     GNU General Public License for more details.
 '''
+import contextlib
+import io
 import unittest
 from simulation.enigma_machine import Machine
+from simulation.log_policy import TraceSinkPolicy
 from simulation.rotor_contact import RotorContact
 from simulation.plugboard import Plugboard
 
@@ -29,7 +32,6 @@ class UnitTestMachine(unittest.TestCase):
 
         try:
             machine = Machine()
-            machine._logger._write_to_console = False
             machine.configure('Unknown',  ['I', 'II', 'III'], 'UKW-B')
             self.fail('Incorrectly constructed Enigma machine')
 
@@ -44,7 +46,6 @@ class UnitTestMachine(unittest.TestCase):
         ''' Machine::configure() | Invalid rotor specified '''
 
         machine = Machine()
-        machine._logger._write_to_console = False
         status = machine.configure('Enigma1',  ['Ix', 'II', 'III'], 'UKW-B')
         self.assertIs(status, False)
         self.assertIs(machine.configured, False)
@@ -59,7 +60,6 @@ class UnitTestMachine(unittest.TestCase):
 
         machine = Machine()
         self.assertIsNot(machine, None)
-        machine._logger._write_to_console = False
 
         status = machine.configure('Enigma1', ['I', 'II'], 'Wide_B')
         self.assertIs(status, False)
@@ -75,7 +75,6 @@ class UnitTestMachine(unittest.TestCase):
 
         machine = Machine()
         self.assertIsNot(machine, None)
-        machine._logger._write_to_console = False
 
         status = machine.configure('Enigma1', ['I', 'II', 'III'], 'Wide_Ba')
         self.assertIs(status, False)
@@ -91,7 +90,6 @@ class UnitTestMachine(unittest.TestCase):
 
         machine = Machine()
         self.assertIsNot(machine, None)
-        machine._logger._write_to_console = False
 
         status = machine.configure('Enigma1', ['I', 'II', 'III'], 'UKW-B')
         self.assertIs(status, True)
@@ -114,7 +112,6 @@ class UnitTestMachine(unittest.TestCase):
     def test_machine_3_rotor_encrypt_right_rotor_turnover(self):
         machine = Machine()
         self.assertIsNot(machine, None)
-        machine._logger._write_to_console = False
 
         config_return = machine.configure('Enigma1', ['I', 'II', 'III'], 'UKW-B')
 
@@ -148,7 +145,6 @@ class UnitTestMachine(unittest.TestCase):
 
         machine = Machine()
         self.assertIsNot(machine, None)
-        machine._logger._write_to_console = False
 
         status = machine.configure('Enigma1', ['I', 'II', 'III'], 'UKW-B')
         if not status:
@@ -168,7 +164,6 @@ class UnitTestMachine(unittest.TestCase):
 
         machine = Machine()
         self.assertIsNot(machine, None)
-        machine._logger._write_to_console = False
 
         status = machine.configure('Enigma1', ['I', 'II', 'III'], 'UKW-B')
         if not status:
@@ -195,3 +190,212 @@ class UnitTestMachine(unittest.TestCase):
 
         # AAAAA should be encrypted into BMUQO.
         self.assertEqual(encrypted, expected_encrypted_string)
+
+    def test_machine_lookup_tables_match_traced_circuit(self):
+        ''' Machine::press_key() | Lookup tables match the rotor objects '''
+
+        events = []
+        fast = Machine()
+        traced = Machine(log_policy=TraceSinkPolicy(events.append))
+
+        for machine in (fast, traced):
+            status = machine.configure('Enigma1', ['IV', 'II', 'V'], 'UKW-C')
+            if not status:
+                self.fail(machine.last_error)
+
+            machine.set_rotor_position(0, RotorContact.X.value)
+            machine.set_rotor_position(1, RotorContact.Z.value)
+            machine.set_rotor_position(2, RotorContact.Q.value)
+
+        for char in 'THEQUICKBROWNFOXJUMPSOVERTHELAZYDOG' * 20:
+            self.assertEqual(fast.press_key(RotorContact[char]),
+                             traced.press_key(RotorContact[char]))
+
+        self.assertIn("Output letter '%s'", [event.message for event in events])
+
+    def test_machine_configure_logs_through_policy(self):
+        ''' Machine::configure() | Logs only through the log policy '''
+
+        events = []
+        machine = Machine(log_policy=TraceSinkPolicy(events.append))
+
+        with contextlib.redirect_stdout(io.StringIO()) as stdout:
+            self.assertTrue(machine.configure('Enigma1', ['I', 'II', 'III'],
+                                              'UKW-B'))
+            Machine().configure('Enigma1', ['I', 'II', 'III'], 'UKW-B')
+
+        self.assertEqual(stdout.getvalue(), '')
+        self.assertEqual(events[0].text, "Configuring machine as 'Enigma1'")
+        self.assertIn("Added reflector 'UKW-B'",
+                      [event.text for event in events])
+
+    def test_machine_encrypt_matches_press_key(self):
+        ''' Machine::encrypt() | Same output and state as press_key() '''
+
+        single = Machine()
+        bulk = Machine()
+
+        for machine in (single, bulk):
+            status = machine.configure('Enigma1', ['I', 'II', 'III'], 'UKW-B')
+            if not status:
+                self.fail(machine.last_error)
+
+            machine.set_rotor_position(0, RotorContact.A.value)
+            machine.set_rotor_position(1, RotorContact.D.value)
+            machine.set_rotor_position(2, RotorContact.Y.value)
+
+        message = 'ATTACK AT DAWN, HOLD THE BRIDGE ' * 30
+
+        expected = ''
+        for char in message:
+            if char.isalpha():
+                expected += single.press_key(RotorContact[char]).name
+
+        self.assertEqual(bulk.encrypt(message, keep_non_letters=False),
+                         expected)
+
+        for rotor_no in range(3):
+            self.assertEqual(bulk.get_rotor_position(rotor_no),
+                             single.get_rotor_position(rotor_no))
+
+    def test_machine_encrypt_bytes_keep_non_letters(self):
+        ''' Machine::encrypt_bytes() | Non-letters are passed through '''
+
+        machine = Machine()
+
+        status = machine.configure('Enigma1', ['I', 'II', 'III'], 'UKW-B')
+        if not status:
+            self.fail(machine.last_error)
+
+        encrypted = machine.encrypt_bytes(memoryview(b'AAA AA\n'))
+        self.assertEqual(encrypted, b'BDZ GO\n')
+
+        # The right rotor has stepped five times, A => F.
+        self.assertEqual(machine.get_rotor_position(2), RotorContact.F.value)
+
+    def test_machine_rotor_steps_past_z(self):
+        ''' Machine::press_key() | Rotor steps from Z back to A '''
+
+        machine = Machine()
+
+        status = machine.configure('Enigma1', ['I', 'II', 'III'], 'UKW-B')
+        if not status:
+            self.fail(machine.last_error)
+
+        machine.set_rotor_position(2, RotorContact.Y.value)
+        machine.encrypt('AAA')
+        self.assertEqual(machine.get_rotor_position(2), RotorContact.B.value)
+
+    def test_machine_snapshot_restore(self):
+        ''' Machine::snapshot() / restore() | State is restored '''
+
+        machine = Machine()
+
+        status = machine.configure('Enigma1', ['I', 'II', 'III'], 'UKW-B')
+        if not status:
+            self.fail(machine.last_error)
+
+        machine.set_rotor_position(1, RotorContact.D.value)
+        machine.set_rotor_position(2, RotorContact.U.value)
+        machine.encrypt('AA')
+
+        # The middle rotor is at its notch so a double-step is pending.
+        state = machine.snapshot()
+        self.assertIs(state.double_step, True)
+
+        expected = machine.encrypt('ENIGMAREVEALED')
+        machine.restore(state)
+        self.assertEqual(machine.encrypt('ENIGMAREVEALED'), expected)
+
+        wiring = bytearray(range(26))
+        wiring[0], wiring[1] = 1, 0
+        machine.restore(state._replace(plugboard=bytes(wiring)))
+        self.assertEqual(machine.plugboard.get_plug(RotorContact.A),
+                         RotorContact.B)
+        self.assertEqual(machine.snapshot().plugboard, bytes(wiring))
+
+    def test_machine_clone(self):
+        ''' Machine::clone() | Clones step independently '''
+
+        machine = Machine()
+
+        status = machine.configure('Enigma1', ['I', 'II', 'III'], 'UKW-B')
+        if not status:
+            self.fail(machine.last_error)
+
+        machine.encrypt('ABC')
+        cloned = machine.clone()
+
+        self.assertEqual(cloned.encrypt('CLONED'), machine.encrypt('CLONED'))
+
+        cloned.encrypt('X')
+        self.assertNotEqual(cloned.get_rotor_position(2),
+                            machine.get_rotor_position(2))
+
+    def test_machine_ring_settings(self):
+        ''' Machine::set_ring_setting() | Ring settings B-B-B '''
+
+        machine = Machine()
+
+        status = machine.configure('Enigma1', ['I', 'II', 'III'], 'UKW-B')
+        if not status:
+            self.fail(machine.last_error)
+
+        for rotor_no in range(3):
+            machine.set_ring_setting(rotor_no, RotorContact.B.value)
+
+        self.assertEqual(machine.encrypt('AAAAA'), 'EWTYX')
+
+        with self.assertRaises(ValueError):
+            machine.set_ring_setting(0, 26)
+
+    def test_machine_bulk_settings(self):
+        ''' Machine::set_ring_settings() / set_plugboard() | Bulk setters '''
+
+        machine = Machine()
+
+        status = machine.configure('Enigma1', ['I', 'II', 'III'], 'UKW-B')
+        if not status:
+            self.fail(machine.last_error)
+
+        machine.set_ring_settings([RotorContact.B.value] * 3)
+        self.assertEqual(machine.encrypt('AAAAA'), 'EWTYX')
+
+        for invalid in ((1, 1), (1, 1, 26)):
+            with self.assertRaises(ValueError):
+                machine.set_ring_settings(invalid)
+
+        machine.set_plugboard('AB CD')
+        self.assertEqual(machine.plugboard.get_plug(RotorContact.A),
+                         RotorContact.B)
+
+        wiring = machine.snapshot().plugboard
+        machine.set_plugboard(None)
+        self.assertIsNone(machine.snapshot().plugboard)
+
+        machine.set_plugboard(wiring)
+        self.assertEqual(machine.snapshot().plugboard, wiring)
+
+        with self.assertRaises(ValueError):
+            machine.set_plugboard('AB BC')
+
+    def test_machine_ring_settings_match_traced_circuit(self):
+        ''' Machine::press_key() | Ring settings match the rotor objects '''
+
+        machines = [Machine(), Machine(log_policy=TraceSinkPolicy(
+            lambda event: None))]
+
+        for machine in machines:
+
+            status = machine.configure('Enigma1', ['IV', 'II', 'V'], 'UKW-C')
+            if not status:
+                self.fail(machine.last_error)
+
+            for rotor_no, ring_setting in enumerate((5, 24, 17)):
+                machine.set_ring_setting(rotor_no, ring_setting)
+                machine.set_rotor_position(rotor_no, ring_setting // 2)
+
+        message = 'RINGSTELLUNG' * 60
+        self.assertEqual(machines[0].encrypt(message),
+                         ''.join(machines[1].press_key(RotorContact[key]).name
+                                 for key in message))
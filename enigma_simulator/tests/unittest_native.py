@@ -0,0 +1,188 @@
+'''
+    EnigmaSimulator - A software implementation of the Engima Machine.
+    Copyright (C) 2015-2021 Engima Simulator Development Team
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+'''
+import os
+import random
+import shutil
+import subprocess
+import tempfile
+import unittest
+from simulation import native
+from simulation.component_registry import REGISTRY
+from simulation.enigma_machine import Machine
+
+MODELS = {'Enigma1': ('UKW-B', 'UKW-C'), 'M4': ('UKW-B-Thin', 'UKW-C-Thin')}
+
+
+def _load_native_core():
+    ''' Load the native core, building it if there is a compiler. '''
+    core = native.get_core()
+    if core.native:
+        return core, None
+
+    compiler = os.environ.get('CXX') or shutil.which('c++') or \
+        shutil.which('g++')
+    if compiler is None:
+        return None, None
+
+    directory = tempfile.TemporaryDirectory()
+    path = os.path.join(directory.name, native.LIBRARY_FILE_NAME)
+
+    try:
+        native.build_library(path, compiler)
+        return native.get_core(path), directory
+
+    except (OSError, subprocess.CalledProcessError):
+        directory.cleanup()
+        return None, None
+
+
+class UnitTestNative(unittest.TestCase):
+    ''' Parity tests for the native core against the pure-Python core. '''
+
+    @classmethod
+    def setUpClass(cls):
+        cls._native_core, cls._directory = _load_native_core()
+
+    @classmethod
+    def tearDownClass(cls):
+        if cls._directory is not None:
+            cls._directory.cleanup()
+
+    def _random_machine(self, generator):
+        model = generator.choice(sorted(MODELS))
+        no_of_rotors = REGISTRY.no_of_rotors(model)
+        names = REGISTRY.rotor_names(model)
+
+        if model == 'M4':
+            rotors = [generator.choice(['Beta', 'Gamma'])] + generator.sample(
+                [name for name in names if name not in ('Beta', 'Gamma')], 3)
+        else:
+            rotors = generator.sample(names, no_of_rotors)
+
+        machine = Machine()
+        if not machine.configure(model, rotors,
+                                 generator.choice(MODELS[model])):
+            self.fail(machine.last_error)
+
+        for rotor_no in range(no_of_rotors):
+            machine.set_rotor_position(rotor_no, generator.randrange(26))
+            machine.set_ring_setting(rotor_no, generator.randrange(26))
+
+        wiring = list(range(26))
+        letters = generator.sample(range(26), 20)
+        for first, second in zip(letters[::2], letters[1::2]):
+            wiring[first], wiring[second] = second, first
+        machine.set_plugboard(bytes(wiring))
+
+        return machine
+
+    def test_fallback_core(self):
+        ''' get_core() | Undiscoverable library falls back to pure-Python '''
+        missing = os.path.join(tempfile.gettempdir(), 'missing',
+                               'libmissing.so')
+        environment = os.environ.get(native.LIBRARY_ENVIRONMENT_VARIABLE)
+        default_core = native._DEFAULT_CORE
+
+        try:
+            os.environ[native.LIBRARY_ENVIRONMENT_VARIABLE] = missing
+            native._DEFAULT_CORE = None
+            core = native.get_core()
+
+        finally:
+            native._DEFAULT_CORE = default_core
+            if environment is None:
+                del os.environ[native.LIBRARY_ENVIRONMENT_VARIABLE]
+            else:
+                os.environ[native.LIBRARY_ENVIRONMENT_VARIABLE] = environment
+
+        self.assertFalse(core.native)
+
+        machine = Machine()
+        machine.configure('Enigma1', ['I', 'II', 'III'], 'UKW-B')
+        self.assertEqual(core.encrypt(machine, 'AAAAA'), 'BDZGO')
+
+    def test_explicit_path_error(self):
+        ''' get_core() | An explicit library path that fails is an error '''
+        with self.assertRaises(OSError):
+            native.get_core(os.path.join(tempfile.gettempdir(), 'missing',
+                                         'libmissing.so'))
+
+    def test_invalid_start_positions(self):
+        ''' trial_decrypt() | Invalid start positions are rejected '''
+        machine = Machine()
+        machine.configure('Enigma1', ['I', 'II', 'III'], 'UKW-B')
+
+        cores = [native.PythonCore()]
+        if self._native_core is not None:
+            cores.append(self._native_core)
+
+        for core in cores:
+            for starts in ([(0, 0)], [(0, 0, 0, 0)], [(0, 26, 0)],
+                           [(0, -1, 0)], [(0, 0, 0), (255, 0, 0)]):
+                with self.assertRaises(ValueError):
+                    core.trial_decrypt(machine, 'ABCDE', starts)
+
+    def test_encrypt_parity(self):
+        ''' NativeCore::encrypt() | Matches Machine.encrypt() '''
+        if self._native_core is None:
+            self.skipTest('Native library could not be built')
+
+        generator = random.Random(1918)
+        message = 'FUNKSPRUCH NR. 42 AN BDU: ' * 200
+
+        for _ in range(40):
+            machine = self._random_machine(generator)
+            expected = machine.clone()
+
+            self.assertEqual(
+                self._native_core.encrypt(machine, message[:1000]),
+                expected.encrypt(message[:1000]))
+            self.assertEqual(
+                self._native_core.encrypt_bytes(machine, message.encode(),
+                                                keep_non_letters=False),
+                expected.encrypt_bytes(message.encode(),
+                                       keep_non_letters=False))
+            self.assertEqual(machine.snapshot(), expected.snapshot())
+
+    def test_trial_decrypt_parity(self):
+        ''' NativeCore::trial_decrypt() | Matches the pure-Python core '''
+        if self._native_core is None:
+            self.skipTest('Native library could not be built')
+
+        generator = random.Random(1939)
+        python_core = native.PythonCore()
+
+        for _ in range(10):
+            machine = self._random_machine(generator)
+            ciphertext = machine.clone().encrypt('WETTERBERICHT' * 10)
+            starts = [tuple(generator.randrange(26) for _ in range(3))
+                      for _ in range(50)]
+
+            self.assertEqual(
+                self._native_core.trial_decrypt(machine, ciphertext, starts),
+                python_core.trial_decrypt(machine, ciphertext, starts))
+
+    def test_step_sequence_uses_python_core(self):
+        ''' NativeCore::encrypt() | Step sequence machines use Python '''
+        if self._native_core is None:
+            self.skipTest('Native library could not be built')
+
+        machine = Machine()
+        machine.configure('Enigma1', ['I', 'II', 'III'], 'UKW-B')
+        machine.enable_step_sequence()
+
+        self.assertEqual(self._native_core.encrypt(machine, 'AAAAA'),
+                         'BDZGO')
+        self.assertEqual(machine.get_rotor_position(2), 5)
@@ -0,0 +1,78 @@
+'''
+    EnigmaSimulator - A software implementation of the Engima Machine.
+    Copyright (C) 2015-2021 Engima Simulator Development Team
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+'''
+import unittest
+from simulation.enigma_machine import Machine
+from simulation.parallel import parallel_encrypt, parallel_encrypt_bytes
+from simulation.rotor_contact import RotorContact
+
+MESSAGE = b'FLIEGERFUNKSPRUCH NR 17, AN OBERKOMMANDO\n' * 500
+
+class UnitTestParallel(unittest.TestCase):
+    ''' Unit tests for multi-core encryption. '''
+
+    def _create_machine(self, model='Enigma1', rotors=('II', 'I', 'III'),
+                        reflector='UKW-B'):
+        machine = Machine()
+
+        if not machine.configure(model, list(rotors), reflector):
+            self.fail(machine.last_error)
+
+        # Start just before a double step of the middle rotor.
+        machine.set_rotor_position(len(rotors) - 2, RotorContact.D.value)
+        machine.set_rotor_position(len(rotors) - 1, RotorContact.U.value)
+        machine.set_ring_setting(len(rotors) - 1, 4)
+
+        wiring = bytearray(range(26))
+        for first, second in ((0, 25), (16, 19)):
+            wiring[first], wiring[second] = second, first
+        machine.set_plugboard(bytes(wiring))
+        return machine
+
+    def test_matches_serial(self):
+        ''' parallel_encrypt_bytes() | Output and final state match serial '''
+        for keep_non_letters in (True, False):
+            serial = self._create_machine()
+            expected = serial.encrypt_bytes(MESSAGE, keep_non_letters)
+
+            machine = self._create_machine()
+            output = parallel_encrypt_bytes(machine, MESSAGE,
+                                            keep_non_letters, max_workers=2,
+                                            chunk_size=997)
+
+            self.assertEqual(output, expected)
+            self.assertEqual(machine.snapshot(), serial.snapshot())
+
+    def test_m4_text(self):
+        ''' parallel_encrypt() | M4 text matches serial '''
+        rotors = ('Beta', 'VI', 'I', 'VIII')
+        text = MESSAGE.decode('utf-8').lower()
+        expected = self._create_machine('M4', rotors,
+                                        'UKW-B-Thin').encrypt(text)
+
+        machine = self._create_machine('M4', rotors, 'UKW-B-Thin')
+        self.assertEqual(parallel_encrypt(machine, text, max_workers=2,
+                                          chunk_size=4096), expected)
+
+    def test_single_chunk(self):
+        ''' parallel_encrypt_bytes() | Small buffers are encrypted serially '''
+        expected = self._create_machine().encrypt_bytes(MESSAGE[:100])
+        self.assertEqual(parallel_encrypt_bytes(self._create_machine(),
+                                                MESSAGE[:100]), expected)
+
+    def test_invalid_chunk_size(self):
+        ''' parallel_encrypt_bytes() | Chunk size must be positive '''
+        with self.assertRaises(ValueError):
+            parallel_encrypt_bytes(self._create_machine(), MESSAGE,
+                                   chunk_size=0)
@@ -0,0 +1,74 @@
+'''
+    EnigmaSimulator - A software implementation of the Engima Machine.
+    Copyright (C) 2015-2021 Engima Simulator Development Team
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+'''
+import unittest
+from machine_factory import configured_machine
+from simulation.plugboard_permutation import PlugboardPermutation
+from simulation.plugboard_search import climb_plugboard, RotorCore
+from simulation.scoring import CribScorer
+
+PLAINTEXT = 'ANXGENERALSTABXDERXLUFTWAFFEXMELDETXWETTERLAGEXKLAR' * 4
+PLUGS = 'AM FI NV PS TU WZ'
+
+class UnitTestPlugboardSearch(unittest.TestCase):
+    ''' Unit tests for plugboard swaps and the cached rotor core. '''
+
+    def _create_machine(self, plugs=None):
+        return configured_machine('Enigma1', ['V', 'III', 'I'], 'UKW-B',
+                                  (1, 20, 5), (4, 17, 9), plugs)
+
+    def test_swap_undo(self):
+        ''' PlugboardPermutation::swap() | Swaps are undone in reverse '''
+        plugboard = PlugboardPermutation.from_pairs(PLUGS)
+        original = plugboard.wiring
+
+        tokens = [plugboard.swap(first, second)
+                  for first, second in ((0, 5), (1, 1), (2, 3), (12, 12),
+                                        (19, 20), (19, 20))]
+        self.assertEqual(plugboard.wiring[0], 5)
+        self.assertEqual(plugboard.wiring[12], 12)
+        self.assertEqual(plugboard.wiring[8], 8)
+
+        # Every swap leaves a valid plugboard.
+        PlugboardPermutation(plugboard.wiring)
+
+        for token in reversed(tokens):
+            plugboard.undo(token)
+        self.assertEqual(plugboard.wiring, original)
+        self.assertEqual(plugboard.plug_count, 6)
+
+    def test_rotor_core_decrypt(self):
+        ''' RotorCore::decrypt() | Matches Machine.encrypt() '''
+        ciphertext = self._create_machine(PLUGS).encrypt(PLAINTEXT)
+        core = RotorCore(self._create_machine(), ciphertext)
+
+        self.assertEqual(len(core), len(PLAINTEXT))
+        self.assertEqual(core.decrypt(PlugboardPermutation.from_pairs(PLUGS)),
+                         PLAINTEXT)
+
+        for plugs in ('', 'AB', 'QX LM'):
+            wiring = PlugboardPermutation.from_pairs(plugs).wiring
+            self.assertEqual(core.decrypt(wiring),
+                             self._create_machine(plugs).encrypt(ciphertext))
+
+    def test_climb_plugboard(self):
+        ''' climb_plugboard() | Recovers the plugboard from a crib '''
+        ciphertext = self._create_machine(PLUGS).encrypt(PLAINTEXT)
+        core = RotorCore(self._create_machine(), ciphertext)
+
+        plugboard, score = climb_plugboard(core, CribScorer(PLAINTEXT))
+
+        self.assertEqual(score, len(PLAINTEXT))
+        self.assertEqual(plugboard.wiring,
+                         PlugboardPermutation.from_pairs(PLUGS).wiring)
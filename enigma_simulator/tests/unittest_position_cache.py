@@ -0,0 +1,128 @@
+'''
+    EnigmaSimulator - A software implementation of the Engima Machine.
+    Copyright (C) 2015-2021 Engima Simulator Development Team
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+'''
+import os
+import random
+import tempfile
+import unittest
+from machine_factory import configured_machine
+from simulation.key_search import search_unit
+from simulation.position_cache import PositionCache, TABLE_SIZE
+from simulation.scoring import CribScorer
+
+PLUGS = 'AT BL DF GJ HM NW OP QY RZ VX'
+
+class UnitTestPositionCache(unittest.TestCase):
+    ''' Unit tests for the position cache. '''
+
+    def _message(self, seed, length):
+        generator = random.Random(seed)
+        return bytes(generator.choice(b'ABCDEFGHIJKLMNOPQRSTUVWXYZ')
+                     for _ in range(length))
+
+    def test_matches_machine(self):
+        ''' PositionCache | Output and rotor state match the machine '''
+        cache = PositionCache()
+        settings = [('Enigma1', ('I', 'II', 'III'), 'UKW-B', (0, 0, 0)),
+                    ('Enigma1', ('II', 'V', 'III'), 'UKW-C', (3, 0, 17)),
+                    ('M3', ('VI', 'VIII', 'VII'), 'UKW-B', (25, 12, 4)),
+                    ('M4', ('Gamma', 'VI', 'I', 'VIII'), 'UKW-C-Thin',
+                     (0, 5, 0, 12))]
+        message = self._message(0, 20000)
+
+        for seed, (model, rotors, reflector, ring_settings) in \
+                enumerate(settings):
+            generator = random.Random(seed)
+            positions = [generator.randrange(26) for _ in rotors]
+
+            machine = configured_machine(model, rotors, reflector,
+                                         ring_settings, positions, PLUGS)
+            cached = machine.clone()
+            cached.set_position_cache(cache)
+
+            for length in (0, 1, 25, 26, 1000, 20000):
+                self.assertEqual(cached.encrypt_bytes(message[:length]),
+                                 machine.encrypt_bytes(message[:length]))
+                self.assertEqual(cached.snapshot(), machine.snapshot())
+
+    def test_non_letters(self):
+        ''' PositionCache | Non-letters are kept or dropped '''
+        machine = configured_machine('Enigma1', ('I', 'IV', 'III'), 'UKW-B',
+                                     (1, 2, 3), (24, 4, 20), PLUGS)
+        cached = machine.clone()
+        cached.set_position_cache(PositionCache())
+
+        for text in ('VON LEUTNANT ZUR SEE, 1234.' * 10, '1234', ''):
+            for keep_non_letters in (True, False):
+                self.assertEqual(cached.encrypt(text, keep_non_letters),
+                                 machine.encrypt(text, keep_non_letters))
+
+    def test_shared_directory(self):
+        ''' PositionCache | Tables are shared through files '''
+        with tempfile.TemporaryDirectory() as directory:
+            machine = configured_machine('Enigma1', ('I', 'II', 'III'),
+                                         'UKW-B', (0, 0, 0), (0, 0, 0),
+                                         PLUGS)
+            message = self._message(1, 1000)
+            expected = machine.clone().encrypt_bytes(message)
+
+            for _ in range(2):
+                cached = machine.clone()
+                cached.set_position_cache(PositionCache(directory=directory))
+                self.assertEqual(cached.encrypt_bytes(message), expected)
+
+            files = os.listdir(directory)
+            self.assertEqual(len(files), 1)
+            self.assertEqual(os.path.getsize(os.path.join(directory,
+                                                          files[0])),
+                             TABLE_SIZE)
+
+    def test_eviction(self):
+        ''' PositionCache | Wheel orders are evicted, rings share tables '''
+        cache = PositionCache(max_tables=2)
+
+        for rotors, ring_settings in ((('I', 'II', 'III'), (0, 0, 0)),
+                                      (('I', 'II', 'III'), (5, 6, 7)),
+                                      (('II', 'I', 'III'), (0, 0, 0)),
+                                      (('III', 'II', 'I'), (0, 0, 0)),
+                                      (('I', 'II', 'III'), (0, 0, 0))):
+            machine = configured_machine('Enigma1', rotors, 'UKW-B',
+                                         ring_settings, (0, 0, 0), PLUGS)
+            machine.set_position_cache(cache)
+            machine.encrypt('ENIGMA' * 10)
+
+        self.assertEqual(tuple(cache.cache_info()), (1, 4, 2, 2, 2))
+
+        cache.clear()
+        self.assertEqual(tuple(cache.cache_info()), (0, 0, 0, 0, 2))
+
+        with self.assertRaises(ValueError):
+            PositionCache(max_tables=0)
+
+    def test_search_unit(self):
+        ''' search_unit() | Results are the same with the cache '''
+        machine = configured_machine('Enigma1', ('II', 'I', 'III'), 'UKW-B',
+                                     (0, 4, 9), (3, 1, 7), '')
+        plaintext = 'KEINEBESONDERENEREIGNISSEZUMELDEN'
+        ciphertext = machine.encrypt(plaintext)
+        positions = [(3, 1, right) for right in range(26)]
+
+        results = [search_unit('Enigma1', ('II', 'I', 'III'), 'UKW-B',
+                               ciphertext, CribScorer(plaintext), positions,
+                               [(0, 0, 0), (0, 4, 9), (0, 4, 10)], 3, None,
+                               position_cache)
+                   for position_cache in (False, True)]
+
+        self.assertEqual(results[0], results[1])
+        self.assertEqual(max(results[1]).plaintext, plaintext)
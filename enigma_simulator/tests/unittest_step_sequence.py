@@ -0,0 +1,107 @@
+'''
+    EnigmaSimulator - A software implementation of the Engima Machine.
+    Copyright (C) 2015-2021 Engima Simulator Development Team
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+'''
+import unittest
+from simulation.enigma_machine import Machine
+from simulation.rotor_contact import RotorContact
+from simulation.step_sequence import StepSequence
+
+class UnitTestStepSequence(unittest.TestCase):
+    ''' Unit tests for the precomputed step sequence. '''
+
+    def _create_machine(self, use_step_sequence):
+        machine = Machine()
+
+        status = machine.configure('Enigma1', ['I', 'II', 'III'], 'UKW-B')
+        if not status:
+            self.fail(machine.last_error)
+
+        machine.set_rotor_position(0, RotorContact.A.value)
+        machine.set_rotor_position(1, RotorContact.D.value)
+        machine.set_rotor_position(2, RotorContact.S.value)
+        machine.enable_step_sequence(use_step_sequence)
+        return machine
+
+    def test_cycle_length(self):
+        ''' StepSequence | Single notch rotors repeat after 26 * 25 * 26 '''
+        notches = (1 << 16, 1 << 4, 1 << 21)
+        sequence = StepSequence(notches, (0, 0, 0))
+
+        self.assertEqual(sequence.cycle_length, 26 * 25 * 26)
+        self.assertEqual(sequence.state(0), ((0, 0, 0), False))
+        self.assertEqual(sequence.state(sequence.cycle_length),
+                         sequence.state(sequence.cycle_start))
+
+    def test_press_key_matches_stepping(self):
+        ''' Machine::press_key() | Step sequence matches normal stepping '''
+        stepped = self._create_machine(False)
+        sequenced = self._create_machine(True)
+
+        for _ in range(700):
+            self.assertEqual(stepped.press_key(RotorContact.E),
+                             sequenced.press_key(RotorContact.E))
+
+        for rotor_no in range(3):
+            self.assertEqual(stepped.get_rotor_position(rotor_no),
+                             sequenced.get_rotor_position(rotor_no))
+
+    def test_encrypt_matches_stepping(self):
+        ''' Machine::encrypt() | Step sequence matches normal stepping '''
+        stepped = self._create_machine(False)
+        sequenced = self._create_machine(True)
+        message = 'WEATHERREPORTFOLLOWS' * 1000
+
+        self.assertEqual(stepped.encrypt(message), sequenced.encrypt(message))
+        self.assertEqual(stepped.encrypt(message), sequenced.encrypt(message))
+
+    def test_reconfigure(self):
+        ''' Machine::configure() | Reconfiguring resets the step sequence '''
+        expected = Machine()
+        if not expected.configure('Enigma1', ['III', 'II', 'I'], 'UKW-B'):
+            self.fail(expected.last_error)
+
+        for use_step_sequence in (False, True):
+            machine = self._create_machine(use_step_sequence)
+            machine.encrypt('AAAA')
+
+            if not machine.configure('Enigma1', ['III', 'II', 'I'], 'UKW-B'):
+                self.fail(machine.last_error)
+
+            self.assertEqual(machine.encrypt('A' * 60),
+                             expected.clone().encrypt('A' * 60))
+            self.assertEqual([machine.get_rotor_position(rotor_no)
+                              for rotor_no in range(3)], [0, 2, 8])
+
+    def test_seek(self):
+        ''' Machine::seek() | Seeking matches pressing the keys '''
+        stepped = self._create_machine(False)
+        sequenced = self._create_machine(True)
+        keypresses = 20000
+
+        stepped.encrypt('A' * keypresses)
+        sequenced.seek(keypresses)
+
+        for rotor_no in range(3):
+            self.assertEqual(stepped.get_rotor_position(rotor_no),
+                             sequenced.get_rotor_position(rotor_no))
+
+        self.assertEqual(stepped.encrypt('SEEKTEST'),
+                         sequenced.encrypt('SEEKTEST'))
+
+    def test_seek_not_enabled(self):
+        ''' Machine::seek() | Step sequence not enabled '''
+        machine = self._create_machine(False)
+
+        with self.assertRaises(ValueError):
+            machine.seek(10)
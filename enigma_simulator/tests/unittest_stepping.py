@@ -0,0 +1,181 @@
+'''
+    EnigmaSimulator - A software implementation of the Engima Machine.
+    Copyright (C) 2015-2021 Engima Simulator Development Team
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+'''
+import unittest
+from simulation.component_registry import ComponentRegistry, REGISTRY
+from simulation.enigma_machine import Machine
+from simulation.extended_models import ComponentDefinition, ModelDefinition
+from simulation.log_policy import TraceSinkPolicy
+from simulation.rotor_contact import RotorContact
+from simulation.stepping import SteppingDefinition, SteppingMode
+
+MESSAGE = 'WETTERVORHERSAGEBISKAYA' * 100
+
+# Three rotor cog stepped model with a settable, rotating reflector.
+COG_MODEL = ModelDefinition(
+    3, False,
+    [ComponentDefinition('I', 'EKMFLGDQVZNTOWYHXUSPAIBRCJ', ['Q', 'Z']),
+     ComponentDefinition('II', 'AJDKSIRUXBLHWTMCQGZNPYFVOE', ['E', 'J']),
+     ComponentDefinition('III', 'BDFHJLCPRTXVZNYEIWGAKMUSQO', ['V'])],
+    [ComponentDefinition('UKW', 'YRUHQSLDPXNGOKMIEBFZCWVJAT', [])],
+    SteppingDefinition(SteppingMode.COG, 3, True, True))
+
+REGISTRY.register_model('Test-Cog', COG_MODEL)
+
+
+class UnitTestStepping(unittest.TestCase):
+    ''' Unit tests for N-rotor, lever and cog stepping. '''
+
+    def _create_machine(self, model, rotors, reflector, positions,
+                        log_policy=None):
+        machine = Machine(log_policy=log_policy)
+
+        status = machine.configure(model, rotors, reflector)
+        if not status:
+            self.fail(machine.last_error)
+
+        for rotor_no, position in enumerate(positions):
+            machine.set_rotor_position(rotor_no, position)
+
+        return machine
+
+    def _positions(self, machine, no_of_rotors):
+        return [machine.get_rotor_position(rotor_no)
+                for rotor_no in range(no_of_rotors)]
+
+    def _assert_paths_match(self, model, rotors, reflector, positions,
+                            reflector_position=0):
+        machines = [self._create_machine(model, rotors, reflector,
+                                         positions, log_policy)
+                    for log_policy in (None, None,
+                                       TraceSinkPolicy(lambda event: None))]
+
+        for machine in machines:
+            if reflector_position:
+                machine.set_reflector_position(reflector_position)
+
+        encrypted = machines[0].encrypt(MESSAGE)
+        for machine in machines[1:]:
+            pressed = ''.join(machine.press_key(RotorContact[letter]).name
+                              for letter in MESSAGE)
+            self.assertEqual(pressed, encrypted)
+
+        for machine in machines[1:]:
+            self.assertEqual(self._positions(machine, len(rotors)),
+                             self._positions(machines[0], len(rotors)))
+            self.assertEqual(machine.get_reflector_position(),
+                             machines[0].get_reflector_position())
+
+    def test_m4_matches_m3(self):
+        ''' M4 | Beta at A with UKW-B-Thin matches UKW-B '''
+        m4 = self._create_machine('M4', ['Beta', 'I', 'II', 'III'],
+                                  'UKW-B-Thin', [0, 3, 20, 5])
+        enigma1 = self._create_machine('Enigma1', ['I', 'II', 'III'],
+                                       'UKW-B', [3, 20, 5])
+
+        self.assertEqual(m4.encrypt(MESSAGE), enigma1.encrypt(MESSAGE))
+        self.assertEqual(self._positions(m4, 4),
+                         [0] + self._positions(enigma1, 3))
+
+    def test_m4_greek_wheel_is_fixed(self):
+        ''' M4 | The Greek wheel never steps '''
+        machine = self._create_machine('M4', ['Gamma', 'VI', 'VII', 'VIII'],
+                                       'UKW-C-Thin', [7, 25, 12, 25])
+        machine.encrypt('A' * 20000)
+        self.assertEqual(machine.get_rotor_position(0), 7)
+
+    def test_m4_rotor_slots(self):
+        ''' M4 | Greek wheels only fit the leftmost slot '''
+        for rotors in (['I', 'II', 'III', 'Beta'],
+                       ['Beta', 'Gamma', 'I', 'II'],
+                       ['I', 'II', 'III', 'IV'], ['II', 'Beta', 'IV', 'V']):
+            machine = Machine()
+            self.assertFalse(machine.configure('M4', rotors, 'UKW-B-Thin'))
+            self.assertIn("doesn't fit slot", machine.last_error)
+
+        orders = list(REGISTRY.rotor_orders('M4'))
+        self.assertEqual(len(orders), 2 * 8 * 7 * 6)
+        self.assertTrue(all(order[0] in ('Beta', 'Gamma')
+                            for order in orders))
+        self.assertEqual(len(list(REGISTRY.rotor_orders('Test-Cog'))), 6)
+
+        with self.assertRaises(ValueError):
+            REGISTRY.register_model('Test-Slots', COG_MODEL._replace(
+                rotor_slots=(('I',), ('II',), ('IX',))))
+
+    def test_m4_paths_match(self):
+        ''' M4 | encrypt(), press_key() and the traced circuit match '''
+        self._assert_paths_match('M4', ['Beta', 'V', 'VI', 'VIII'],
+                                 'UKW-B-Thin', [11, 4, 25, 24])
+
+    def test_cog_stepping_carries(self):
+        ''' Cog stepping | Turnover carries through to the reflector '''
+        machine = self._create_machine('Test-Cog', ['I', 'II', 'III'], 'UKW',
+                                       [RotorContact.Q.value,
+                                        RotorContact.E.value,
+                                        RotorContact.V.value])
+        machine.press_key(RotorContact.A)
+
+        self.assertEqual(self._positions(machine, 3),
+                         [RotorContact.R.value, RotorContact.F.value,
+                          RotorContact.W.value])
+        self.assertEqual(machine.get_reflector_position(), 1)
+
+    def test_cog_stepping_no_double_step(self):
+        ''' Cog stepping | The middle rotor doesn't double-step '''
+        machine = self._create_machine('Test-Cog', ['I', 'II', 'III'], 'UKW',
+                                       [0, RotorContact.D.value,
+                                        RotorContact.U.value])
+        machine.encrypt('AAA')
+
+        self.assertEqual(self._positions(machine, 3),
+                         [0, RotorContact.E.value, RotorContact.X.value])
+        self.assertEqual(machine.get_reflector_position(), 0)
+
+    def test_cog_paths_match(self):
+        ''' Cog stepping | encrypt(), press_key() and traced circuit match '''
+        self._assert_paths_match('Test-Cog', ['III', 'I', 'II'], 'UKW',
+                                 [16, 4, 25], reflector_position=5)
+
+    def test_cog_step_sequence_not_supported(self):
+        ''' Cog stepping | Step sequences need lever stepping '''
+        machine = self._create_machine('Test-Cog', ['I', 'II', 'III'], 'UKW',
+                                       [0, 0, 0])
+
+        with self.assertRaises(ValueError):
+            machine.enable_step_sequence()
+
+    def test_reflector_position_not_settable(self):
+        ''' Machine::set_reflector_position() | Reflector can't be set '''
+        machine = self._create_machine('Enigma1', ['I', 'II', 'III'],
+                                       'UKW-B', [0, 0, 0])
+
+        with self.assertRaises(ValueError):
+            machine.set_reflector_position(1)
+
+    def test_register_invalid_stepping(self):
+        ''' ComponentRegistry | Invalid stepping definitions are rejected '''
+        registry = ComponentRegistry()
+
+        invalid = [SteppingDefinition(SteppingMode.LEVER, 2, False, False),
+                   SteppingDefinition(SteppingMode.COG, 4, True, True),
+                   SteppingDefinition(SteppingMode.COG, 3, False, True)]
+
+        for stepping in invalid:
+            with self.assertRaises(ValueError):
+                registry.register_model('Invalid',
+                                        COG_MODEL._replace(stepping=stepping))
+
+        with self.assertRaises(ValueError):
+            registry.model('Invalid')
@@ -0,0 +1,108 @@
+'''
+    EnigmaSimulator - A software implementation of the Engima Machine.
+    Copyright (C) 2015-2021 Engima Simulator Development Team
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+'''
+import asyncio
+import io
+import os
+import tempfile
+import unittest
+from simulation.enigma_machine import Machine
+from simulation.streaming import encrypt_chunks, encrypt_file, encrypt_stream
+
+MESSAGE = b'FLIEGERFUNKSPRUCH NR 17, AN OBERKOMMANDO\n' * 500
+
+class UnitTestStreaming(unittest.TestCase):
+    ''' Unit tests for streaming encryption. '''
+
+    def setUp(self):
+        self._expected = self._create_machine().encrypt_bytes(MESSAGE)
+
+    def _create_machine(self):
+        machine = Machine()
+
+        if not machine.configure('Enigma1', ['III', 'I', 'II'], 'UKW-B'):
+            self.fail(machine.last_error)
+
+        machine.set_rotor_position(1, 3)
+        return machine
+
+    def test_encrypt_chunks(self):
+        ''' encrypt_chunks() | Chunked output matches one call '''
+        chunks = [MESSAGE[offset:offset + 7]
+                  for offset in range(0, len(MESSAGE), 7)]
+        output = b''.join(encrypt_chunks(self._create_machine(), chunks))
+        self.assertEqual(output, self._expected)
+
+    def test_encrypt_chunks_lower_case(self):
+        ''' encrypt_chunks() | Lower case is encrypted, not passed through '''
+        machine = self._create_machine()
+        expected = machine.clone().encrypt('attack at dawn')
+
+        self.assertEqual(list(encrypt_chunks(machine.clone(),
+                                             ['attack at dawn'])),
+                         [expected])
+
+        for chunk in (b'attack at dawn', bytearray(b'attack at dawn'),
+                      memoryview(b'attack at dawn')):
+            self.assertEqual(list(encrypt_chunks(machine.clone(), [chunk])),
+                             [expected.encode('utf-8')])
+
+    def test_encrypt_file(self):
+        ''' encrypt_file() | Read and memory-mapped files match one call '''
+        with tempfile.TemporaryDirectory() as directory:
+            source = os.path.join(directory, 'plain.txt')
+            destination = os.path.join(directory, 'cipher.txt')
+
+            with open(source, 'wb') as source_file:
+                source_file.write(MESSAGE.lower())
+
+            for use_mmap in (False, True):
+                written = encrypt_file(self._create_machine(), source,
+                                       destination, chunk_size=1000,
+                                       use_mmap=use_mmap)
+                self.assertEqual(written, len(MESSAGE))
+
+                with open(destination, 'rb') as destination_file:
+                    self.assertEqual(destination_file.read(), self._expected)
+
+    def test_encrypt_file_objects(self):
+        ''' encrypt_file() | Open file objects are accepted '''
+        output = io.BytesIO()
+        encrypt_file(self._create_machine(), io.BytesIO(MESSAGE.lower()),
+                     output, chunk_size=333)
+        self.assertEqual(output.getvalue(), self._expected)
+
+    def test_encrypt_stream(self):
+        ''' encrypt_stream() | asyncio stream output matches one call '''
+
+        class Writer:
+            ''' Minimal StreamWriter stand-in collecting the output. '''
+            def __init__(self):
+                self.output = bytearray()
+
+            def write(self, data):
+                self.output.extend(data)
+
+            async def drain(self):
+                pass
+
+        async def run():
+            reader = asyncio.StreamReader()
+            reader.feed_data(MESSAGE.lower())
+            reader.feed_eof()
+            writer = Writer()
+            await encrypt_stream(self._create_machine(), reader, writer, 512)
+            return bytes(writer.output)
+
+        self.assertEqual(asyncio.run(run()), self._expected)
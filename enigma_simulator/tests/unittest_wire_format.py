@@ -0,0 +1,133 @@
+'''
+    EnigmaSimulator - A software implementation of the Engima Machine.
+    Copyright (C) 2015-2021 Engima Simulator Development Team
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+'''
+import os
+import random
+import tempfile
+import unittest
+from machine_factory import configured_machine
+from simulation.wire_format import Container, ContainerWriter, \
+    create_machine, decode_letters, encode_letters, encrypt_container, \
+    pack_settings, settings_of, unpack_settings, WireSettings
+
+MESSAGE = 'Feindliche Zerstoerer in Sicht, Planquadrat AN 1234'
+PLUGS = 'AT BL DF GJ HM NW OP QY RZ VX'
+
+class UnitTestWireFormat(unittest.TestCase):
+    ''' Unit tests for the binary wire format. '''
+
+    def setUp(self):
+        self._directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self._directory.cleanup)
+
+    def test_settings_round_trip(self):
+        ''' pack_settings | Settings unpack to the same machine '''
+        machines = [
+            configured_machine('Enigma1', ['II', 'V', 'III'], 'UKW-C',
+                               (3, 0, 17), (25, 1, 7), PLUGS),
+            configured_machine('M4', ['Gamma', 'VI', 'I', 'VIII'],
+                               'UKW-C-Thin', (0, 5, 0, 12), (1, 2, 3, 4),
+                               'AB')]
+
+        for machine in machines:
+            settings = settings_of(machine)
+            packed = pack_settings(settings)
+            self.assertEqual(unpack_settings(b'xx' + packed, 2),
+                             (settings, len(packed) + 2))
+
+            rebuilt = create_machine(settings)
+            self.assertEqual(rebuilt.encrypt(MESSAGE),
+                             machine.encrypt(MESSAGE))
+
+        # Enigma 1 with ten plugs.
+        self.assertEqual(len(pack_settings(settings_of(machines[0]))), 24)
+
+    def test_invalid_settings(self):
+        ''' pack_settings | Invalid settings are rejected '''
+        settings = WireSettings('Enigma1', ('I', 'II', 'III'), 'UKW-B', 0,
+                                (0, 0, 0), (0, 0, 0), None)
+
+        for invalid in (settings._replace(model='Tirpitz'),
+                        settings._replace(rotors=('I', 'II', 'IX')),
+                        settings._replace(positions=(0, 0, 26)),
+                        settings._replace(ring_settings=(0, 0))):
+            with self.assertRaises(ValueError):
+                pack_settings(invalid)
+
+        packed = bytearray(pack_settings(settings))
+        packed[0] = 2
+        with self.assertRaises(ValueError):
+            unpack_settings(packed)
+
+        with self.assertRaises(ValueError):
+            unpack_settings(packed[:5])
+
+    def test_letters(self):
+        ''' encode_letters | Messages convert to letter codes '''
+        codes = encode_letters(MESSAGE)
+        self.assertEqual(codes[:3], bytes([5, 4, 8]))
+        self.assertEqual(decode_letters(codes),
+                         ''.join(filter(str.isalpha, MESSAGE.upper())))
+
+    def test_container(self):
+        ''' Container | Records are written, read and encrypted '''
+        generator = random.Random(1)
+        machine = configured_machine('Enigma1', ['I', 'IV', 'III'], 'UKW-B',
+                                     (15, 25, 7), (0, 0, 0), PLUGS)
+        day = settings_of(machine)
+
+        records = []
+        for _ in range(500):
+            positions = tuple(generator.randrange(26) for _ in range(3))
+            message = ''.join(generator.choice('ABCDEFGHIJKLMNOPQRSTUVWXYZ')
+                              for _ in range(generator.randrange(0, 200)))
+            records.append((day._replace(positions=positions), message))
+
+        source = os.path.join(self._directory.name, 'source.engw')
+        destination = os.path.join(self._directory.name, 'destination.engw')
+
+        with ContainerWriter(source) as writer:
+            for settings, message in records:
+                writer.write(settings, encode_letters(message))
+
+        with Container(source) as container:
+            self.assertEqual(len(container), len(records))
+            settings, codes = container[123]
+            self.assertEqual(settings, records[123][0])
+            self.assertEqual(decode_letters(codes), records[123][1])
+            codes.release()
+
+        self.assertEqual(encrypt_container(source, destination),
+                         len(records))
+
+        with Container(destination) as container:
+            for (settings, message), record in zip(records, container):
+                machine.restore(machine.snapshot()._replace(
+                    positions=settings.positions, double_step=False))
+                self.assertEqual(record.settings, settings)
+                self.assertEqual(decode_letters(record.codes),
+                                 machine.encrypt(message))
+                record.codes.release()
+
+    def test_invalid_container(self):
+        ''' Container | Files that aren't containers are rejected '''
+        path = os.path.join(self._directory.name, 'invalid.engw')
+
+        for content in (b'ENGW', b'XXXX' + bytes(20),
+                        b'ENGW\x01' + bytes(3) + b'\x01' + bytes(15)):
+            with open(path, 'wb') as invalid_file:
+                invalid_file.write(content)
+
+            with self.assertRaises(ValueError):
+                Container(path)
@@ -0,0 +1,176 @@
+/*
+    Engima Machine Simulator
+    Copyright (C) 2015-2024 Engima Simulator Development Team
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+*/
+#include "NativeCore.h"
+
+namespace enigmaSimulator {
+
+    const int kNativeVersion = 1;
+    const int kContacts = 26;
+    const int kTableSize = kContacts * kContacts;
+
+    // Circuit of a lever stepped machine, see NativeCore.h.
+    struct NativeCircuit
+    {
+        const uint8_t *forward;
+        const uint8_t *inverse;
+        const uint8_t *reflector;
+        const uint8_t *plugboard;
+        const uint32_t *notches;
+    };
+
+    // Rotor state of a lever stepped machine.
+    struct NativeState
+    {
+        int left;
+        int middle;
+        int right;
+        bool doubleStep;
+    };
+
+    /*
+    Step the rotors, exactly as Machine._step_rotors() in the Python
+    simulator: the right rotor always steps, a pending double-step steps the
+    left and middle rotors and the middle rotor steps when the right rotor
+    turns over from a notch.
+    */
+    inline void StepRotors (const NativeCircuit &circuit, NativeState &state)
+    {
+        bool willStepNextRotor = (circuit.notches[2] >> state.right) & 1;
+        state.right = (state.right + 1) % kContacts;
+
+        if (state.doubleStep)
+        {
+            state.left = (state.left + 1) % kContacts;
+            state.middle = (state.middle + 1) % kContacts;
+            state.doubleStep = false;
+        }
+
+        if (willStepNextRotor)
+        {
+            state.middle = (state.middle + 1) % kContacts;
+            state.doubleStep = (circuit.notches[1] >> state.middle) & 1;
+        }
+    }
+
+    // Rotor positions arrive from the caller unchecked, they are wrapped
+    // into 0-25 so the tables are never indexed out of bounds.
+    inline int WrapPosition (uint8_t position)
+    {
+        return position % kContacts;
+    }
+
+    // Pass a contact through the circuit:
+    // plug board => rotors => reflector => rotors => plugboard.
+    inline uint8_t EncryptContact (const NativeCircuit &circuit,
+                                   const NativeState &state,
+                                   uint8_t contact)
+    {
+        const uint8_t *forward = circuit.forward;
+        const uint8_t *inverse = circuit.inverse;
+
+        contact = circuit.plugboard[contact];
+        contact = forward[2 * kTableSize + state.right * kContacts + contact];
+        contact = forward[kTableSize + state.middle * kContacts + contact];
+        contact = forward[state.left * kContacts + contact];
+        contact = circuit.reflector[contact];
+        contact = inverse[state.left * kContacts + contact];
+        contact = inverse[kTableSize + state.middle * kContacts + contact];
+        contact = inverse[2 * kTableSize + state.right * kContacts + contact];
+        return circuit.plugboard[contact];
+    }
+
+}   // namespace enigmaSimulator
+
+using namespace enigmaSimulator;
+
+extern "C" int EnigmaNativeVersion ()
+{
+    return kNativeVersion;
+}
+
+extern "C" size_t EnigmaNativeEncrypt (const uint8_t *forward,
+                                       const uint8_t *inverse,
+                                       const uint8_t *reflector,
+                                       const uint8_t *plugboard,
+                                       const uint32_t *notches,
+                                       uint8_t *positions,
+                                       uint8_t *doubleStep,
+                                       const uint8_t *input,
+                                       size_t length,
+                                       uint8_t *output,
+                                       int keepNonLetters)
+{
+    NativeCircuit circuit = { forward, inverse, reflector, plugboard,
+                              notches };
+    NativeState state = { WrapPosition (positions[0]),
+                          WrapPosition (positions[1]),
+                          WrapPosition (positions[2]), *doubleStep != 0 };
+    size_t written = 0;
+
+    for (size_t index = 0; index < length; index++)
+    {
+        uint8_t byte = input[index];
+
+        if (byte < 'A' || byte > 'Z')
+        {
+            if (keepNonLetters)
+            {
+                output[written++] = byte;
+            }
+            continue;
+        }
+
+        StepRotors (circuit, state);
+        output[written++] = EncryptContact (circuit, state, byte - 'A') + 'A';
+    }
+
+    positions[0] = static_cast<uint8_t>(state.left);
+    positions[1] = static_cast<uint8_t>(state.middle);
+    positions[2] = static_cast<uint8_t>(state.right);
+    *doubleStep = state.doubleStep ? 1 : 0;
+
+    return written;
+}
+
+extern "C" void EnigmaNativeTrials (const uint8_t *forward,
+                                    const uint8_t *inverse,
+                                    const uint8_t *reflector,
+                                    const uint8_t *plugboard,
+                                    const uint32_t *notches,
+                                    const uint8_t *startPositions,
+                                    size_t trials,
+                                    const uint8_t *contacts,
+                                    size_t length,
+                                    uint8_t *output)
+{
+    NativeCircuit circuit = { forward, inverse, reflector, plugboard,
+                              notches };
+
+    for (size_t trial = 0; trial < trials; trial++)
+    {
+        const uint8_t *start = startPositions + trial * 3;
+        NativeState state = { WrapPosition (start[0]),
+                              WrapPosition (start[1]),
+                              WrapPosition (start[2]), false };
+        uint8_t *trialOutput = output + trial * length;
+
+        for (size_t index = 0; index < length; index++)
+        {
+            StepRotors (circuit, state);
+            trialOutput[index] = EncryptContact (circuit, state,
+                                                 contacts[index] % kContacts);
+        }
+    }
+}
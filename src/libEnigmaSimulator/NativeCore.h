@@ -0,0 +1,71 @@
+/*
+    Engima Machine Simulator
+    Copyright (C) 2015-2024 Engima Simulator Development Team
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+*/
+#ifndef NATIVECORE_H
+#define NATIVECORE_H
+#include <cstddef>
+#include <cstdint>
+
+/*
+C interface used by the Python simulator (enigma_simulator/simulation/
+native.py) to run bulk encryption and batch key trials natively.
+
+The circuit is passed in as the lookup tables the Python simulator builds,
+so the two give identical output.  Contacts are numbered 0-25 here (not the
+1-based RotorContact), rotors are numbered left to right and only the three
+lever stepped rotors are passed, any non-stepping rotors are folded into the
+reflector table by the caller.
+
+  forward / inverse : 3 x 26 x 26 tables indexed [rotor][position][contact].
+  reflector         : 26 entry table.
+  plugboard         : 26 entry table.
+  notches           : 3 notch bitmasks, bit N set for a notch at contact N.
+*/
+extern "C" {
+
+    // Version of the native interface, checked when the library is loaded.
+    int EnigmaNativeVersion ();
+
+    // Encrypt a buffer of ASCII bytes, A-Z are encrypted and anything else
+    // is copied (keepNonLetters != 0) or dropped.  The rotor positions and
+    // double-step flag are updated in place.  Returns the number of bytes
+    // written to output, which must be at least length bytes.
+    size_t EnigmaNativeEncrypt (const uint8_t *forward,
+                                const uint8_t *inverse,
+                                const uint8_t *reflector,
+                                const uint8_t *plugboard,
+                                const uint32_t *notches,
+                                uint8_t *positions,
+                                uint8_t *doubleStep,
+                                const uint8_t *input,
+                                size_t length,
+                                uint8_t *output,
+                                int keepNonLetters);
+
+    // Decrypt a message of contact numbers from each of a number of start
+    // positions (3 per trial, no pending double-step).  output receives
+    // trials x length contact numbers.
+    void EnigmaNativeTrials (const uint8_t *forward,
+                             const uint8_t *inverse,
+                             const uint8_t *reflector,
+                             const uint8_t *plugboard,
+                             const uint32_t *notches,
+                             const uint8_t *startPositions,
+                             size_t trials,
+                             const uint8_t *contacts,
+                             size_t length,
+                             uint8_t *output);
+}
+
+#endif  //  #ifndef NATIVECORE_H